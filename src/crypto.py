@@ -2,6 +2,7 @@
 import hashlib
 import hmac
 import os
+from typing import Dict, Iterable, List, Type
 
 # Third-party imports
 from Crypto.Cipher import AES
@@ -71,6 +72,341 @@ def hash_string_to_int(
     return int.from_bytes(hash_string(k, e), 'big')
 
 
+"""Translation tables XORing every byte with the HMAC inner and outer padding bytes."""
+_INNER_PAD = bytes(x ^ 0x36 for x in range(256))
+_OUTER_PAD = bytes(x ^ 0x5c for x in range(256))
+_SHA256_BLOCK_SIZE = 64
+
+
+class PRF(object):
+    """Keyed pseudorandom function computing HMAC-SHA-256, for evaluating many messages under the same key.
+
+    HMAC hashes the key, padded to a block, into an inner and an outer hash state before it processes any message. Keys
+    that are longer than a block are hashed as well. A PRF object derives both states once and copies them for every
+    evaluation, so only the message itself is hashed per call.
+
+    Subclasses provide alternative PRF backends with the same interface, see PRF_BACKENDS.
+    """
+
+    """Name identifying the backend in tokens and index metadata."""
+    name = 'hmac-sha256'
+
+    """Length of PRF outputs (bytes)."""
+    output_size = 32
+
+    def __init__(
+            self,
+            k: bytes,
+    ) -> None:
+        """Initializes the PRF, deriving the HMAC inner and outer state of a key.
+
+        :param k: The PRF key
+        :type k: bytes
+        :returns: None
+        :rtype: None
+        """
+        padded_key = self._pad_key(k)
+        self._inner = hashlib.sha256(padded_key.translate(_INNER_PAD))
+        self._outer = hashlib.sha256(padded_key.translate(_OUTER_PAD))
+
+    def eval(
+            self,
+            e: bytes,
+    ) -> bytes:
+        """Evaluates the PRF on a message.
+
+        :param e: The message
+        :type e: bytes
+        :returns: The HMAC-SHA-256 of the message
+        :rtype: bytes
+        """
+        inner = self._inner.copy()
+        inner.update(e)
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
+
+    def eval_many(
+            self,
+            es: Iterable[bytes],
+    ) -> List[bytes]:
+        """Evaluates the PRF on a number of messages.
+
+        :param es: The messages
+        :type es: Iterable[bytes]
+        :returns: The HMAC-SHA-256 of every message, in order
+        :rtype: List[bytes]
+        """
+        inner_copy = self._inner.copy
+        outer_copy = self._outer.copy
+        results = []
+        for e in es:
+            inner = inner_copy()
+            inner.update(e)
+            outer = outer_copy()
+            outer.update(inner.digest())
+            results.append(outer.digest())
+        return results
+
+    @classmethod
+    def eval_keys(
+            cls,
+            ks: Iterable[bytes],
+            e: bytes,
+    ) -> List[bytes]:
+        """Evaluates the PRF on a single message under a number of keys, each of which is used only once.
+
+        :param ks: The PRF keys
+        :type ks: Iterable[bytes]
+        :param e: The message
+        :type e: bytes
+        :returns: The HMAC-SHA-256 of the message under every key, in order
+        :rtype: List[bytes]
+        """
+        sha256 = hashlib.sha256
+        padded_keys = (k.ljust(_SHA256_BLOCK_SIZE, b'\0') if len(k) <= _SHA256_BLOCK_SIZE else cls._pad_key(k)
+                       for k in ks)
+        return [sha256(padded_key.translate(_OUTER_PAD) + sha256(padded_key.translate(_INNER_PAD) + e).digest())
+                .digest()
+                for padded_key in padded_keys]
+
+    @staticmethod
+    def _pad_key(
+            k: bytes,
+    ) -> bytes:
+        """Brings a key to the SHA-256 block size as specified by HMAC: long keys are hashed, short keys are padded with
+        zero bytes.
+
+        :param k: The PRF key
+        :type k: bytes
+        :returns: The key, one block long
+        :rtype: bytes
+        """
+        if len(k) > _SHA256_BLOCK_SIZE:
+            k = hashlib.sha256(k).digest()
+        return k.ljust(_SHA256_BLOCK_SIZE, b'\0')
+
+
+class Blake2bPRF(PRF):
+    """Keyed pseudorandom function computing keyed BLAKE2b with a 32 byte output.
+
+    BLAKE2b supports keys of at most 64 bytes, longer keys are first hashed to 64 bytes. The keyed state is derived
+    once and copied for every evaluation.
+    """
+
+    name = 'blake2b'
+    output_size = 32
+
+    _MAX_KEY_SIZE = 64
+
+    def __init__(
+            self,
+            k: bytes,
+    ) -> None:
+        """Initializes the PRF, deriving the keyed BLAKE2b state.
+
+        :param k: The PRF key
+        :type k: bytes
+        :returns: None
+        :rtype: None
+        """
+        self._state = hashlib.blake2b(key=self._shorten_key(k), digest_size=self.output_size)
+
+    def eval(
+            self,
+            e: bytes,
+    ) -> bytes:
+        """Evaluates the PRF on a message.
+
+        :param e: The message
+        :type e: bytes
+        :returns: The keyed BLAKE2b hash of the message
+        :rtype: bytes
+        """
+        state = self._state.copy()
+        state.update(e)
+        return state.digest()
+
+    def eval_many(
+            self,
+            es: Iterable[bytes],
+    ) -> List[bytes]:
+        """Evaluates the PRF on a number of messages.
+
+        :param es: The messages
+        :type es: Iterable[bytes]
+        :returns: The keyed BLAKE2b hash of every message, in order
+        :rtype: List[bytes]
+        """
+        state_copy = self._state.copy
+        results = []
+        for e in es:
+            state = state_copy()
+            state.update(e)
+            results.append(state.digest())
+        return results
+
+    @classmethod
+    def eval_keys(
+            cls,
+            ks: Iterable[bytes],
+            e: bytes,
+    ) -> List[bytes]:
+        """Evaluates the PRF on a single message under a number of keys, each of which is used only once.
+
+        :param ks: The PRF keys
+        :type ks: Iterable[bytes]
+        :param e: The message
+        :type e: bytes
+        :returns: The keyed BLAKE2b hash of the message under every key, in order
+        :rtype: List[bytes]
+        """
+        blake2b = hashlib.blake2b
+        digest_size = cls.output_size
+        return [blake2b(e, key=k, digest_size=digest_size).digest() for k in map(cls._shorten_key, ks)]
+
+    @classmethod
+    def _shorten_key(
+            cls,
+            k: bytes,
+    ) -> bytes:
+        """Hashes keys that are too long to be used as a BLAKE2b key.
+
+        :param k: The PRF key
+        :type k: bytes
+        :returns: A key of at most 64 bytes
+        :rtype: bytes
+        """
+        if len(k) > cls._MAX_KEY_SIZE:
+            return hashlib.blake2b(k, digest_size=cls._MAX_KEY_SIZE).digest()
+        return k
+
+
+class AESPRF(PRF):
+    """Keyed pseudorandom function encrypting a single block with AES in ECB mode, resulting in a 16 byte output.
+
+    Keys that are not a valid AES key size are hashed to a 256 bit key with SHA-256. Messages shorter than a block are
+    padded with a 0x80 byte followed by zero bytes, longer messages are first compressed to a block with SHA-256. As
+    ECB mode encrypts blocks independently, eval_many encrypts all blocks in a single call.
+    """
+
+    name = 'aes'
+    output_size = 16
+
+    _BLOCK_SIZE = 16
+
+    def __init__(
+            self,
+            k: bytes,
+    ) -> None:
+        """Initializes the PRF, expanding the AES key.
+
+        :param k: The PRF key
+        :type k: bytes
+        :returns: None
+        :rtype: None
+        """
+        self._cipher = AES.new(self._aes_key(k), AES.MODE_ECB)
+
+    def eval(
+            self,
+            e: bytes,
+    ) -> bytes:
+        """Evaluates the PRF on a message.
+
+        :param e: The message
+        :type e: bytes
+        :returns: The AES encryption of the message block
+        :rtype: bytes
+        """
+        return self._cipher.encrypt(self._block(e))
+
+    def eval_many(
+            self,
+            es: Iterable[bytes],
+    ) -> List[bytes]:
+        """Evaluates the PRF on a number of messages.
+
+        :param es: The messages
+        :type es: Iterable[bytes]
+        :returns: The AES encryption of every message block, in order
+        :rtype: List[bytes]
+        """
+        cipher_text = self._cipher.encrypt(b''.join(map(self._block, es)))
+        block_size = self._BLOCK_SIZE
+        return [cipher_text[i:i + block_size] for i in range(0, len(cipher_text), block_size)]
+
+    @classmethod
+    def eval_keys(
+            cls,
+            ks: Iterable[bytes],
+            e: bytes,
+    ) -> List[bytes]:
+        """Evaluates the PRF on a single message under a number of keys, each of which is used only once.
+        Note that every key requires its own AES key expansion.
+
+        :param ks: The PRF keys
+        :type ks: Iterable[bytes]
+        :param e: The message
+        :type e: bytes
+        :returns: The AES encryption of the message block under every key, in order
+        :rtype: List[bytes]
+        """
+        block = cls._block(e)
+        return [AES.new(cls._aes_key(k), AES.MODE_ECB).encrypt(block) for k in ks]
+
+    @classmethod
+    def _block(
+            cls,
+            e: bytes,
+    ) -> bytes:
+        """Encodes a message as a single block.
+
+        :param e: The message
+        :type e: bytes
+        :returns: The padded or compressed message
+        :rtype: bytes
+        """
+        if len(e) < cls._BLOCK_SIZE:
+            return (e + b'\x80').ljust(cls._BLOCK_SIZE, b'\0')
+        return hashlib.sha256(e).digest()[:cls._BLOCK_SIZE]
+
+    @staticmethod
+    def _aes_key(
+            k: bytes,
+    ) -> bytes:
+        """Brings a key to a valid AES key size.
+
+        :param k: The PRF key
+        :type k: bytes
+        :returns: The key itself if it has a valid AES key size, its SHA-256 hash otherwise
+        :rtype: bytes
+        """
+        if len(k) in (16, 24, 32):
+            return k
+        return hashlib.sha256(k).digest()
+
+
+"""Available PRF backends, by name."""
+PRF_BACKENDS: Dict[str, Type[PRF]] = {backend.name: backend for backend in [PRF, Blake2bPRF, AESPRF]}
+
+
+def get_prf_backend(
+        name: str,
+) -> Type[PRF]:
+    """Looks up a PRF backend by name.
+
+    :param name: The name of the backend, one of PRF_BACKENDS
+    :type name: str
+    :returns: The PRF class implementing the backend
+    :rtype: Type[PRF]
+    :raises ValueError: If there is no backend with the given name
+    """
+    if name not in PRF_BACKENDS:
+        raise ValueError('Unknown PRF backend \'{0}\', expected one of {1}'.format(name, ', '.join(PRF_BACKENDS)))
+    return PRF_BACKENDS[name]
+
+
 def encrypt(
         key: bytes,
         plain_text: str,
@@ -112,6 +448,51 @@ def decrypt(
     return _unpad(plain_text)
 
 
+def encrypt_bytes(
+        key: bytes,
+        plain_text: bytes,
+) -> bytes:
+    """Encrypts binary data using AES in CBC mode, with PKCS#7 padding.
+
+    :param key: The encryption key
+    :type key: bytes
+    :param plain_text: The data to encrypt
+    :type plain_text: bytes
+    :returns: The random IV followed by the encryption of the data
+    :rtype: bytes
+    """
+    block_size = 16
+    padding = block_size - len(plain_text) % block_size
+    iv = os.urandom(block_size)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    return iv + cipher.encrypt(plain_text + bytes([padding]) * padding)
+
+
+def decrypt_bytes(
+        key: bytes,
+        cipher_text: bytes,
+) -> bytes:
+    """Decrypts cipher text created by encrypt_bytes.
+
+    :param key: The decryption key
+    :type key: bytes
+    :param cipher_text: The IV followed by the cipher text
+    :type cipher_text: bytes
+    :returns: The decrypted data
+    :rtype: bytes
+    :raises ValueError: If the cipher text or its padding is malformed
+    """
+    block_size = 16
+    if len(cipher_text) < 2 * block_size or len(cipher_text) % block_size:
+        raise ValueError('Cipher text should be a whole number of blocks, including the IV')
+    cipher = AES.new(key, AES.MODE_CBC, cipher_text[:block_size])
+    plain_text = cipher.decrypt(cipher_text[block_size:])
+    padding = plain_text[-1]
+    if not 1 <= padding <= block_size or plain_text[-padding:] != bytes([padding]) * padding:
+        raise ValueError('Invalid padding')
+    return plain_text[:-padding]
+
+
 def _pad(
         s: str,
         bs: int,
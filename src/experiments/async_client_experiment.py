@@ -0,0 +1,69 @@
+# Python imports
+import asyncio
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, \
+    start_network_server, ZN_FP_RATE, ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from network.async_client import AsyncClient
+from zhao_nishide.zn_client import ZNClient
+
+
+class AsyncClientExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Async client experiment ---')
+        start_time = time.process_time()
+
+        updates = 5000
+        data = generate_data(updates)
+
+        # Generating tokens bounds the rate at which a single client can send updates
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        token_time = timeit.timeit(lambda: [client.add_token(ind, w) for (ind, w) in data], number=1)
+        print('Generating tokens only: {:.0f} updates/s'.format(updates / token_time))
+
+        configurations = [('1 connection, no batching', 1, 1), ('4 connections, no batching', 4, 1),
+                          ('1 connection, batches of 256', 1, 256), ('4 connections, batches of 256', 4, 256)]
+        for (name, connections, batch_size) in configurations:
+            (server, port) = start_network_server()
+            try:
+                add_time = asyncio.run(self._run(port, data, connections, batch_size))
+                print('{}: {:.0f} updates/s'.format(name, updates / add_time))
+            finally:
+                server.terminate()
+                server.wait()
+
+        print('Taking', time.process_time() - start_time, 'seconds')
+
+    @staticmethod
+    async def _run(
+            port: int,
+            data: list,
+            connections: int,
+            batch_size: int,
+    ) -> float:
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        async_client = AsyncClient(client, port=port, connections=connections, batch_size=batch_size)
+        await async_client.connect()
+
+        # Keep a fixed number of updates in flight, as a steady stream of producers would
+        in_flight = asyncio.Semaphore(1024)
+
+        async def add(ind, w):
+            async with in_flight:
+                await async_client.add(ind, w)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[add(ind, w) for (ind, w) in data])
+        add_time = time.perf_counter() - start
+
+        if sorted(await async_client.search(data[-1][1])) != [data[-1][0]]:
+            raise AssertionError('Search did not return the added document')
+        await async_client.close()
+        return add_time
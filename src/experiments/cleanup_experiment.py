@@ -0,0 +1,64 @@
+# Python imports
+import random
+import time
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, SEED_VALUE, ZN_FP_RATE, \
+    ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from libertas.libertas_server import LibertasServer
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_server import ZNServer
+
+
+class CleanupExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Cleanup experiment ---')
+        random.seed(SEED_VALUE)
+        start_time = time.process_time()
+
+        index_size = 1000
+        rounds = 8
+        churn = 100  # Number of deleted and re-added pairs per round
+        data_set = generate_data(index_size)
+        # Pairs of frequently searched keywords, which are deleted and added again over and over
+        hot_keywords = [w for (_, w) in data_set[:10]]
+        hot_pairs = [(ind, w) for w in hot_keywords for ind in range(index_size, index_size + 10)]
+        data_set = data_set + hot_pairs
+
+        schemes = []
+        for _ in range(2):
+            client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+            client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+            server = LibertasServer(ZNServer())
+            server.build_index()
+            server.add_many(client.add_token(ind, w) for (ind, w) in data_set)
+            schemes.append((client, server))
+
+        search_times = [[], []]
+        result_sizes = [[], []]
+        for round_number in range(rounds):
+            print('Running round', round_number)
+            pairs = random.sample(hot_pairs, churn)
+            for (cleanup, (client, server)) in enumerate(schemes):
+                server.delete_many(client.del_token(ind, w) for (ind, w) in pairs)
+                server.add_many(client.add_token(ind, w) for (ind, w) in pairs)
+
+                round_start = time.perf_counter()
+                sizes = []
+                for w in hot_keywords:
+                    encrypted_results = server.search(client.srch_token(w))
+                    sizes.append(len(encrypted_results))
+                    (_, cleanup_token) = client.consolidate(w, encrypted_results)
+                    if cleanup and cleanup_token is not None:
+                        server.cleanup(cleanup_token)
+                search_times[cleanup].append((time.perf_counter() - round_start) / len(hot_keywords))
+                result_sizes[cleanup].append(sum(sizes) / len(sizes))
+
+        print('Without cleanup, search avg.:', search_times[0])
+        print('Without cleanup, encrypted results avg.:', result_sizes[0])
+        print('With cleanup, search avg.:', search_times[1])
+        print('With cleanup, encrypted results avg.:', result_sizes[1])
+        print('Taking', time.process_time() - start_time, 'seconds')
@@ -0,0 +1,69 @@
+# Python imports
+import os
+import random
+import tempfile
+import time
+import timeit
+from array import array
+from typing import Iterator
+
+# Project imports
+from experiments.experiment_utils import KEYWORD_LENGTH, SEED_VALUE, ZN_FP_RATE, ZN_KEY_LENGTH
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_index_file import ZNIndexFile
+from zhao_nishide.zn_mapped_server import ZNMappedServer
+
+
+class ColdStartExperiment:
+    """Chunk size used to write random index sections (entries)."""
+    CHUNK_SIZE = 100000
+
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Cold start experiment ---')
+        random.seed(SEED_VALUE)
+        start_time = time.process_time()
+
+        client = ZNClient(ZN_FP_RATE, KEYWORD_LENGTH)
+        client.setup(ZN_KEY_LENGTH)
+        srch_token = client.srch_token('*')
+
+        index_sizes = [100000, 1000000, 10000000]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.zn')
+            for index_size in index_sizes:
+                print('Running measurements for index size', index_size)
+
+                stride = (client.bf_size + 7) // 8
+                ZNIndexFile.write(path, 'hmac-sha256', client.bf_size, 32, index_size,
+                                  self._random_chunks(index_size, stride),
+                                  (array('q', range(start, min(start + self.CHUNK_SIZE, index_size)))
+                                   for start in range(0, index_size, self.CHUNK_SIZE)),
+                                  self._random_chunks(index_size, 32))
+                print('File size: {:.1f} MB'.format(os.path.getsize(path) / 1e6))
+
+                server = ZNMappedServer()
+                open_time = timeit.timeit(lambda: server.open(path), number=1)
+                first_result_time = timeit.timeit(lambda: next(server.search_iter(srch_token), None), number=1)
+                print('Open: {:.2f}ms, first search result: {:.2f}ms'.format(open_time * 1e3, first_result_time * 1e3))
+                server.close()
+
+                print('Taking', time.process_time() - start_time, 'seconds')
+
+    def _random_chunks(
+            self,
+            index_size: int,
+            size: int,
+    ) -> Iterator[bytes]:
+        """Generates a random index section, in chunks.
+
+        :param index_size: The number of entries in the section
+        :type index_size: int
+        :param size: The size of an entry in the section (bytes)
+        :type size: int
+        :returns: The chunks of the section
+        :rtype: Iterator[bytes]
+        """
+        for start in range(0, index_size, self.CHUNK_SIZE):
+            yield os.urandom(min(self.CHUNK_SIZE, index_size - start) * size)
@@ -0,0 +1,68 @@
+# Python imports
+import os
+import random
+import time
+import tracemalloc
+from typing import Iterator
+
+# Third-party imports
+from bitarray import bitarray
+
+# Project imports
+from experiments.experiment_utils import KEYWORD_LENGTH, SEED_VALUE, QUERIES, ZN_FP_RATE, ZN_KEY_LENGTH, measure_zn
+from utils import ZNAddToken
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_columnar_server import ZNColumnarServer
+from zhao_nishide.zn_server import ZNServer
+
+
+class ColumnarMemoryExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Columnar memory experiment ---')
+        random.seed(SEED_VALUE)
+        start_time = time.process_time()
+
+        client = ZNClient(ZN_FP_RATE, KEYWORD_LENGTH)
+        client.setup(ZN_KEY_LENGTH)
+        queries = [str(random.randint(0, 99999)).zfill(KEYWORD_LENGTH) for _ in range(QUERIES)]
+
+        index_sizes = [10000, 100000, 1000000]
+        for index_size in index_sizes:
+            print('Running measurements for index size', index_size)
+
+            for server in [ZNServer(), ZNColumnarServer()]:
+                tracemalloc.start()
+                server.build_index()
+                server.add_many(self._random_add_tokens(index_size, client.bf_size))
+                (memory, _) = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                search_time = sum(measure_zn(client, server, query) for query in queries) / len(queries)
+                print('{}: {:.1f} bytes per entry, search avg. {:.3f}s'
+                      .format(type(server).__name__, memory / index_size, search_time))
+                del server
+
+            print('Taking', time.process_time() - start_time, 'seconds')
+
+    @staticmethod
+    def _random_add_tokens(
+            index_size: int,
+            bf_size: int,
+    ) -> Iterator[ZNAddToken]:
+        """Generates add tokens with random Bloom filters and Bloom filter IDs. These cannot be told apart from real add
+        tokens by the server, but are much faster to create.
+
+        :param index_size: The number of add tokens
+        :type index_size: int
+        :param bf_size: The size of the Bloom filters (bits)
+        :type bf_size: int
+        :returns: The add tokens
+        :rtype: Iterator[ZNAddToken]
+        """
+        for ind in range(index_size):
+            bloom_filter = bitarray()
+            bloom_filter.frombytes(os.urandom((bf_size + 7) // 8))
+            del bloom_filter[bf_size:]
+            yield ind, bloom_filter, os.urandom(32), 'hmac-sha256'
@@ -1,4 +1,8 @@
 # Python imports
+import os
+import socket
+import subprocess
+import sys
 import timeit
 
 # Third-party imports
@@ -58,12 +62,8 @@ def prepare_schemes(
     server_lib = LibertasServer(ZNServer())
     server_lib.build_index()
 
-    for (ind, w) in data_set:
-        add_token = client_zn.add_token(ind, w)
-        server_zn.add(add_token)
-
-        add_token = client_lib.add_token(ind, w)
-        server_lib.add(add_token)
+    server_zn.add_many(client_zn.add_token(ind, w) for (ind, w) in data_set)
+    server_lib.add_many(client_lib.add_token(ind, w) for (ind, w) in data_set)
 
     return client_zn, server_zn, client_lib, server_lib
 
@@ -100,3 +100,34 @@ def measure_libertas(
     srch_token = lib_client.srch_token(query)
     t = timeit.Timer(lambda: time_lib(lib_client, lib_server, srch_token))
     return t.timeit(ITERATIONS) / ITERATIONS
+
+
+def measure_dec_search(
+        lib_client: LibertasClient,
+        lib_server: LibertasServer,
+        query: str,
+) -> float:
+    encrypted_results = lib_server.search(lib_client.srch_token(query))
+    t = timeit.Timer(lambda: lib_client.dec_search(encrypted_results))
+    return t.timeit(ITERATIONS) / ITERATIONS
+
+
+def start_network_server(
+        scheme: str = 'libertas',
+) -> (subprocess.Popen, int):
+    """Starts a network server in its own process, listening on a free TCP port on localhost.
+
+    :param scheme: The scheme served, 'libertas' or 'zn'
+    :type scheme: str
+    :returns: The server process, which should be terminated after use, and its port
+    :rtype: (subprocess.Popen, int)
+    """
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    server = subprocess.Popen([sys.executable, '-m', 'src.network.server', '--scheme', scheme, '--port', str(port),
+                               '--report-interval', '0'], cwd=root, stdout=subprocess.PIPE, text=True)
+    # The server reports its address once it is listening
+    server.stdout.readline()
+    return server, port
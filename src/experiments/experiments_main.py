@@ -1,7 +1,20 @@
 # Project imports
+from experiments.async_client_experiment import AsyncClientExperiment
+from experiments.cleanup_experiment import CleanupExperiment
+from experiments.cold_start_experiment import ColdStartExperiment
+from experiments.columnar_memory_experiment import ColumnarMemoryExperiment
 from experiments.deletion_experiment import DeletionExperiment
 from experiments.exact_keyword_search_experiment import ExactKeywordSearchExperiment
+from experiments.incremental_search_experiment import IncrementalSearchExperiment
 from experiments.multiple_results_experiment import MultipleResultsExperiment
+from experiments.network_throughput_experiment import NetworkThroughputExperiment
+from experiments.parallel_search_experiment import ParallelSearchExperiment
+from experiments.prf_backend_experiment import PRFBackendExperiment
+from experiments.prf_experiment import PRFExperiment
+from experiments.segmented_index_experiment import SegmentedIndexExperiment
+from experiments.serialization_experiment import SerializationExperiment
+from experiments.topk_search_experiment import TopKSearchExperiment
+from experiments.update_log_experiment import UpdateLogExperiment
 from experiments.wildcard_query_search_experiment import WildcardQuerySearchExperiment
 
 if __name__ == '__main__':
@@ -9,3 +22,16 @@ if __name__ == '__main__':
     WildcardQuerySearchExperiment()
     DeletionExperiment()
     MultipleResultsExperiment()
+    ParallelSearchExperiment()
+    PRFExperiment()
+    PRFBackendExperiment()
+    ColumnarMemoryExperiment()
+    ColdStartExperiment()
+    UpdateLogExperiment()
+    SegmentedIndexExperiment()
+    NetworkThroughputExperiment()
+    AsyncClientExperiment()
+    SerializationExperiment()
+    CleanupExperiment()
+    IncrementalSearchExperiment()
+    TopKSearchExperiment()
@@ -0,0 +1,58 @@
+# Python imports
+import random
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, SEED_VALUE, ZN_FP_RATE, \
+    ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from libertas.libertas_server import LibertasServer
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_server import ZNServer
+
+
+class IncrementalSearchExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Incremental search experiment ---')
+        random.seed(SEED_VALUE)
+        start_time = time.process_time()
+
+        index_size = 5000
+        polls = 10
+        updates_per_poll = 10
+        data_set = generate_data(index_size)
+        # A polled query matching a tenth of the index
+        q = '0*'
+
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH), search_cache_size=16)
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        server = LibertasServer(ZNServer())
+        server.build_index()
+        server.add_many(client.add_token(ind, w) for (ind, w) in data_set)
+        srch_token = client.srch_token(q)
+
+        def full_search():
+            return client.dec_search(server.search(srch_token))
+
+        def incremental_search():
+            since = client.watermark(q)
+            (encrypted_results, watermark) = server.search_since(srch_token, since)
+            return client.dec_search_since(q, encrypted_results, since, watermark)
+
+        incremental_search()
+        full_times = []
+        incremental_times = []
+        for _ in range(polls):
+            for (ind, w) in random.sample(data_set, updates_per_poll):
+                server.delete(client.del_token(ind, w))
+            full_times.append(timeit.timeit(full_search, number=1))
+            incremental_times.append(timeit.timeit(incremental_search, number=1))
+            if sorted(full_search()) != sorted(incremental_search()):
+                raise AssertionError('Incremental search results differ from full search results')
+
+        print('Full search avg.:', sum(full_times) / polls)
+        print('Incremental search avg.:', sum(incremental_times) / polls)
+        print('Taking', time.process_time() - start_time, 'seconds')
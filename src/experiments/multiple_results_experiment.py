@@ -4,7 +4,7 @@ import time
 
 # Project imports
 from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, SEED_VALUE, INSTANCES, QUERIES, \
-    prepare_schemes, measure_libertas, measure_zn
+    prepare_schemes, measure_dec_search, measure_libertas, measure_zn
 
 
 class MultipleResultsExperiment:
@@ -30,6 +30,7 @@ class MultipleResultsExperiment:
 
             search_times_zn = []
             search_times_lib = []
+            dec_search_times = []
 
             for instance_number in range(INSTANCES):
                 print('Running instance', instance_number)
@@ -37,6 +38,7 @@ class MultipleResultsExperiment:
                 for _ in range(QUERIES):
                     search_times_zn.append(measure_zn(client_zn, server_zn, keyword))
                     search_times_lib.append(measure_libertas(client_lib, server_lib, keyword))
+                    dec_search_times.append(measure_dec_search(client_lib, server_lib, keyword))
 
                 print('Taking', time.process_time() - start_time, 'seconds')
 
@@ -45,3 +47,4 @@ class MultipleResultsExperiment:
 
             print('ZN   avg.:', sum(search_times_zn) / len(search_times_zn))
             print('Lib. avg.:', sum(search_times_lib) / len(search_times_lib))
+            print('Lib. dec_search avg.:', sum(dec_search_times) / len(dec_search_times))
@@ -0,0 +1,57 @@
+# Python imports
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, \
+    start_network_server, ZN_FP_RATE, ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from network.client import NetworkClient
+from network.protocol import FrameType
+from serialization import encode_token
+from zhao_nishide.zn_client import ZNClient
+
+
+class NetworkThroughputExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Network throughput experiment ---')
+        start_time = time.process_time()
+
+        updates = 20000
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        add_tokens = [client.add_token(ind, w) for (ind, w) in generate_data(updates)]
+
+        # Run the server in its own process on localhost, as it would be deployed
+        (server, port) = start_network_server()
+        try:
+            connection = NetworkClient('127.0.0.1', port)
+
+            def pipelined():
+                for add_token in add_tokens:
+                    connection.send(FrameType.ADD, encode_token(add_token))
+                for _ in add_tokens:
+                    connection.receive()
+
+            def batched():
+                for start in range(0, updates, 1000):
+                    connection.add_many(add_tokens[start:start + 1000])
+
+            runs = [('One request at a time', lambda: [connection.add(add_token) for add_token in add_tokens]),
+                    ('Pipelined', pipelined), ('Batches of 1000', batched)]
+            for (name, run) in runs:
+                add_time = timeit.timeit(run, number=1)
+                print('{}: {:.0f} updates/s'.format(name, updates / add_time))
+
+            srch_token = client.srch_token('1234*')
+            search_time = timeit.timeit(lambda: connection.search(srch_token), number=10) / 10
+            print('Search over {} updates: {:.1f} ms'.format(3 * updates, search_time * 1000))
+            print('Server:', connection.stats())
+            connection.close()
+        finally:
+            server.terminate()
+            server.wait()
+
+        print('Taking', time.process_time() - start_time, 'seconds')
@@ -0,0 +1,49 @@
+# Python imports
+import os
+import random
+import time
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, SEED_VALUE, QUERIES, ZN_FP_RATE, \
+    ZN_KEY_LENGTH, measure_zn
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_parallel_server import ZNParallelServer
+from zhao_nishide.zn_server import ZNServer
+
+
+class ParallelSearchExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Parallel search experiment ---')
+        random.seed(SEED_VALUE)
+        start_time = time.process_time()
+
+        cores = os.cpu_count() or 1
+        workers_array = sorted({2 ** n for n in range(cores.bit_length()) if 2 ** n <= cores} | {cores})
+
+        index_sizes = [10000, 100000]
+        for index_size in index_sizes:
+            print('Running measurements for index size', index_size)
+
+            data_set = generate_data(index_size)
+            client = ZNClient(ZN_FP_RATE, KEYWORD_LENGTH)
+            client.setup(ZN_KEY_LENGTH)
+            add_tokens = [client.add_token(ind, w) for (ind, w) in data_set]
+            queries = [str(random.randint(0, index_size - 1)).zfill(KEYWORD_LENGTH) for _ in range(QUERIES)]
+
+            server = ZNServer()
+            server.build_index()
+            server.add_many(add_tokens)
+            baseline = sum(measure_zn(client, server, query) for query in queries) / len(queries)
+            print('1 core (ZNServer): {:.3f}s'.format(baseline))
+
+            for workers in workers_array:
+                server = ZNParallelServer(workers)
+                server.build_index()
+                server.add_many(add_tokens)
+                search_time = sum(measure_zn(client, server, query) for query in queries) / len(queries)
+                server.close()
+                print('{} workers: {:.3f}s, speedup {:.2f}x'.format(workers, search_time, baseline / search_time))
+
+            print('Taking', time.process_time() - start_time, 'seconds')
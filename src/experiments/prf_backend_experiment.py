@@ -0,0 +1,40 @@
+# Python imports
+import random
+import time
+import timeit
+
+# Project imports
+from crypto import PRF_BACKENDS
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, SEED_VALUE, QUERIES, ZN_FP_RATE, \
+    ZN_KEY_LENGTH, measure_zn
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_server import ZNServer
+
+
+class PRFBackendExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- PRF backend experiment ---')
+        random.seed(SEED_VALUE)
+        start_time = time.process_time()
+
+        index_size = 10000
+        data_set = generate_data(index_size)
+        queries = [str(random.randint(0, index_size - 1)).zfill(KEYWORD_LENGTH) for _ in range(QUERIES)]
+
+        for prf in PRF_BACKENDS:
+            print('Running measurements for PRF backend', prf)
+
+            client = ZNClient(ZN_FP_RATE, KEYWORD_LENGTH, prf)
+            client.setup(ZN_KEY_LENGTH)
+            server = ZNServer(prf=prf)
+            server.build_index()
+
+            add_time = timeit.timeit(lambda: server.add_many(client.add_token(ind, w) for (ind, w) in data_set),
+                                     number=1)
+            search_times = [measure_zn(client, server, query) for query in queries]
+
+            print('Add avg.:   ', add_time / index_size)
+            print('Search avg.:', sum(search_times) / len(search_times))
+            print('Taking', time.process_time() - start_time, 'seconds')
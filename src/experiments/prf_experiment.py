@@ -0,0 +1,41 @@
+# Python imports
+import hashlib
+import hmac
+import os
+import timeit
+
+# Project imports
+from crypto import PRF
+
+"""
+Evaluation parameters
+"""
+KEY_LENGTHS = [32, 256]  # Bloom filter IDs are 32 bytes, ZN keys are 256 bytes
+MESSAGE = b'1234'  # Similar to the Bloom filter positions hashed by ZN
+CALLS = 100000
+
+
+class PRFExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- PRF experiment ---')
+
+        for key_length in KEY_LENGTHS:
+            print('Running measurements for key length', key_length)
+            k = os.urandom(key_length)
+            prf = PRF(k)
+            keys = [os.urandom(key_length) for _ in range(CALLS)]
+
+            hmac_time = timeit.timeit(lambda: hmac.new(k, MESSAGE, hashlib.sha256).digest(), number=CALLS)
+            prf_time = timeit.timeit(lambda: prf.eval(MESSAGE), number=CALLS)
+            prf_many_time = timeit.timeit(lambda: prf.eval_many([MESSAGE] * CALLS), number=1)
+            hmac_keys_time = timeit.timeit(lambda: [hmac.new(key, MESSAGE, hashlib.sha256).digest() for key in keys],
+                                           number=1)
+            prf_keys_time = timeit.timeit(lambda: PRF.eval_keys(keys, MESSAGE), number=1)
+
+            print('hmac.new:      {:.3f}us per call'.format(hmac_time / CALLS * 1e6))
+            print('PRF.eval:      {:.3f}us per call'.format(prf_time / CALLS * 1e6))
+            print('PRF.eval_many: {:.3f}us per call'.format(prf_many_time / CALLS * 1e6))
+            print('hmac.new, one call per key: {:.3f}us per call'.format(hmac_keys_time / CALLS * 1e6))
+            print('PRF.eval_keys:              {:.3f}us per call'.format(prf_keys_time / CALLS * 1e6))
@@ -0,0 +1,50 @@
+# Python imports
+import random
+import statistics
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, SEED_VALUE, ZN_FP_RATE, ZN_KEY_LENGTH
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_segmented_server import ZNSegmentedServer
+from zhao_nishide.zn_server import ZNServer
+
+
+class SegmentedIndexExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Segmented index experiment ---')
+        start_time = time.process_time()
+
+        index_size = 20000
+        rounds = 20
+        updates_per_round = 500
+        data_set = generate_data(index_size + rounds * updates_per_round)
+        client = ZNClient(ZN_FP_RATE, KEYWORD_LENGTH)
+        client.setup(ZN_KEY_LENGTH)
+        add_tokens = [client.add_token(ind, w) for (ind, w) in data_set]
+        del_tokens = [client.del_token(ind, w) for (ind, w) in data_set]
+
+        for server in [ZNServer(), ZNSegmentedServer()]:
+            print('Running measurements for', type(server).__name__)
+            random.seed(SEED_VALUE)
+            server.build_index()
+            server.add_many(add_tokens[:index_size])
+
+            # Every round adds new pairs, deletes the oldest ones and searches for a random live keyword
+            (update_times, search_times) = ([], [])
+            for r in range(rounds):
+                start = index_size + r * updates_per_round
+                update_times.append(timeit.timeit(lambda: (
+                    server.add_many(add_tokens[start:start + updates_per_round]),
+                    server.delete_many(del_tokens[r * updates_per_round:(r + 1) * updates_per_round])), number=1))
+                (_, w) = data_set[random.randint(start + updates_per_round - index_size, start + updates_per_round - 1)]
+                srch_token = client.srch_token(w)
+                search_times.append(timeit.timeit(lambda: server.search(srch_token), number=1))
+
+            print('Update round avg.: {:.4f}s, max: {:.4f}s'.format(statistics.mean(update_times), max(update_times)))
+            print('Search avg.: {:.3f}s, max: {:.3f}s, stdev: {:.3f}s'
+                  .format(statistics.mean(search_times), max(search_times), statistics.stdev(search_times)))
+            print('Taking', time.process_time() - start_time, 'seconds')
@@ -0,0 +1,44 @@
+# Python imports
+import pickle
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, ZN_FP_RATE, \
+    ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from serialization import decode_token, decode_updates, encode_token, encode_updates
+from zhao_nishide.zn_client import ZNClient
+
+
+class SerializationExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Serialization experiment ---')
+        start_time = time.process_time()
+
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        add_tokens = [client.add_token(ind, w) for (ind, w) in generate_data(2000)]
+        srch_tokens = [client.srch_token(q) for q in ['00001', '0000_', '0*1', '*']]
+        updates = [add_token[0] for add_token in add_tokens]
+
+        values = [('Add tokens', add_tokens, encode_token, decode_token),
+                  ('Search tokens', srch_tokens, encode_token, decode_token),
+                  ('Encrypted updates', [updates], encode_updates, decode_updates)]
+        for (name, tokens, encode, decode) in values:
+            size = sum(len(encode(token)) for token in tokens)
+            pickle_size = sum(len(pickle.dumps(token, protocol=pickle.HIGHEST_PROTOCOL)) for token in tokens)
+            encoded = [encode(token) for token in tokens]
+            pickled = [pickle.dumps(token, protocol=pickle.HIGHEST_PROTOCOL) for token in tokens]
+            encode_time = timeit.timeit(lambda: [encode(token) for token in tokens], number=10) / 10
+            pickle_time = timeit.timeit(lambda: [pickle.dumps(token, protocol=pickle.HIGHEST_PROTOCOL)
+                                                 for token in tokens], number=10) / 10
+            decode_time = timeit.timeit(lambda: [decode(data) for data in encoded], number=10) / 10
+            unpickle_time = timeit.timeit(lambda: [pickle.loads(data) for data in pickled], number=10) / 10
+            print('{}: {} vs {} bytes, encode {:.2f} vs {:.2f} ms, decode {:.2f} vs {:.2f} ms (binary vs pickle)'
+                  .format(name, size, pickle_size, encode_time * 1000, pickle_time * 1000, decode_time * 1000,
+                          unpickle_time * 1000))
+
+        print('Taking', time.process_time() - start_time, 'seconds')
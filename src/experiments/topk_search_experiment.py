@@ -0,0 +1,41 @@
+# Python imports
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, ZN_FP_RATE, ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from libertas.libertas_server import LibertasServer
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_server import ZNServer
+
+
+class TopKSearchExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Top-k search experiment ---')
+        start_time = time.process_time()
+
+        index_size = 20000
+        data_set = generate_data(index_size)
+        queries = ['0*', '1____', '*9']
+
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        server = LibertasServer(ZNServer())
+        server.build_index()
+        server.add_many(client.add_token(ind, w) for (ind, w) in data_set)
+
+        for k in [1, 10, 100]:
+            full_times = []
+            topk_times = []
+            for q in queries:
+                srch_token = client.srch_token(q)
+                full_times.append(timeit.timeit(lambda: client.dec_search(server.search(srch_token)), number=1))
+                topk_times.append(timeit.timeit(
+                    lambda: client.dec_search_topk(q, server.search_iter(srch_token, newest_first=True), k), number=1))
+            print('k = {}: full search avg. {:.3f} s, top-k search avg. {:.3f} s'
+                  .format(k, sum(full_times) / len(queries), sum(topk_times) / len(queries)))
+
+        print('Taking', time.process_time() - start_time, 'seconds')
@@ -0,0 +1,43 @@
+# Python imports
+import tempfile
+import time
+import timeit
+
+# Project imports
+from experiments.experiment_utils import generate_data, KEYWORD_LENGTH, LIBERTAS_KEY_LENGTH, ZN_FP_RATE, \
+    ZN_KEY_LENGTH
+from libertas.libertas_client import LibertasClient
+from libertas.libertas_durable_server import LibertasDurableServer
+from libertas.libertas_server import LibertasServer
+from zhao_nishide.zn_client import ZNClient
+from zhao_nishide.zn_server import ZNServer
+
+
+class UpdateLogExperiment:
+    def __init__(
+            self,
+    ) -> None:
+        print('--- Update log experiment ---')
+        start_time = time.process_time()
+
+        updates = 20000
+        client = LibertasClient(ZNClient(ZN_FP_RATE, KEYWORD_LENGTH))
+        client.setup((LIBERTAS_KEY_LENGTH, ZN_KEY_LENGTH))
+        add_tokens = [client.add_token(ind, w) for (ind, w) in generate_data(updates)]
+
+        server = LibertasServer(ZNServer())
+        server.build_index()
+        add_time = timeit.timeit(lambda: [server.add(add_token) for add_token in add_tokens], number=1)
+        print('No log: {:.0f} updates/s'.format(updates / add_time))
+
+        policies = [('fsync every update', 1, 0), ('fsync every 1000 updates', 1000, 0), ('fsync every 10ms', 0, 10),
+                    ('no fsync', 0, 0)]
+        for (name, fsync_records, fsync_interval) in policies:
+            with tempfile.TemporaryDirectory() as directory:
+                server = LibertasDurableServer(ZNServer(), directory, fsync_records, fsync_interval)
+                server.build_index()
+                add_time = timeit.timeit(lambda: [server.add(add_token) for add_token in add_tokens], number=1)
+                server.close()
+                print('{}: {:.0f} updates/s, {} fsyncs'.format(name, updates / add_time, server.log.syncs))
+
+        print('Taking', time.process_time() - start_time, 'seconds')
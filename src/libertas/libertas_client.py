@@ -1,12 +1,13 @@
 # Python imports
-import math
 import os
-from typing import Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 # Project imports
-from src.crypto import decrypt, encrypt
+from src.crypto import decrypt_bytes, encrypt_bytes
+from src.libertas.libertas_replay import UpdateReplay
+from src.serialization import decode_update_record, encode_update_record
 from src.sigma_interface.sigma_client import SigmaClient
-from src.utils import Update, Op, AddToken, SrchToken
+from src.utils import Update, Op, AddToken, SrchToken, CleanupToken, LRUCache, matches_query
 from src.zhao_nishide.zn_client import ZNClient
 
 
@@ -20,17 +21,31 @@ class LibertasClient(object):
     def __init__(
             self,
             sigma: SigmaClient[AddToken, SrchToken],
+            keyword_dictionary: bool = False,
+            search_cache_size: int = 0,
     ) -> None:
         """Initializes a Libertas client, setting the underlying client scheme that is used.
 
+        Encrypted updates hold the keyword itself, unless keyword_dictionary is set. The client then numbers keywords in
+        the order it first sees them and stores these numbers instead, which keeps the updates of long keywords small.
+        The dictionary is part of the client state, it is needed to decrypt the updates later on.
+
         :param sigma: The underlying SSE scheme used by this Libertas instance
         :type sigma: ZNClient
+        :param keyword_dictionary: Whether to store keyword IDs instead of keywords in encrypted updates
+        :type keyword_dictionary: bool
+        :param search_cache_size: The number of most recently searched queries of which the replayed results are
+        cached, see dec_search_since
+        :type search_cache_size: int
         :returns: None
         :rtype: None
         """
         self.sigma: SigmaClient = sigma
         self.k = None
         self.t = None
+        self.keyword_ids: Optional[Dict[str, int]] = {} if keyword_dictionary else None
+        self.keywords: List[str] = []
+        self.search_cache: LRUCache[str, Tuple[UpdateReplay, int]] = LRUCache(search_cache_size)
 
     def setup(
             self,
@@ -51,17 +66,32 @@ class LibertasClient(object):
 
     def srch_token(
             self,
-            q: str,
+            q: Union[str, Any],
     ) -> SrchToken:
         """Creates a search token for a query, to be send to the server.
 
-        :param q: The query, a string of characters, possibly containing wildcards
-        :type q: str
+        :param q: The query, a string of characters, possibly containing wildcards, or a query compiled by compile_query
+        :type q: Union[str, Any]
         :returns: The search token
         :rtype: SrchToken
         """
         return self.sigma.srch_token(q)
 
+    def compile_query(
+            self,
+            q: str,
+    ) -> Any:
+        """Compiles a query with the underlying scheme, so its search token can be reused for repeated searches.
+        Libertas search tokens are those of the underlying scheme, so compiled queries remain valid as updates are
+        added.
+
+        :param q: The query, a string of characters, possibly containing wildcards
+        :type q: str
+        :returns: The compiled query
+        :rtype: Any
+        """
+        return self.sigma.compile_query(q)
+
     def add_token(
             self,
             ind: int,
@@ -100,42 +130,172 @@ class LibertasClient(object):
 
     def dec_search(
             self,
-            r_star: List[int],
-    ) -> List[int]:
+            r_star: List[bytes],
+            group_by_keyword: bool = False,
+    ) -> Union[List[int], Dict[str, List[int]]]:
         """Decrypts encrypted updates received from the server and determines which document identifiers are still
         relevant for the query. Document identifiers are relevant when there is a keyword-document pair that is
-        added, but not deleted afterwards.
+        added, but not deleted afterwards. The updates are replayed in a single pass, see UpdateReplay.
 
         :param r_star: A list of encrypted updates
-        :type r_star: List[int]
-        :returns: A list of document identifiers matching with the initial query
+        :type r_star: List[bytes]
+        :param group_by_keyword: Whether to return the relevant document identifiers per matching keyword
+        :type group_by_keyword: bool
+        :returns: A list of document identifiers matching with the initial query, or a dictionary mapping every matching
+        keyword to its document identifiers if group_by_keyword is set
+        :rtype: Union[List[int], Dict[str, List[int]]]
+        """
+        replay = UpdateReplay()
+        replay.apply_many(map(self._decrypt_update, r_star))
+        return replay.results_per_keyword() if group_by_keyword else replay.results()
+
+    def dec_search_topk(
+            self,
+            q: str,
+            r_star: Iterable[bytes],
+            k: int,
+    ) -> List[int]:
+        """Decrypts encrypted updates streamed newest first by LibertasServer.search_iter and determines the k most
+        recently added document identifiers that are relevant for the query. The update of a document-keyword pair with
+        the highest timestamp seen so far decides whether it is present, as in dec_search. The stream is no longer
+        consumed once k documents are present, which ends the scan of the server.
+
+        Stopping early is only correct if the updates of a pair are added to the index in timestamp order, as they are
+        when the client awaits every update before making a conflicting one. Updates sent concurrently, e.g. over the
+        connection pool of AsyncClient, may be added out of order; an update with a higher timestamp that was added
+        before the part of the stream that was consumed is then missed, so use dec_search for such indexes. Updates of
+        keywords that do not match the query are skipped, as the stream need not hold all of their updates.
+
+        :param q: The query the updates are streamed for
+        :type q: str
+        :param r_star: Encrypted updates, newest first
+        :type r_star: Iterable[bytes]
+        :param k: The maximum number of document identifiers to return
+        :type k: int
+        :returns: At most k document identifiers matching with the query, the most recently added first
         :rtype: List[int]
         """
-        # Decrypt r_star and sort it according to timestamp t
-        decrypted_updates: List[Update] = list(map(lambda e: self._decrypt_update(e), r_star))
-        decrypted_updates.sort(key=lambda x: x[0])
-
-        keyword_documents_dict: Dict[str, List[int]] = {}
-        for update in decrypted_updates:
-            # Unpack entry (see utils.Update)
-            (t, op, ind, w) = update
-
-            if w not in keyword_documents_dict:
-                keyword_documents_dict[w] = []
-
-            documents_list: List[int] = keyword_documents_dict[w]
-            if op == Op.ADD and ind not in documents_list:
-                # Add ind to the results for this keyword
-                documents_list.append(ind)
-                keyword_documents_dict[w] = documents_list
-            elif op == Op.DEL and ind in documents_list:
-                # Remove ind from the results for this keyword
-                documents_list.remove(ind)
-                keyword_documents_dict[w] = documents_list
-
-        # Combine the ind values for all keywords and remove duplicates
-        results = [ind for sub_results in keyword_documents_dict.values() for ind in sub_results]
-        return list(set(results))
+        if k <= 0:
+            return []
+        decisive: Dict[Tuple[str, int], Tuple[int, Op]] = {}
+        # Number of present pairs per document, in the order the documents became present
+        present: Dict[int, int] = {}
+        for cipher_text in r_star:
+            (t, op, ind, w) = self._decrypt_update(cipher_text)
+            previous = decisive.get((w, ind))
+            if (previous is not None and previous[0] > t) or not matches_query(q, w):
+                continue
+            decisive[(w, ind)] = (t, op)
+            if previous is not None and previous[1] is Op.ADD:
+                present[ind] -= 1
+                if not present[ind]:
+                    del present[ind]
+            if op is Op.ADD:
+                present[ind] = present.get(ind, 0) + 1
+                if len(present) == k:
+                    break
+        return list(present)
+
+    def watermark(
+            self,
+            q: str,
+    ) -> int:
+        """Determines the insertion sequence number up to which the results of a query are cached, to be passed to
+        LibertasServer.search_since.
+
+        :param q: The query
+        :type q: str
+        :returns: The insertion sequence number, or 0 if the results of the query are not cached
+        :rtype: int
+        """
+        cached = self.search_cache.get(q)
+        return cached[1] if cached is not None else 0
+
+    def dec_search_since(
+            self,
+            q: str,
+            r_star: List[bytes],
+            since: int,
+            watermark: int,
+            group_by_keyword: bool = False,
+    ) -> Union[List[int], Dict[str, List[int]]]:
+        """Decrypts the encrypted updates returned by LibertasServer.search_since for a query and replays them on top of
+        the cached results of the previous search for the query, see dec_search. Only the new updates are decrypted. The
+        results are cached under the returned insertion sequence number.
+
+        The updates can only be replayed on top of the cached results they were fetched for. If those results were
+        evicted or replaced after watermark(q) was called, the search should be repeated with since set to 0.
+
+        :param q: The query
+        :type q: str
+        :param r_star: A list of encrypted updates, added after insertion sequence number since
+        :type r_star: List[bytes]
+        :param since: The insertion sequence number the updates were fetched from, as given by watermark(q)
+        :type since: int
+        :param watermark: The insertion sequence number returned by the server along with the updates
+        :type watermark: int
+        :param group_by_keyword: Whether to return the relevant document identifiers per matching keyword
+        :type group_by_keyword: bool
+        :returns: A list of document identifiers matching with the query, or a dictionary mapping every matching
+        keyword to its document identifiers if group_by_keyword is set
+        :rtype: Union[List[int], Dict[str, List[int]]]
+        :raises ValueError: If since is not 0 and the results of the query are not cached up to since
+        """
+        if since == 0:
+            replay = UpdateReplay()
+        else:
+            cached = self.search_cache.get(q)
+            if cached is None or cached[1] != since:
+                raise ValueError('The results of the query are not cached up to sequence number {0}, search again from '
+                                 '0'.format(since))
+            replay = cached[0]
+        replay.apply_many(map(self._decrypt_update, r_star))
+        self.search_cache.put(q, (replay, watermark))
+        return replay.results_per_keyword() if group_by_keyword else replay.results()
+
+    def consolidate(
+            self,
+            q: str,
+            r_star: List[bytes],
+            group_by_keyword: bool = False,
+    ) -> Tuple[Union[List[int], Dict[str, List[int]]], Optional[CleanupToken]]:
+        """Decrypts the encrypted updates a search for a query returned, as dec_search does, and creates a cleanup token
+        consolidating them, to be send to the server. The token removes the updates from the index and adds a fresh add
+        update for every document-keyword pair that is still present, so later searches return fewer updates.
+
+        Every present pair is encrypted again under a new timestamp, also when its update was the only one, so the
+        server does not learn which of the updates were obsolete. Only updates of keywords matching the query are
+        consolidated: the underlying scheme may return updates of other keywords as false positives, without the rest
+        of their history. Creating a cleanup token empties the search cache, see dec_search_since.
+
+        :param q: The query the updates were returned for, a string of characters, possibly containing wildcards
+        :type q: str
+        :param r_star: A list of encrypted updates
+        :type r_star: List[bytes]
+        :param group_by_keyword: Whether to return the relevant document identifiers per matching keyword
+        :type group_by_keyword: bool
+        :returns: The results of dec_search and the cleanup token, or None if none of the updates are obsolete
+        :rtype: Tuple[Union[List[int], Dict[str, List[int]]], Optional[CleanupToken]]
+        """
+        replay = UpdateReplay()
+        matching_replay = UpdateReplay()
+        matching = []
+        for cipher_text in r_star:
+            update = self._decrypt_update(cipher_text)
+            replay.apply(update)
+            if matches_query(q, update[3]):
+                matching_replay.apply(update)
+                matching.append((cipher_text, update[3]))
+        results = replay.results_per_keyword() if group_by_keyword else replay.results()
+
+        present = matching_replay.results_per_keyword()
+        if len(matching) == sum(map(len, present.values())):
+            return results, None
+        # The cleanup removes updates that cached results may not have seen yet
+        self.search_cache.clear()
+        del_tokens = [self.sigma.del_token(cipher_text, w) for (cipher_text, w) in matching]
+        add_tokens = [self.add_token(ind, w) for (w, documents) in present.items() for ind in documents]
+        return results, (del_tokens, add_tokens)
 
     def _encrypt_update(
             self,
@@ -143,8 +303,8 @@ class LibertasClient(object):
             op: Op,
             ind: int,
             w: str,
-    ) -> int:
-        """Encrypts a (t, op, ind, w) tuple.
+    ) -> bytes:
+        """Encrypts a (t, op, ind, w) tuple, encoded as an update record (see encode_update_record).
 
         :param t: The timestamp in the tuple
         :type t: int
@@ -155,26 +315,26 @@ class LibertasClient(object):
         :param w: The keyword in the tuple
         :type w: str
         :returns: The tuple in encrypted form
-        :rtype: int
+        :rtype: bytes
         """
-        update_str: str = '{0},{1},{2},{3}'.format(t, op.value, ind, w)
-        encrypted_update_str: bytes = encrypt(self.k, update_str)
-        return int.from_bytes(encrypted_update_str, byteorder='big')
+        keyword_id = None
+        if self.keyword_ids is not None:
+            keyword_id = self.keyword_ids.get(w)
+            if keyword_id is None:
+                keyword_id = self.keyword_ids[w] = len(self.keywords)
+                self.keywords.append(w)
+        return encrypt_bytes(self.k, encode_update_record((t, op, ind, w), keyword_id))
 
     def _decrypt_update(
             self,
-            cipher_text: int,
+            cipher_text: bytes,
     ) -> Update:
         """Decrypts the encryption of a (t, op, ind, w) tuple.
 
         :param cipher_text: The encrypted tuple
-        :type cipher_text: int
+        :type cipher_text: bytes
         :returns: The (t, op, ind, w) tuple
         :rtype: Update
+        :raises ValueError: If the cipher text does not hold an update record
         """
-        # Ensure byte alignment of 16 because of CBC mode
-        byte_length = math.ceil(math.log(cipher_text, 2) / 8 / 16) * 16
-        cipher_text_bytes: bytes = int.to_bytes(cipher_text, byteorder='big', length=byte_length)
-        update_str: str = decrypt(self.k, cipher_text_bytes)
-        (t, op, ind, w) = update_str.split(',')
-        return int(t), Op(int(op)), int(ind), w
+        return decode_update_record(decrypt_bytes(self.k, cipher_text), self.keywords)
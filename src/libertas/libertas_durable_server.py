@@ -0,0 +1,253 @@
+# Python imports
+import os
+import pickle
+import struct
+from typing import Any, Iterable
+
+# Project imports
+from src.libertas.libertas_server import LibertasServer
+from src.libertas.libertas_update_log import UpdateLog
+from src.sigma_interface.sigma_server import SigmaServer
+from src.utils import AddToken, CleanupToken, SrchToken
+
+
+class LibertasDurableServer(LibertasServer):
+    """Libertas server that survives restarts, by writing every update to a write-ahead log before applying it.
+
+    The server keeps two files in its directory: the update log (see UpdateLog) and a snapshot of the underlying server,
+    taken every checkpoint_records records or when checkpoint is called. After a snapshot is taken the log is emptied.
+    On recovery the last snapshot is loaded and the records that were logged after it are applied again.
+
+    Snapshots pickle the underlying server, so it should be picklable, as ZNServer and ZNColumnarServer are.
+    """
+
+    """Snapshot header: magic, sequence number of the last update captured in the snapshot."""
+    SNAPSHOT_HEADER = struct.Struct('<8sQ')
+    SNAPSHOT_MAGIC = b'LIBSNAP\0'
+
+    def __init__(
+            self,
+            sigma: SigmaServer[AddToken, SrchToken],
+            directory: str,
+            fsync_records: int = 0,
+            fsync_interval: float = 0,
+            checkpoint_records: int = 0,
+    ) -> None:
+        """Initializes a durable Libertas server.
+
+        :param sigma: The underlying SSE scheme used by this Libertas instance
+        :type sigma: SigmaServer
+        :param directory: The directory holding the update log and the snapshot
+        :type directory: str
+        :param fsync_records: The number of logged updates after which the log is synced, or 0 to not sync by count
+        :type fsync_records: int
+        :param fsync_interval: The time after which logged updates are synced (ms), or 0 to not sync by time. Without
+        either, the log is only synced at checkpoints and when the server is closed
+        :type fsync_interval: float
+        :param checkpoint_records: The number of logged updates after which a snapshot is taken, or 0 to only take
+        snapshots when checkpoint is called
+        :type checkpoint_records: int
+        :returns: None
+        :rtype: None
+        """
+        super().__init__(sigma)
+        self.directory = directory
+        self.log = UpdateLog(os.path.join(directory, 'updates.log'), fsync_records, fsync_interval)
+        self.snapshot_path = os.path.join(directory, 'snapshot')
+        self.checkpoint_records = checkpoint_records
+        self.records_since_checkpoint = 0
+
+    def build_index(
+            self,
+    ) -> None:
+        """Sets up the Libertas server with an empty index, discarding any snapshot and update log in its directory.
+
+        :returns: None
+        :rtype: None
+        """
+        self.log.close()
+        os.makedirs(self.directory, exist_ok=True)
+        for path in [self.snapshot_path, self.log.path]:
+            if os.path.exists(path):
+                os.remove(path)
+        super().build_index()
+        self.log.seq = 0
+        self.log.open()
+        self.records_since_checkpoint = 0
+
+    def recover(
+            self,
+    ) -> None:
+        """Sets up the Libertas server from its directory, loading the last snapshot and applying the updates that were
+        logged after it. Without a snapshot, the updates are applied to a new index.
+
+        :returns: None
+        :rtype: None
+        """
+        self.log.close()
+        os.makedirs(self.directory, exist_ok=True)
+        seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as file:
+                (magic, seq) = self.SNAPSHOT_HEADER.unpack(file.read(self.SNAPSHOT_HEADER.size))
+                if magic != self.SNAPSHOT_MAGIC:
+                    raise ValueError('{0} is not a Libertas snapshot'.format(self.snapshot_path))
+                self.sigma = pickle.load(file)
+        else:
+            super().build_index()
+
+        records = self.log.recover(seq)
+        for (_, command, argument) in records:
+            self._apply(command, argument)
+        self.log.open(seq)
+        self.records_since_checkpoint = len(records)
+
+    def add(
+            self,
+            add_token: AddToken,
+    ) -> None:
+        """Logs an add update and adds it to the index (see utils.Update).
+
+        :param add_token: The add token generated from the update by the client
+        :type add_token: AddToken
+        :returns: None
+        :rtype: None
+        """
+        self._log('add', add_token)
+
+    def add_many(
+            self,
+            add_tokens: Iterable[AddToken],
+    ) -> None:
+        """Logs a number of add updates as a single record and adds them to the index in bulk (see utils.Update).
+
+        :param add_tokens: The add tokens generated from the updates by the client
+        :type add_tokens: Iterable[AddToken]
+        :returns: None
+        :rtype: None
+        """
+        self._log('add_many', list(add_tokens))
+
+    def delete(
+            self,
+            del_token: AddToken,
+    ) -> None:
+        """Logs a delete update and adds it to the index (see utils.Update).
+
+        :param del_token: The delete token generated from the update by the client
+        :type del_token: AddToken
+        :returns: None
+        :rtype: None
+        """
+        self._log('add', del_token)
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[AddToken],
+    ) -> None:
+        """Logs a number of delete updates as a single record and adds them to the index in bulk (see utils.Update).
+
+        :param del_tokens: The delete tokens generated from the updates by the client
+        :type del_tokens: Iterable[AddToken]
+        :returns: None
+        :rtype: None
+        """
+        self._log('add_many', list(del_tokens))
+
+    def cleanup(
+            self,
+            cleanup_token: CleanupToken,
+    ) -> None:
+        """Logs a cleanup as a single record and applies it to the index, so it is recovered either completely or not at
+        all (see LibertasServer.cleanup).
+
+        :param cleanup_token: The cleanup token generated from the search results by the client
+        :type cleanup_token: CleanupToken
+        :returns: None
+        :rtype: None
+        """
+        (del_tokens, add_tokens) = cleanup_token
+        self._log('replace', (list(del_tokens), list(add_tokens)))
+
+    def checkpoint(
+            self,
+    ) -> None:
+        """Takes a snapshot of the index and empties the update log. The snapshot is written next to the previous one
+        and moved into place once it is complete, so a crash at any point leaves a usable snapshot and log behind.
+
+        :returns: None
+        :rtype: None
+        """
+        self.log.sync()
+        temporary_path = self.snapshot_path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.log.seq))
+            pickle.dump(self.sigma, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+        self.log.truncate()
+        self.records_since_checkpoint = 0
+
+    def close(
+            self,
+    ) -> None:
+        """Syncs and closes the update log. The server can be set up again with recover.
+
+        :returns: None
+        :rtype: None
+        """
+        self.log.close()
+
+    def _log(
+            self,
+            command: str,
+            argument: Any,
+    ) -> None:
+        """Applies an update to the index and logs it, taking a snapshot when the checkpoint interval is reached. The
+        update is checked as a whole before any of it is applied, and logged only after the index accepted it, so an
+        update the index rejects neither reaches the log nor partially changes the index.
+
+        :param command: The name of the method of the underlying server applying the update
+        :type command: str
+        :param argument: The argument of the method
+        :type argument: Any
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the index rejects the update
+        """
+        if command == 'add':
+            self.sigma.validate([argument])
+        elif command == 'add_many':
+            self.sigma.validate(argument)
+        elif command == 'replace':
+            self.sigma.validate(argument[1])
+        self._apply(command, argument)
+        self.log.append(command, argument)
+        self.records_since_checkpoint += 1
+        if self.checkpoint_records and self.records_since_checkpoint >= self.checkpoint_records:
+            self.checkpoint()
+
+    def _apply(
+            self,
+            command: str,
+            argument: Any,
+    ) -> None:
+        """Applies a logged update to the index.
+
+        :param command: The name of the method of the underlying server applying the update
+        :type command: str
+        :param argument: The argument of the method
+        :type argument: Any
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the command is unknown
+        """
+        if command == 'add':
+            self.sigma.add(argument)
+        elif command == 'add_many':
+            self.sigma.add_many(argument)
+        elif command == 'replace':
+            self.sigma.replace(*argument)
+        else:
+            raise ValueError('Unknown update log command: {0}'.format(command))
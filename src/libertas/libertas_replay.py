@@ -0,0 +1,83 @@
+# Python imports
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Project imports
+from src.utils import Op, Update
+
+
+class UpdateReplay(object):
+    """Replays decrypted Libertas updates to determine which document-keyword pairs are present.
+
+    The state of a document-keyword pair is decided by its update with the highest timestamp, so updates can be applied
+    in any order. Every update is applied in constant time: the replay keeps the timestamp of the decisive update of
+    every pair and, per keyword, the set of documents whose decisive update is an add.
+    """
+
+    def __init__(
+            self,
+    ) -> None:
+        """Initializes an empty replay.
+
+        :returns: None
+        :rtype: None
+        """
+        self.timestamps: Dict[Tuple[str, int], int] = {}
+        self.documents: Dict[str, Set[int]] = {}
+
+    def apply(
+            self,
+            update: Update,
+    ) -> None:
+        """Applies an update, unless a later update of the same document-keyword pair has been applied.
+
+        :param update: The (t, op, ind, w) update
+        :type update: Update
+        :returns: None
+        :rtype: None
+        """
+        (t, op, ind, w) = update
+        pair = (w, ind)
+        if self.timestamps.get(pair, -1) > t:
+            return
+        self.timestamps[pair] = t
+        documents = self.documents.get(w)
+        if documents is None:
+            documents = self.documents[w] = set()
+        if op is Op.ADD:
+            documents.add(ind)
+        else:
+            documents.discard(ind)
+
+    def apply_many(
+            self,
+            updates: Iterable[Update],
+    ) -> None:
+        """Applies a number of updates, see apply.
+
+        :param updates: The (t, op, ind, w) updates
+        :type updates: Iterable[Update]
+        :returns: None
+        :rtype: None
+        """
+        for update in updates:
+            self.apply(update)
+
+    def results(
+            self,
+    ) -> List[int]:
+        """Determines the documents that are present for any keyword.
+
+        :returns: The document identifiers, each listed once
+        :rtype: List[int]
+        """
+        return list(set().union(*self.documents.values()))
+
+    def results_per_keyword(
+            self,
+    ) -> Dict[str, List[int]]:
+        """Determines the documents that are present per keyword. Keywords without documents are left out.
+
+        :returns: The document identifiers per keyword
+        :rtype: Dict[str, List[int]]
+        """
+        return {w: list(documents) for (w, documents) in self.documents.items() if documents}
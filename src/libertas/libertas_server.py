@@ -1,9 +1,9 @@
 # Python imports
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 # Project imports
 from src.sigma_interface.sigma_server import SigmaServer
-from src.utils import AddToken, SrchToken
+from src.utils import AddToken, CleanupToken, SrchToken
 
 
 class LibertasServer(object):
@@ -39,16 +39,59 @@ class LibertasServer(object):
     def search(
             self,
             srch_token: SrchToken,
-    ) -> List[int]:
+    ) -> List[bytes]:
         """Searches the index using a search token, resulting in encrypted results.
 
         :param srch_token: The search token generated by the client
         :type srch_token: SrchToken
         :returns: A list of encrypted updates
-        :rtype: List[int]
+        :rtype: List[bytes]
         """
         return self.sigma.search(srch_token)
 
+    def search_since(
+            self,
+            srch_token: SrchToken,
+            since: int = 0,
+    ) -> Tuple[List[bytes], int]:
+        """Searches the updates added after an insertion sequence number using a search token, see
+        LibertasClient.dec_search_since.
+
+        :param srch_token: The search token generated by the client
+        :type srch_token: SrchToken
+        :param since: The insertion sequence number returned by an earlier search, or 0 to search all updates
+        :type since: int
+        :returns: A list of encrypted updates added after the insertion sequence number, and the insertion sequence
+        number of the last added update
+        :rtype: Tuple[List[bytes], int]
+        :raises NotImplementedError: If the underlying scheme does not number its entries
+        """
+        return self.sigma.search_since(srch_token, since)
+
+    def search_iter(
+            self,
+            srch_token: SrchToken,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[bytes]:
+        """Searches the index using a search token, yielding encrypted results as they are found.
+        Note that the limit counts encrypted updates, not documents: delete updates and repeated updates of the same
+        document-keyword pair count towards it as well, so the updates yielded may resolve to fewer than limit
+        documents. Updates streamed newest first can be resolved while they arrive, see LibertasClient.dec_search_topk.
+
+        :param srch_token: The search token generated by the client
+        :type srch_token: SrchToken
+        :param limit: The maximum number of encrypted updates (not documents) to yield, or None to yield all matches
+        :type limit: Optional[int]
+        :param newest_first: Whether to yield the updates in reverse insertion order
+        :type newest_first: bool
+        :returns: An iterator over encrypted updates
+        :rtype: Iterator[bytes]
+        :raises NotImplementedError: If updates are to be yielded newest first, but the underlying scheme does not keep
+        its entries in insertion order
+        """
+        return self.sigma.search_iter(srch_token, limit, newest_first)
+
     def add(
             self,
             add_token: AddToken,
@@ -62,6 +105,19 @@ class LibertasServer(object):
         """
         self.sigma.add(add_token)
 
+    def add_many(
+            self,
+            add_tokens: Iterable[AddToken],
+    ) -> None:
+        """Adds a number of add updates to the index in bulk (see utils.Update).
+
+        :param add_tokens: The add tokens generated from the updates by the client
+        :type add_tokens: Iterable[AddToken]
+        :returns: None
+        :rtype: None
+        """
+        self.sigma.add_many(add_tokens)
+
     def delete(
             self,
             del_token: AddToken,
@@ -74,3 +130,31 @@ class LibertasServer(object):
         :rtype: None
         """
         self.sigma.add(del_token)
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[AddToken],
+    ) -> None:
+        """Adds a number of delete updates to the index in bulk (see utils.Update).
+
+        :param del_tokens: The delete tokens generated from the updates by the client
+        :type del_tokens: Iterable[AddToken]
+        :returns: None
+        :rtype: None
+        """
+        self.sigma.add_many(del_tokens)
+
+    def cleanup(
+            self,
+            cleanup_token: CleanupToken,
+    ) -> None:
+        """Replaces encrypted updates returned by a search with their consolidated form (see
+        LibertasClient.consolidate), removing the obsolete updates from the index in the same step.
+
+        :param cleanup_token: The cleanup token generated from the search results by the client
+        :type cleanup_token: CleanupToken
+        :returns: None
+        :rtype: None
+        """
+        (del_tokens, add_tokens) = cleanup_token
+        self.sigma.replace(del_tokens, add_tokens)
@@ -0,0 +1,200 @@
+# Python imports
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Any, List, Optional, Tuple
+
+"""Type declaration for update log records, (sequence number, command, argument) tuples."""
+Record = Tuple[int, str, Any]
+
+
+class UpdateLog(object):
+    """Append-only, length-prefixed log of the updates applied to a Libertas server.
+
+    Every record starts with a header holding the length of its payload, a CRC-32 checksum and its sequence number,
+    followed by the pickled (command, argument) payload. Records reach the operating system as soon as they are
+    appended, but are only forced to disk (fsync) every fsync_records records, every fsync_interval milliseconds, or
+    when sync is called. Grouping records per fsync is what makes high update rates possible, at the cost of losing the
+    records since the last fsync when the machine crashes.
+    """
+
+    """Record header: payload length, CRC-32 checksum of sequence number and payload, sequence number."""
+    RECORD_HEADER = struct.Struct('<IIQ')
+
+    def __init__(
+            self,
+            path: str,
+            fsync_records: int = 0,
+            fsync_interval: float = 0,
+    ) -> None:
+        """Initializes an update log, without opening it.
+
+        :param path: The path of the log file
+        :type path: str
+        :param fsync_records: The number of records after which the log is synced, or 0 to not sync by count
+        :type fsync_records: int
+        :param fsync_interval: The time after which appended records are synced (ms), or 0 to not sync by time
+        :type fsync_interval: float
+        :returns: None
+        :rtype: None
+        """
+        if fsync_records < 0 or fsync_interval < 0:
+            raise ValueError('The fsync batching parameters cannot be negative')
+        self.path = path
+        self.fsync_records = fsync_records
+        self.fsync_interval = fsync_interval
+        self.file = None
+        self.seq = 0
+        self.unsynced = 0
+        self.syncs = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.syncer: Optional[threading.Thread] = None
+
+    def recover(
+            self,
+            after_seq: int = 0,
+    ) -> List[Record]:
+        """Reads the records in the log. A record that was only partially written, or is corrupt, ends the log, it and
+        anything after it is cut off.
+
+        :param after_seq: Only records with a higher sequence number are returned
+        :type after_seq: int
+        :returns: The records, in the order they were appended
+        :rtype: List[Record]
+        """
+        records = []
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, 'r+b') as file:
+            data = file.read()
+            end = 0
+            while end + self.RECORD_HEADER.size <= len(data):
+                (length, checksum, seq) = self.RECORD_HEADER.unpack_from(data, end)
+                start = end + self.RECORD_HEADER.size
+                payload = data[start:start + length]
+                if len(payload) < length or zlib.crc32(payload, zlib.crc32(data[end + 8:start])) != checksum:
+                    break
+                if seq > after_seq:
+                    records.append((seq,) + pickle.loads(payload))
+                self.seq = max(self.seq, seq)
+                end = start + length
+            if end < len(data):
+                file.truncate(end)
+        return records
+
+    def open(
+            self,
+            seq: int = 0,
+    ) -> None:
+        """Opens the log for appending records.
+
+        :param seq: The sequence number of the last applied update, the next record is numbered one higher
+        :type seq: int
+        :returns: None
+        :rtype: None
+        """
+        self.close()
+        self.file = open(self.path, 'ab')
+        self.seq = max(self.seq, seq)
+        self.stopped.clear()
+        if self.fsync_interval > 0:
+            self.syncer = threading.Thread(target=self._sync_periodically, daemon=True)
+            self.syncer.start()
+
+    def append(
+            self,
+            command: str,
+            argument: Any,
+    ) -> int:
+        """Appends a record to the log, syncing it if the record count of the batch is reached.
+
+        :param command: The update command, e.g. the name of the server method applying it
+        :type command: str
+        :param argument: The argument of the command
+        :type argument: Any
+        :returns: The sequence number of the record
+        :rtype: int
+        """
+        payload = pickle.dumps((command, argument), protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.seq += 1
+            seq_bytes = struct.pack('<Q', self.seq)
+            header = self.RECORD_HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(seq_bytes)), self.seq)
+            self.file.write(header + payload)
+            self.file.flush()
+            self.unsynced += 1
+            if self.fsync_records and self.unsynced >= self.fsync_records:
+                self._sync()
+            return self.seq
+
+    def sync(
+            self,
+    ) -> None:
+        """Forces all appended records to disk.
+
+        :returns: None
+        :rtype: None
+        """
+        with self.lock:
+            self._sync()
+
+    def truncate(
+            self,
+    ) -> None:
+        """Removes all records from the log, after they have been captured in a snapshot. Sequence numbers continue
+        where they were.
+
+        :returns: None
+        :rtype: None
+        """
+        with self.lock:
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def close(
+            self,
+    ) -> None:
+        """Syncs and closes the log, if it is open.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.syncer is not None:
+            self.stopped.set()
+            self.syncer.join()
+            self.syncer = None
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def _sync(
+            self,
+    ) -> None:
+        """Forces all appended records to disk, if there are any. The lock should be held.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.syncs += 1
+
+    def _sync_periodically(
+            self,
+    ) -> None:
+        """Background loop syncing the log every fsync_interval milliseconds while records are being appended.
+
+        :returns: None
+        :rtype: None
+        """
+        while not self.stopped.wait(self.fsync_interval / 1000):
+            with self.lock:
+                if self.unsynced:
+                    self._sync()
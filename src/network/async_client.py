@@ -0,0 +1,442 @@
+# Python imports
+import asyncio
+import json
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# Project imports
+from src.network.protocol import decode_batch, encode_batch, encode_frame, FrameType, read_frame, Status
+from src.serialization import decode_updates, encode_token
+
+
+class AsyncConnection(object):
+    """Connection to a NetworkServer on which any number of requests can be outstanding. Requests are written as soon
+    as they are made and a reader task matches responses to requests by their request ID. Writes are serialized by a
+    lock, as concurrent drains of a paused transport are not supported before Python 3.10.
+    """
+
+    def __init__(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+    ) -> None:
+        """Initializes a connection from an opened stream. Use AsyncConnection.open to connect to a server.
+
+        :param reader: The incoming stream of the connection
+        :type reader: asyncio.StreamReader
+        :param writer: The outgoing stream of the connection
+        :type writer: asyncio.StreamWriter
+        :returns: None
+        :rtype: None
+        """
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_request_id = 0
+        self.write_lock = asyncio.Lock()
+        self.receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    @classmethod
+    async def open(
+            cls,
+            host: str = '127.0.0.1',
+            port: int = 9000,
+            path: Optional[str] = None,
+    ) -> 'AsyncConnection':
+        """Connects to a server, over a Unix socket if a path is given and over TCP otherwise.
+
+        :param host: The host of the server
+        :type host: str
+        :param port: The TCP port of the server
+        :type port: int
+        :param path: The path of the Unix socket of the server
+        :type path: Optional[str]
+        :returns: The connection
+        :rtype: AsyncConnection
+        """
+        if path is not None:
+            (reader, writer) = await asyncio.open_unix_connection(path)
+        else:
+            (reader, writer) = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(
+            self,
+            frame_type: FrameType,
+            payload: bytes,
+    ) -> bytes:
+        """Sends a request and waits for its response, while other requests may be sent on the connection.
+
+        :param frame_type: The type of the request
+        :type frame_type: FrameType
+        :param payload: The payload of the request
+        :type payload: bytes
+        :returns: The payload of the response
+        :rtype: bytes
+        :raises ConnectionError: If the connection is closed before the response arrives
+        :raises ValueError: If the request failed
+        """
+        if self.receiver.done():
+            raise ConnectionError('Connection closed')
+        request_id = self.next_request_id
+        self.next_request_id = (self.next_request_id + 1) & 0xFFFFFFFF
+        response = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = response
+        async with self.write_lock:
+            self.writer.write(encode_frame(request_id, frame_type.value, payload))
+            await self.writer.drain()
+        return await response
+
+    async def close(
+            self,
+    ) -> None:
+        """Closes the connection, failing the requests that have not been answered.
+
+        :returns: None
+        :rtype: None
+        """
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self.receiver
+
+    async def _receive(
+            self,
+    ) -> None:
+        """Receives responses until the connection is closed, completing the requests they answer.
+
+        :returns: None
+        :rtype: None
+        """
+        try:
+            while True:
+                (request_id, status, payload) = await read_frame(self.reader)
+                response = self.pending.pop(request_id, None)
+                if response is None or response.done():
+                    continue
+                if status == Status.OK.value:
+                    response.set_result(payload)
+                else:
+                    response.set_exception(ValueError(payload.decode('utf-8')))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            for response in self.pending.values():
+                if not response.done():
+                    response.set_exception(ConnectionError('Connection closed'))
+            self.pending.clear()
+
+
+class AsyncClient(object):
+    """Asyncio client of a NetworkServer, wrapping a LibertasClient or a Z&N client.
+
+    Requests are spread over a pool of connections, sending each request to the connection with the fewest outstanding
+    requests, and are pipelined on those connections. Updates are collected into batch frames: a batch is sent once it
+    holds batch_size updates or batch_delay milliseconds after its first update. Generating tokens and decrypting
+    search results happens in an executor, so the event loop is not blocked by cryptographic work. The wrapped client
+    is only used by one thread at a time.
+
+    Updates that are awaited concurrently may be applied in any order. A Libertas index orders updates by their
+    timestamps, but with a Z&N client an update should be awaited before a conflicting one is made. The same holds for
+    Libertas indexes searched with LibertasClient.dec_search_topk, which assumes updates are added in timestamp order.
+    """
+
+    """Default number of connections in the pool."""
+    CONNECTIONS = 4
+
+    """Default maximum number of updates in a batch frame."""
+    BATCH_SIZE = 256
+
+    """Default time an update waits for other updates to be batched with (ms)."""
+    BATCH_DELAY = 1.
+
+    def __init__(
+            self,
+            client: Any,
+            host: str = '127.0.0.1',
+            port: int = 9000,
+            path: Optional[str] = None,
+            connections: int = CONNECTIONS,
+            batch_size: int = BATCH_SIZE,
+            batch_delay: float = BATCH_DELAY,
+            executor: Optional[Executor] = None,
+    ) -> None:
+        """Initializes an asyncio client. Call connect before making requests.
+
+        :param client: The client generating the tokens, a LibertasClient or a Z&N client that has been set up
+        :type client: Any
+        :param host: The host of the server
+        :type host: str
+        :param port: The TCP port of the server
+        :type port: int
+        :param path: The path of the Unix socket of the server, which is used instead of TCP if given
+        :type path: Optional[str]
+        :param connections: The number of connections in the pool
+        :type connections: int
+        :param batch_size: The maximum number of updates in a batch frame, or 1 to send every update in its own frame
+        :type batch_size: int
+        :param batch_delay: The time an update waits for other updates to be batched with (ms)
+        :type batch_delay: float
+        :param executor: The executor generating tokens and decrypting results, by default a single thread
+        :type executor: Optional[Executor]
+        :returns: None
+        :rtype: None
+        """
+        self.client = client
+        self.host = host
+        self.port = port
+        self.path = path
+        self.size = connections
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.owns_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(1)
+        self.client_lock = threading.Lock()
+        self.connections: List[AsyncConnection] = []
+        self.batch: List[Tuple[FrameType, int, str, asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.senders = set()
+
+    async def connect(
+            self,
+    ) -> None:
+        """Opens the connections of the pool.
+
+        :returns: None
+        :rtype: None
+        """
+        self.connections = list(await asyncio.gather(
+            *[AsyncConnection.open(self.host, self.port, self.path) for _ in range(self.size)]))
+
+    async def close(
+            self,
+    ) -> None:
+        """Sends the updates that are still being batched and closes the connections.
+
+        :returns: None
+        :rtype: None
+        """
+        self.flush()
+        if self.senders:
+            await asyncio.wait(self.senders)
+        await asyncio.gather(*[connection.close() for connection in self.connections])
+        self.connections = []
+        if self.owns_executor:
+            self.executor.shutdown()
+
+    async def add(
+            self,
+            ind: int,
+            w: str,
+    ) -> None:
+        """Adds a document-keyword pair to the index of the server.
+
+        :param ind: The document identifier
+        :type ind: int
+        :param w: The keyword
+        :type w: str
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the server failed to add the pair
+        """
+        await self._update(FrameType.ADD, ind, w)
+
+    async def delete(
+            self,
+            ind: int,
+            w: str,
+    ) -> None:
+        """Deletes a document-keyword pair from the index of the server.
+
+        :param ind: The document identifier
+        :type ind: int
+        :param w: The keyword
+        :type w: str
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the server failed to delete the pair
+        """
+        await self._update(FrameType.DELETE, ind, w)
+
+    async def search(
+            self,
+            q: Any,
+    ) -> List[int]:
+        """Searches the index of the server.
+
+        :param q: The query, a string possibly containing wildcards, or a query compiled by the wrapped client
+        :type q: Any
+        :returns: The document identifiers matching the query
+        :rtype: List[int]
+        :raises ValueError: If the search failed
+        """
+        payload = await self._run(lambda: encode_token(self._locked(self.client.srch_token, q)))
+        response = await self._connection().request(FrameType.SEARCH, payload)
+        return await self._run(lambda: self._dec_search(decode_updates(response)))
+
+    async def stats(
+            self,
+    ) -> Dict[str, Any]:
+        """Retrieves the throughput of the server.
+
+        :returns: The statistics reported by NetworkServer.stats
+        :rtype: Dict[str, Any]
+        """
+        return json.loads(await self._connection().request(FrameType.STATS, b''))
+
+    def flush(
+            self,
+    ) -> None:
+        """Sends the updates that are being batched without waiting for the batch to fill up.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.batch:
+            return
+        (batch, self.batch) = (self.batch, [])
+        sender = asyncio.get_running_loop().create_task(self._send_batch(batch))
+        self.senders.add(sender)
+        sender.add_done_callback(self.senders.discard)
+
+    async def _update(
+            self,
+            frame_type: FrameType,
+            ind: int,
+            w: str,
+    ) -> None:
+        """Adds an update to the batch being collected and waits until the server has applied it.
+
+        :param frame_type: ADD or DELETE
+        :type frame_type: FrameType
+        :param ind: The document identifier
+        :type ind: int
+        :param w: The keyword
+        :type w: str
+        :returns: None
+        :rtype: None
+        """
+        loop = asyncio.get_running_loop()
+        applied = loop.create_future()
+        self.batch.append((frame_type, ind, w, applied))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_delay / 1000, self.flush)
+        await applied
+
+    async def _send_batch(
+            self,
+            batch: List[Tuple[FrameType, int, str, asyncio.Future]],
+    ) -> None:
+        """Generates the tokens of a batch of updates and sends them, in a batch frame if there is more than one. Every
+        update is completed: if the server does not answer each update of a batch frame, all of them fail.
+
+        :param batch: The type, document identifier, keyword and completion of every update
+        :type batch: List[Tuple[FrameType, int, str, asyncio.Future]]
+        :returns: None
+        :rtype: None
+        """
+        try:
+            items = await self._run(self._encode_updates, batch)
+            if len(items) == 1:
+                await self._connection().request(FrameType(items[0][0]), items[0][1])
+                responses = [(Status.OK.value, b'')]
+            else:
+                responses = decode_batch(await self._connection().request(FrameType.BATCH, encode_batch(items)))
+                if len(responses) != len(batch):
+                    raise ValueError('Expected {0} responses to a batch of updates, got {1}'
+                                     .format(len(batch), len(responses)))
+        except Exception as error:
+            responses = [(Status.ERROR.value, error)] * len(batch)
+        for ((_, _, _, applied), (status, response)) in zip(batch, responses):
+            if applied.done():
+                continue
+            if status == Status.OK.value:
+                applied.set_result(None)
+            else:
+                applied.set_exception(response if isinstance(response, Exception)
+                                      else ValueError(response.decode('utf-8')))
+
+    def _encode_updates(
+            self,
+            batch: List[Tuple[FrameType, int, str, asyncio.Future]],
+    ) -> List[Tuple[int, bytes]]:
+        """Generates and encodes the tokens of a batch of updates, in the executor.
+
+        :param batch: The type, document identifier, keyword and completion of every update
+        :type batch: List[Tuple[FrameType, int, str, asyncio.Future]]
+        :returns: The frame types and payloads of the updates
+        :rtype: List[Tuple[int, bytes]]
+        """
+        with self.client_lock:
+            tokens = [(frame_type, self.client.add_token(ind, w) if frame_type == FrameType.ADD
+                       else self.client.del_token(ind, w)) for (frame_type, ind, w, _) in batch]
+        return [(frame_type.value, encode_token(token)) for (frame_type, token) in tokens]
+
+    def _dec_search(
+            self,
+            results: Union[List[int], List[bytes]],
+    ) -> List[int]:
+        """Decrypts search results if the wrapped client encrypts its updates, as Libertas does.
+
+        :param results: The results returned by the server
+        :type results: Union[List[int], List[bytes]]
+        :returns: The document identifiers matching the query
+        :rtype: List[int]
+        """
+        if hasattr(self.client, 'dec_search'):
+            return self._locked(self.client.dec_search, results)
+        return results
+
+    def _locked(
+            self,
+            function: Callable,
+            *args: Any,
+    ) -> Any:
+        """Calls a method of the wrapped client while no other thread uses it.
+
+        :param function: The method
+        :type function: Callable
+        :param args: The arguments of the method
+        :type args: Any
+        :returns: The result of the method
+        :rtype: Any
+        """
+        with self.client_lock:
+            return function(*args)
+
+    async def _run(
+            self,
+            function: Callable,
+            *args: Any,
+    ) -> Any:
+        """Runs a function in the executor.
+
+        :param function: The function
+        :type function: Callable
+        :param args: The arguments of the function
+        :type args: Any
+        :returns: The result of the function
+        :rtype: Any
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _connection(
+            self,
+    ) -> AsyncConnection:
+        """Picks the connection of the pool with the fewest outstanding requests.
+
+        :returns: The connection
+        :rtype: AsyncConnection
+        :raises ConnectionError: If the client is not connected
+        """
+        if not self.connections:
+            raise ConnectionError('Not connected, call connect first')
+        return min(self.connections, key=lambda connection: len(connection.pending))
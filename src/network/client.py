@@ -0,0 +1,249 @@
+# Python imports
+import json
+import socket
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Project imports
+from src.network.protocol import decode_batch, encode_batch, encode_frame, FRAME_HEADER, FrameType, MAX_FRAME_SIZE, \
+    SEQUENCE, Status
+from src.serialization import decode_updates, encode_token
+from src.utils import CleanupToken
+
+
+class NetworkClient(object):
+    """Blocking client of a NetworkServer, sending the tokens generated by a Libertas or Z&N client over a single
+    connection.
+
+    Requests can be pipelined by sending a number of them before receiving their responses. Responses arrive in the
+    order the requests were sent in.
+    """
+
+    def __init__(
+            self,
+            host: str = '127.0.0.1',
+            port: int = 9000,
+            path: Optional[str] = None,
+    ) -> None:
+        """Initializes a network client, connecting to a Unix socket if a path is given and to a TCP port otherwise.
+
+        :param host: The host of the server
+        :type host: str
+        :param port: The TCP port of the server
+        :type port: int
+        :param path: The path of the Unix socket of the server
+        :type path: Optional[str]
+        :returns: None
+        :rtype: None
+        """
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host, port))
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile('rb')
+        self.next_request_id = 0
+
+    def send(
+            self,
+            frame_type: FrameType,
+            payload: bytes,
+    ) -> int:
+        """Sends a request without waiting for its response.
+
+        :param frame_type: The type of the request
+        :type frame_type: FrameType
+        :param payload: The payload of the request
+        :type payload: bytes
+        :returns: The ID of the request
+        :rtype: int
+        """
+        request_id = self.next_request_id
+        self.next_request_id = (self.next_request_id + 1) & 0xFFFFFFFF
+        self.socket.sendall(encode_frame(request_id, frame_type.value, payload))
+        return request_id
+
+    def receive(
+            self,
+    ) -> Tuple[int, bytes]:
+        """Receives the response to the oldest request that has not been answered yet.
+
+        :returns: The ID of the request and the payload of the response
+        :rtype: Tuple[int, bytes]
+        :raises ConnectionError: If the server closed the connection
+        :raises ValueError: If the request failed
+        """
+        header = self.file.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            raise ConnectionError('Connection closed by the server')
+        (length, request_id, status) = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME_SIZE:
+            raise ValueError('Frame of {0} bytes exceeds the maximum frame size'.format(length))
+        payload = self.file.read(length)
+        if len(payload) < length:
+            raise ConnectionError('Connection closed by the server')
+        if status != Status.OK.value:
+            raise ValueError(payload.decode('utf-8'))
+        return request_id, payload
+
+    def request(
+            self,
+            frame_type: FrameType,
+            payload: bytes,
+    ) -> bytes:
+        """Sends a request and waits for its response.
+
+        :param frame_type: The type of the request
+        :type frame_type: FrameType
+        :param payload: The payload of the request
+        :type payload: bytes
+        :returns: The payload of the response
+        :rtype: bytes
+        :raises ValueError: If the request failed
+        """
+        self.send(frame_type, payload)
+        return self.receive()[1]
+
+    def add(
+            self,
+            add_token: Any,
+    ) -> None:
+        """Adds an add token to the index of the server.
+
+        :param add_token: The add token
+        :type add_token: Any
+        :returns: None
+        :rtype: None
+        """
+        self.request(FrameType.ADD, encode_token(add_token))
+
+    def add_many(
+            self,
+            add_tokens: Iterable[Any],
+    ) -> None:
+        """Adds a number of add tokens to the index of the server, sending them in a single batch frame.
+
+        :param add_tokens: The add tokens
+        :type add_tokens: Iterable[Any]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If adding a token failed
+        """
+        self._batch(FrameType.ADD, add_tokens)
+
+    def delete(
+            self,
+            del_token: Any,
+    ) -> None:
+        """Sends a delete token to the server: a Libertas delete token or a Z&N Bloom filter ID.
+
+        :param del_token: The delete token
+        :type del_token: Any
+        :returns: None
+        :rtype: None
+        """
+        self.request(FrameType.DELETE, encode_token(del_token))
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[Any],
+    ) -> None:
+        """Sends a number of delete tokens to the server in a single batch frame.
+
+        :param del_tokens: The delete tokens
+        :type del_tokens: Iterable[Any]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If deleting a token failed
+        """
+        self._batch(FrameType.DELETE, del_tokens)
+
+    def cleanup(
+            self,
+            cleanup_token: CleanupToken,
+    ) -> None:
+        """Sends a cleanup token to a Libertas server, see LibertasClient.consolidate.
+
+        :param cleanup_token: The cleanup token
+        :type cleanup_token: CleanupToken
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the cleanup failed
+        """
+        (del_tokens, add_tokens) = cleanup_token
+        items = [(FrameType.DELETE.value, encode_token(token)) for token in del_tokens]
+        items.extend((FrameType.ADD.value, encode_token(token)) for token in add_tokens)
+        self.request(FrameType.CLEANUP, encode_batch(items))
+
+    def search(
+            self,
+            srch_token: Any,
+    ) -> Union[List[int], List[bytes]]:
+        """Searches the index of the server using a search token.
+
+        :param srch_token: The search token
+        :type srch_token: Any
+        :returns: The search results: encrypted updates (Libertas) or document identifiers (Z&N)
+        :rtype: Union[List[int], List[bytes]]
+        """
+        return decode_updates(self.request(FrameType.SEARCH, encode_token(srch_token)))
+
+    def search_since(
+            self,
+            srch_token: Any,
+            since: int = 0,
+    ) -> Tuple[Union[List[int], List[bytes]], int]:
+        """Searches the entries of the index of the server that were added after an insertion sequence number.
+
+        :param srch_token: The search token
+        :type srch_token: Any
+        :param since: The insertion sequence number returned by an earlier search, or 0 to search all entries
+        :type since: int
+        :returns: The search results among the new entries, and the insertion sequence number of the last added entry
+        :rtype: Tuple[Union[List[int], List[bytes]], int]
+        :raises ValueError: If the search failed
+        """
+        response = self.request(FrameType.SEARCH_SINCE, SEQUENCE.pack(since) + encode_token(srch_token))
+        (sequence,) = SEQUENCE.unpack_from(response)
+        return decode_updates(response[SEQUENCE.size:]), sequence
+
+    def stats(
+            self,
+    ) -> Dict[str, Any]:
+        """Retrieves the throughput of the server.
+
+        :returns: The statistics reported by NetworkServer.stats
+        :rtype: Dict[str, Any]
+        """
+        return json.loads(self.request(FrameType.STATS, b''))
+
+    def close(
+            self,
+    ) -> None:
+        """Closes the connection.
+
+        :returns: None
+        :rtype: None
+        """
+        self.file.close()
+        self.socket.close()
+
+    def _batch(
+            self,
+            frame_type: FrameType,
+            tokens: Iterable[Any],
+    ) -> None:
+        """Sends a number of tokens of the same type in a single batch frame.
+
+        :param frame_type: The type of the frames in the batch
+        :type frame_type: FrameType
+        :param tokens: The tokens
+        :type tokens: Iterable[Any]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If a request in the batch failed
+        """
+        payload = encode_batch([(frame_type.value, encode_token(token)) for token in tokens])
+        for (status, response) in decode_batch(self.request(FrameType.BATCH, payload)):
+            if status != Status.OK.value:
+                raise ValueError(response.decode('utf-8'))
@@ -0,0 +1,113 @@
+# Python imports
+import asyncio
+import struct
+from enum import Enum
+from typing import List, Tuple
+
+"""Frame header: payload length, request ID, frame type (requests) or status (responses)."""
+FRAME_HEADER = struct.Struct('<IIB')
+
+"""Largest accepted frame payload (bytes)."""
+MAX_FRAME_SIZE = 1 << 26
+
+"""Header of a frame inside a batch: frame type (requests) or status (responses), payload length."""
+BATCH_ITEM_HEADER = struct.Struct('<BI')
+
+"""Insertion sequence number preceding the payload of an incremental search request and of its response."""
+SEQUENCE = struct.Struct('<Q')
+
+
+class FrameType(Enum):
+    """Enum representing the types of request frames. The payload of a cleanup frame is a batch of delete frames
+    followed by add frames. An incremental search frame holds a search token preceded by an insertion sequence number,
+    see SEQUENCE."""
+    ADD = 1
+    DELETE = 2
+    SEARCH = 3
+    BATCH = 4
+    STATS = 5
+    CLEANUP = 6
+    SEARCH_SINCE = 7
+
+
+class Status(Enum):
+    """Enum representing the status of a response frame. The payload of an error response is the error message."""
+    OK = 0
+    ERROR = 1
+
+
+def encode_frame(
+        request_id: int,
+        kind: int,
+        payload: bytes,
+) -> bytes:
+    """Encodes a frame: a header holding the payload length, request ID and frame type or status, followed by the
+    payload.
+
+    :param request_id: The ID of the request, which the response repeats
+    :type request_id: int
+    :param kind: The frame type of a request, or the status of a response
+    :type kind: int
+    :param payload: The payload
+    :type payload: bytes
+    :returns: The frame
+    :rtype: bytes
+    """
+    return FRAME_HEADER.pack(len(payload), request_id, kind) + payload
+
+
+async def read_frame(
+        reader: asyncio.StreamReader,
+) -> Tuple[int, int, bytes]:
+    """Reads a frame from a stream.
+
+    :param reader: The stream
+    :type reader: asyncio.StreamReader
+    :returns: The request ID, the frame type or status, and the payload
+    :rtype: Tuple[int, int, bytes]
+    :raises asyncio.IncompleteReadError: If the stream ends
+    :raises ValueError: If the frame exceeds the maximum frame size
+    """
+    (length, request_id, kind) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError('Frame of {0} bytes exceeds the maximum frame size'.format(length))
+    return request_id, kind, await reader.readexactly(length)
+
+
+def encode_batch(
+        items: List[Tuple[int, bytes]],
+) -> bytes:
+    """Encodes the payload of a batch frame, which holds a number of frames without request IDs.
+
+    :param items: The frame types (requests) or statuses (responses) and payloads of the frames
+    :type items: List[Tuple[int, bytes]]
+    :returns: The payload of the batch frame
+    :rtype: bytes
+    """
+    parts = [struct.pack('<I', len(items))]
+    for (kind, payload) in items:
+        parts.append(BATCH_ITEM_HEADER.pack(kind, len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def decode_batch(
+        payload: bytes,
+) -> List[Tuple[int, bytes]]:
+    """Decodes the payload of a batch frame.
+
+    :param payload: The payload of the batch frame
+    :type payload: bytes
+    :returns: The frame types (requests) or statuses (responses) and payloads of the frames in the batch
+    :rtype: List[Tuple[int, bytes]]
+    """
+    view = memoryview(payload)
+    (count,) = struct.unpack_from('<I', view)
+    offset = 4
+    items = []
+    for _ in range(count):
+        (kind, length) = BATCH_ITEM_HEADER.unpack_from(view, offset)
+        offset += BATCH_ITEM_HEADER.size
+        items.append((kind, bytes(view[offset:offset + length])))
+        offset += length
+    return items
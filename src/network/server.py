@@ -0,0 +1,284 @@
+# Python imports
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, List, Optional, Tuple
+
+# Project imports
+from src.libertas.libertas_server import LibertasServer
+from src.network.protocol import decode_batch, encode_batch, encode_frame, FrameType, read_frame, SEQUENCE, Status
+from src.serialization import decode_token, encode_updates
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class NetworkServer(object):
+    """Serves a Libertas or Z&N server over TCP or a Unix socket, using the binary frames of network.protocol.
+
+    Every request frame carries a request ID that its response repeats. Clients can pipeline requests: frames are read
+    and handled one after the other and responses are written without waiting for the client to read them. A batch
+    frame holds a number of add, delete and search frames; consecutive adds and deletes in a batch are applied in bulk.
+    The server counts requests and periodically reports its throughput.
+    """
+
+    """Interval at which the throughput is reported (seconds)."""
+    REPORT_INTERVAL = 10.
+
+    def __init__(
+            self,
+            backend: Any,
+            report_interval: float = REPORT_INTERVAL,
+    ) -> None:
+        """Initializes a network server.
+
+        :param backend: The server that requests are applied to, a LibertasServer or a Z&N server
+        :type backend: Any
+        :param report_interval: The interval at which the throughput is reported (seconds), or 0 to not report it
+        :type report_interval: float
+        :returns: None
+        :rtype: None
+        """
+        self.backend = backend
+        self.report_interval = report_interval
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.reporter: Optional[asyncio.Task] = None
+        self.started = time.monotonic()
+        self.frames = 0
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+
+    async def start(
+            self,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            path: Optional[str] = None,
+    ) -> None:
+        """Starts listening for connections, on a Unix socket if a path is given and on a TCP port otherwise.
+
+        :param host: The host to listen on
+        :type host: str
+        :param port: The TCP port to listen on, or 0 to pick a free port
+        :type port: int
+        :param path: The path of the Unix socket to listen on
+        :type path: Optional[str]
+        :returns: None
+        :rtype: None
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._serve_connection, path=path)
+        else:
+            self.server = await asyncio.start_server(self._serve_connection, host, port)
+        self.started = time.monotonic()
+        if self.report_interval > 0:
+            self.reporter = asyncio.get_running_loop().create_task(self._report())
+
+    @property
+    def address(
+            self,
+    ) -> Any:
+        """The address the server listens on: a (host, port) tuple for TCP or a path for a Unix socket.
+
+        :returns: The address
+        :rtype: Any
+        """
+        return self.server.sockets[0].getsockname()
+
+    async def stop(
+            self,
+    ) -> None:
+        """Stops listening for connections.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.reporter is not None:
+            self.reporter.cancel()
+            self.reporter = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def stats(
+            self,
+    ) -> dict:
+        """Determines the throughput of the server since it started.
+
+        :returns: The number of frames, requests (counting every frame in a batch) and failed requests handled, the
+        number of open connections, the uptime (seconds) and the number of requests handled per second
+        :rtype: dict
+        """
+        uptime = time.monotonic() - self.started
+        return {'frames': self.frames, 'requests': self.requests, 'errors': self.errors,
+                'connections': self.connections, 'uptime': uptime,
+                'requests_per_second': self.requests / uptime if uptime > 0 else 0.}
+
+    async def _serve_connection(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+    ) -> None:
+        """Handles the frames of a connection until the client closes it.
+
+        :param reader: The incoming stream of the connection
+        :type reader: asyncio.StreamReader
+        :param writer: The outgoing stream of the connection
+        :type writer: asyncio.StreamWriter
+        :returns: None
+        :rtype: None
+        """
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    (request_id, frame_type, payload) = await read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    break
+                self.frames += 1
+                (status, response) = self._handle(frame_type, payload)
+                writer.write(encode_frame(request_id, status.value, response))
+                # Only wait for the client to read responses once the write buffer fills up, so requests are pipelined
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def _handle(
+            self,
+            frame_type: int,
+            payload: bytes,
+    ) -> Tuple[Status, bytes]:
+        """Handles a request frame.
+
+        :param frame_type: The type of the frame
+        :type frame_type: int
+        :param payload: The payload of the frame
+        :type payload: bytes
+        :returns: The status and payload of the response
+        :rtype: Tuple[Status, bytes]
+        """
+        try:
+            frame_type = FrameType(frame_type)
+            if frame_type == FrameType.BATCH:
+                return Status.OK, encode_batch(self._handle_batch(decode_batch(payload)))
+            self.requests += 1
+            if frame_type == FrameType.STATS:
+                return Status.OK, json.dumps(self.stats()).encode('utf-8')
+            if frame_type == FrameType.CLEANUP:
+                if not isinstance(self.backend, LibertasServer):
+                    raise ValueError('Cleanups require a Libertas index')
+                items = decode_batch(payload)
+                self.backend.cleanup(([decode_token(item) for (kind, item) in items if kind == FrameType.DELETE.value],
+                                      [decode_token(item) for (kind, item) in items if kind == FrameType.ADD.value]))
+                return Status.OK, b''
+            if frame_type == FrameType.SEARCH_SINCE:
+                (since,) = SEQUENCE.unpack_from(payload)
+                (results, sequence) = self.backend.search_since(decode_token(payload[SEQUENCE.size:]), since)
+                return Status.OK, SEQUENCE.pack(sequence) + encode_updates(results)
+            token = decode_token(payload)
+            if frame_type == FrameType.ADD:
+                self.backend.add(token)
+                return Status.OK, b''
+            if frame_type == FrameType.DELETE:
+                self.backend.delete(token)
+                return Status.OK, b''
+            return Status.OK, encode_updates(self.backend.search(token))
+        except Exception as error:
+            self.errors += 1
+            return Status.ERROR, str(error).encode('utf-8')
+
+    def _handle_batch(
+            self,
+            items: List[Tuple[int, bytes]],
+    ) -> List[Tuple[int, bytes]]:
+        """Handles the frames in a batch. Runs of adds and of deletes are applied with a single call to the backend, if
+        such a call fails all frames in the run fail.
+
+        :param items: The frame types and payloads of the frames in the batch
+        :type items: List[Tuple[int, bytes]]
+        :returns: The statuses and payloads of the responses
+        :rtype: List[Tuple[int, bytes]]
+        """
+        responses = []
+        start = 0
+        while start < len(items):
+            frame_type = items[start][0]
+            end = start + 1
+            if frame_type in (FrameType.ADD.value, FrameType.DELETE.value):
+                while end < len(items) and items[end][0] == frame_type:
+                    end += 1
+            if end - start == 1 or frame_type not in (FrameType.ADD.value, FrameType.DELETE.value):
+                (status, response) = self._handle(frame_type, items[start][1])
+                responses.append((status.value, response))
+            else:
+                self.requests += end - start
+                try:
+                    tokens = [decode_token(payload) for (_, payload) in items[start:end]]
+                    if frame_type == FrameType.ADD.value:
+                        self.backend.add_many(tokens)
+                    else:
+                        self.backend.delete_many(tokens)
+                    responses.extend([(Status.OK.value, b'')] * (end - start))
+                except Exception as error:
+                    self.errors += end - start
+                    responses.extend([(Status.ERROR.value, str(error).encode('utf-8'))] * (end - start))
+            start = end
+        return responses
+
+    async def _report(
+            self,
+    ) -> None:
+        """Prints the throughput of the server at every report interval.
+
+        :returns: None
+        :rtype: None
+        """
+        previous = self.requests
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print('{:.0f} requests/s, {} requests in total, {} connections'
+                  .format((self.requests - previous) / self.report_interval, self.requests, self.connections),
+                  flush=True)
+            previous = self.requests
+
+
+def main(
+        argv: Optional[List[str]] = None,
+) -> None:
+    """Runs a network server until it is interrupted.
+
+    :param argv: The command line arguments
+    :type argv: Optional[List[str]]
+    :returns: None
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Serve a Libertas or Z&N index over TCP or a Unix socket.')
+    parser.add_argument('--scheme', choices=['libertas', 'zn'], default='libertas')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--unix', help='path of a Unix socket to listen on instead of a TCP port')
+    parser.add_argument('--prf', default='hmac-sha256')
+    parser.add_argument('--report-interval', type=float, default=NetworkServer.REPORT_INTERVAL)
+    arguments = parser.parse_args(argv)
+
+    backend = ZNServer(prf=arguments.prf)
+    if arguments.scheme == 'libertas':
+        backend = LibertasServer(backend)
+    backend.build_index()
+    server = NetworkServer(backend, arguments.report_interval)
+
+    async def serve() -> None:
+        await server.start(arguments.host, arguments.port, arguments.unix)
+        print('Listening on', server.address, flush=True)
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,605 @@
+# Python imports
+import struct
+from itertools import accumulate
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+# Third-party imports
+from bitarray import bitarray
+
+# Project imports
+from src.utils import Op, Update, ZNAddToken, ZNSrchToken
+
+"""Version of the encoding, written at the start of every encoded value. Decoders reject other versions."""
+VERSION = 2
+
+"""Header of every encoded value: version, kind."""
+HEADER = struct.Struct('<BB')
+
+"""Kinds of encoded values."""
+ADD_TOKEN = 1
+SRCH_TOKEN = 2
+DEL_TOKEN = 3
+UPDATES = 4
+UPDATE_RECORD = 5
+
+"""Types of document identifiers and search results: integers (Z&N) or byte strings (Libertas' encrypted updates)."""
+INTEGER = 0
+BYTE_STRING = 1
+
+"""Flag set in the operation of an update record when its keyword is a dictionary ID."""
+KEYWORD_ID_FLAG = 0x80
+
+"""
+Layouts, following the header. Varints are unsigned LEB128, integers of any size are a varint length followed by their
+big-endian two's complement, short strings are a length byte followed by their bytes. Identifiers are a type byte
+(INTEGER or BYTE_STRING) followed by an integer, or by a varint length and the bytes of a byte string.
+
+Add token:      ind (identifier), Bloom filter size in bits (varint), Bloom filter bytes, Bloom filter ID (short string),
+                PRF backend (short string)
+Search token:   number of positions (varint), hash size (byte), PRF backend (short string), size of the positions in
+                bytes (varint), positions (varints), hashed positions (contiguous, hash size bytes each), once per
+                distinct position in order of first occurrence
+Delete token:   Bloom filter ID (short string)
+Updates:        number of updates (varint), type of the updates (byte, INTEGER or BYTE_STRING), size of the lengths in
+                bytes (varint), length of every update in bytes (varints), updates (contiguous, big-endian two's
+                complement or raw bytes)
+Update record:  t (varint), op (byte, with KEYWORD_ID_FLAG set if the keyword is a dictionary ID), ind (zigzag varint),
+                keyword (UTF-8 up to the end of the record, or a varint dictionary ID)
+"""
+
+
+def encode_token(
+        token: Any,
+) -> bytes:
+    """Encodes a Z&N add, search or delete token, as generated by a Libertas or Z&N client.
+
+    :param token: The token
+    :type token: Any
+    :returns: The encoded token
+    :rtype: bytes
+    :raises ValueError: If the value is not a Z&N token
+    """
+    if isinstance(token, bytes):
+        return encode_del_token(token)
+    if isinstance(token, tuple) and len(token) == 4:
+        return encode_add_token(token)
+    if isinstance(token, tuple) and len(token) == 3:
+        return encode_srch_token(token)
+    raise ValueError('Cannot encode token of type {0}'.format(type(token).__name__))
+
+
+def decode_token(
+        data: Any,
+) -> Any:
+    """Decodes a token encoded by encode_token, see decode_add_token, decode_srch_token and decode_del_token.
+
+    :param data: The encoded token
+    :type data: Any (bytes-like)
+    :returns: The token
+    :rtype: Any
+    :raises ValueError: If the data does not hold a token of a supported version
+    """
+    kind = _decode_header(memoryview(data))
+    if kind == ADD_TOKEN:
+        return decode_add_token(data)
+    if kind == SRCH_TOKEN:
+        return decode_srch_token(data)
+    if kind == DEL_TOKEN:
+        return decode_del_token(data)
+    raise ValueError('Encoded value of kind {0} is not a token'.format(kind))
+
+
+def encode_add_token(
+        add_token: ZNAddToken,
+) -> bytes:
+    """Encodes a Z&N add token.
+
+    :param add_token: The add token
+    :type add_token: ZNAddToken
+    :returns: The encoded add token
+    :rtype: bytes
+    """
+    (ind, bloom_filter, b_id, prf) = add_token
+    bloom_filter = bitarray(bloom_filter, endian='big')
+    return b''.join([HEADER.pack(VERSION, ADD_TOKEN), _encode_ind(ind), _encode_varint(len(bloom_filter)),
+                     bloom_filter.tobytes(), _encode_short(b_id), _encode_short(prf.encode('ascii'))])
+
+
+def decode_add_token(
+        data: Any,
+) -> ZNAddToken:
+    """Decodes an add token encoded by encode_add_token. The Bloom filter and its ID are copied out of the data, as
+    they are kept in the index.
+
+    :param data: The encoded add token
+    :type data: Any (bytes-like)
+    :returns: The add token
+    :rtype: ZNAddToken
+    :raises ValueError: If the data does not hold an add token of a supported version
+    """
+    view = memoryview(data)
+    _expect(view, ADD_TOKEN)
+    try:
+        (ind, offset) = _decode_ind(view, HEADER.size)
+        (bf_size, offset) = _decode_varint(view, offset)
+        end = offset + (bf_size + 7) // 8
+        _check_length(view, end)
+        bloom_filter = bitarray(endian='big')
+        bloom_filter.frombytes(bytes(view[offset:end]))
+        del bloom_filter[bf_size:]
+        (b_id, offset) = _decode_short(view, end)
+        (prf, offset) = _decode_short(view, offset)
+    except IndexError as error:
+        raise ValueError('Truncated add token') from error
+    return ind, bloom_filter, bytes(b_id), str(prf, 'ascii')
+
+
+def encode_srch_token(
+        srch_token: ZNSrchToken,
+) -> bytes:
+    """Encodes a Z&N search token. The hashed position of a position that occurs more than once is stored only once,
+    and the hashed positions are stored back to back, so they are decoded without copying.
+
+    :param srch_token: The search token
+    :type srch_token: ZNSrchToken
+    :returns: The encoded search token
+    :rtype: bytes
+    :raises ValueError: If the hashed positions differ in size, or a position occurs with different hashed positions
+    """
+    (td1s, td2s, prf) = srch_token
+    hash_size = len(td2s[0]) if td2s else 0
+    hashes = {}
+    for (pos, h_pos) in zip(td1s, td2s):
+        if len(h_pos) != hash_size:
+            raise ValueError('Hashed positions differ in size')
+        if hashes.setdefault(pos, h_pos) != h_pos:
+            raise ValueError('Position {0} occurs with different hashed positions'.format(pos))
+    positions = b''.join(map(_encode_varint, td1s))
+    return b''.join([HEADER.pack(VERSION, SRCH_TOKEN), _encode_varint(len(td1s)), bytes([hash_size]),
+                     _encode_short(prf.encode('ascii')), _encode_varint(len(positions)), positions]
+                    + list(hashes.values()))
+
+
+def decode_srch_token(
+        data: Any,
+) -> ZNSrchToken:
+    """Decodes a search token encoded by encode_srch_token. The hashed positions are read-only memoryviews into the
+    data rather than copies, so the data is kept alive as long as the token is.
+
+    :param data: The encoded search token
+    :type data: Any (bytes-like)
+    :returns: The search token
+    :rtype: ZNSrchToken
+    :raises ValueError: If the data does not hold a search token of a supported version
+    """
+    view = memoryview(data).toreadonly()
+    _expect(view, SRCH_TOKEN)
+    try:
+        (count, offset) = _decode_varint(view, HEADER.size)
+        hash_size = view[offset]
+        (prf, offset) = _decode_short(view, offset + 1)
+        (size, offset) = _decode_varint(view, offset)
+        _check_length(view, offset + size)
+        td1s = _decode_varints(bytes(view[offset:offset + size]))
+        offset += size
+        if len(td1s) != count:
+            raise IndexError('Truncated positions')
+        hashes = {}
+        for pos in td1s:
+            if pos not in hashes:
+                hashes[pos] = view[offset:offset + hash_size]
+                offset += hash_size
+        _check_length(view, offset)
+    except IndexError as error:
+        raise ValueError('Truncated search token') from error
+    return td1s, [hashes[pos] for pos in td1s], str(prf, 'ascii')
+
+
+def encode_del_token(
+        del_token: bytes,
+) -> bytes:
+    """Encodes a Z&N delete token, a Bloom filter ID.
+
+    :param del_token: The delete token
+    :type del_token: bytes
+    :returns: The encoded delete token
+    :rtype: bytes
+    """
+    return HEADER.pack(VERSION, DEL_TOKEN) + _encode_short(del_token)
+
+
+def decode_del_token(
+        data: Any,
+) -> bytes:
+    """Decodes a delete token encoded by encode_del_token.
+
+    :param data: The encoded delete token
+    :type data: Any (bytes-like)
+    :returns: The delete token
+    :rtype: bytes
+    :raises ValueError: If the data does not hold a delete token of a supported version
+    """
+    view = memoryview(data)
+    _expect(view, DEL_TOKEN)
+    try:
+        (b_id, _) = _decode_short(view, HEADER.size)
+    except IndexError as error:
+        raise ValueError('Truncated delete token') from error
+    return bytes(b_id)
+
+
+def encode_updates(
+        updates: Union[List[int], List[bytes]],
+) -> bytes:
+    """Encodes a list of search results: encrypted updates (Libertas) or document identifiers (Z&N), either all
+    integers or all byte strings. The lengths of the results are stored ahead of the results themselves, so both can be
+    decoded in bulk.
+
+    :param updates: The search results
+    :type updates: Union[List[int], List[bytes]]
+    :returns: The encoded search results
+    :rtype: bytes
+    :raises ValueError: If the search results are neither all integers nor all byte strings
+    """
+    if all(isinstance(update, int) for update in updates):
+        kind = INTEGER
+        lengths = [(update.bit_length() + 8) // 8 for update in updates]
+        updates = list(map(_to_bytes, updates, lengths))
+    elif all(isinstance(update, bytes) for update in updates):
+        kind = BYTE_STRING
+        lengths = list(map(len, updates))
+    else:
+        raise ValueError('Search results should be all integers or all byte strings')
+    encoded_lengths = b''.join(map(_encode_varint, lengths))
+    return b''.join([HEADER.pack(VERSION, UPDATES), _encode_varint(len(updates)), bytes((kind,)),
+                     _encode_varint(len(encoded_lengths)), encoded_lengths] + updates)
+
+
+def decode_updates(
+        data: Any,
+) -> Union[List[int], List[bytes]]:
+    """Decodes a list of search results encoded by encode_updates.
+
+    :param data: The encoded search results
+    :type data: Any (bytes-like)
+    :returns: The search results
+    :rtype: Union[List[int], List[bytes]]
+    :raises ValueError: If the data does not hold search results of a supported version
+    """
+    view = memoryview(data)
+    _expect(view, UPDATES)
+    try:
+        (count, offset) = _decode_varint(view, HEADER.size)
+        kind = view[offset]
+        (size, offset) = _decode_varint(view, offset + 1)
+        _check_length(view, offset + size)
+        lengths = _decode_varints(bytes(view[offset:offset + size]))
+        if len(lengths) != count:
+            raise IndexError('Truncated lengths')
+        ends = list(accumulate(lengths, initial=offset + size))
+        _check_length(view, ends[-1])
+    except IndexError as error:
+        raise ValueError('Truncated updates') from error
+    if kind == BYTE_STRING:
+        return [bytes(view[start:end]) for (start, end) in zip(ends, ends[1:])]
+    if kind != INTEGER:
+        raise ValueError('Unknown search result type {0}'.format(kind))
+    from_bytes = int.from_bytes
+    return [from_bytes(view[start:end], 'big', signed=True) for (start, end) in zip(ends, ends[1:])]
+
+
+def encode_update_record(
+        update: Update,
+        keyword_id: Optional[int] = None,
+) -> bytes:
+    """Encodes a Libertas update, the plaintext of an encrypted update.
+
+    :param update: The (t, op, ind, w) update
+    :type update: Update
+    :param keyword_id: The ID of the keyword in the client's keyword dictionary, or None to store the keyword itself
+    :type keyword_id: Optional[int]
+    :returns: The update record
+    :rtype: bytes
+    """
+    (t, op, ind, w) = update
+    if keyword_id is None:
+        (op_byte, keyword) = (op.value, w.encode('utf-8'))
+    else:
+        (op_byte, keyword) = (op.value | KEYWORD_ID_FLAG, _encode_varint(keyword_id))
+    return b''.join([HEADER.pack(VERSION, UPDATE_RECORD), _encode_varint(t), bytes((op_byte,)),
+                     _encode_varint(ind << 1 if ind >= 0 else (~ind << 1) | 1), keyword])
+
+
+def decode_update_record(
+        data: Any,
+        keywords: Optional[Sequence[str]] = None,
+) -> Update:
+    """Decodes an update record encoded by encode_update_record.
+
+    :param data: The update record
+    :type data: Any (bytes-like)
+    :param keywords: The client's keyword dictionary, listing keywords by ID. Needed if the record holds a keyword ID
+    :type keywords: Optional[Sequence[str]]
+    :returns: The (t, op, ind, w) update
+    :rtype: Update
+    :raises ValueError: If the data does not hold an update record of a supported version, or refers to an unknown
+    keyword ID
+    """
+    view = memoryview(data)
+    _expect(view, UPDATE_RECORD)
+    try:
+        (t, offset) = _decode_varint(view, HEADER.size)
+        op_byte = view[offset]
+        (zigzag, offset) = _decode_varint(view, offset + 1)
+        if op_byte & KEYWORD_ID_FLAG:
+            (keyword_id, _) = _decode_varint(view, offset)
+    except IndexError as error:
+        raise ValueError('Truncated update record') from error
+    ind = zigzag >> 1 if not zigzag & 1 else ~(zigzag >> 1)
+    if not op_byte & KEYWORD_ID_FLAG:
+        w = str(view[offset:], 'utf-8')
+    elif keywords is not None and keyword_id < len(keywords):
+        w = keywords[keyword_id]
+    else:
+        raise ValueError('Unknown keyword ID {0}'.format(keyword_id))
+    return t, Op(op_byte & ~KEYWORD_ID_FLAG), ind, w
+
+
+def _decode_header(
+        view: memoryview,
+) -> int:
+    """Checks the version of an encoded value and determines its kind.
+
+    :param view: The encoded value
+    :type view: memoryview
+    :returns: The kind of the value
+    :rtype: int
+    :raises ValueError: If the value is not of a supported version
+    """
+    if len(view) < HEADER.size:
+        raise ValueError('Truncated header')
+    (version, kind) = HEADER.unpack_from(view)
+    if version != VERSION:
+        raise ValueError('Unsupported encoding version {0}'.format(version))
+    return kind
+
+
+def _expect(
+        view: memoryview,
+        kind: int,
+) -> None:
+    """Checks that an encoded value is of a supported version and of the expected kind.
+
+    :param view: The encoded value
+    :type view: memoryview
+    :param kind: The expected kind
+    :type kind: int
+    :returns: None
+    :rtype: None
+    :raises ValueError: If the value is not of a supported version or of a different kind
+    """
+    actual = _decode_header(view)
+    if actual != kind:
+        raise ValueError('Expected an encoded value of kind {0}, got {1}'.format(kind, actual))
+
+
+def _check_length(
+        view: memoryview,
+        end: int,
+) -> None:
+    """Checks that an encoded value extends to a position.
+
+    :param view: The encoded value
+    :type view: memoryview
+    :param end: The position
+    :type end: int
+    :returns: None
+    :rtype: None
+    :raises IndexError: If the value is shorter
+    """
+    if end > len(view):
+        raise IndexError('Truncated value')
+
+
+def _encode_varint(
+        value: int,
+) -> bytes:
+    """Encodes a non-negative integer in unsigned LEB128: seven bits per byte, least significant first, with the high
+    bit set on all but the last byte.
+
+    :param value: The integer
+    :type value: int
+    :returns: The encoded integer
+    :rtype: bytes
+    """
+    if value < 0x80:
+        return bytes((value,))
+    if value < 0x4000:
+        return bytes((value & 0x7F | 0x80, value >> 7))
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _decode_varint(
+        view: memoryview,
+        offset: int,
+) -> Tuple[int, int]:
+    """Decodes an integer encoded by _encode_varint.
+
+    :param view: The data holding the integer
+    :type view: memoryview
+    :param offset: The position of the integer in the data
+    :type offset: int
+    :returns: The integer and the position following it
+    :rtype: Tuple[int, int]
+    :raises IndexError: If the data ends within the integer
+    """
+    byte = view[offset]
+    if byte < 0x80:
+        return byte, offset + 1
+    value = 0
+    shift = 0
+    while byte >= 0x80:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        offset += 1
+        byte = view[offset]
+    return value | byte << shift, offset + 1
+
+
+def _decode_varints(
+        data: bytes,
+) -> List[int]:
+    """Decodes a run of integers encoded by _encode_varint.
+
+    :param data: The encoded integers
+    :type data: bytes
+    :returns: The integers
+    :rtype: List[int]
+    :raises IndexError: If the data ends within an integer
+    """
+    if data.isascii():
+        # No byte has its high bit set, so every integer is a single byte
+        return list(data)
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        if byte < 0x80:
+            values.append(value | byte << shift)
+            value = 0
+            shift = 0
+        else:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+    if shift:
+        raise IndexError('Truncated integer')
+    return values
+
+
+def _encode_int(
+        value: int,
+) -> bytes:
+    """Encodes an integer of any size: its length (varint) followed by its big-endian two's complement.
+
+    :param value: The integer
+    :type value: int
+    :returns: The encoded integer
+    :rtype: bytes
+    """
+    length = (value.bit_length() + 8) // 8
+    return _encode_varint(length) + value.to_bytes(length, 'big', signed=True)
+
+
+def _decode_int(
+        view: memoryview,
+        offset: int,
+) -> Tuple[int, int]:
+    """Decodes an integer encoded by _encode_int.
+
+    :param view: The data holding the integer
+    :type view: memoryview
+    :param offset: The position of the integer in the data
+    :type offset: int
+    :returns: The integer and the position following it
+    :rtype: Tuple[int, int]
+    :raises IndexError: If the data ends within the integer
+    """
+    (length, offset) = _decode_varint(view, offset)
+    _check_length(view, offset + length)
+    return int.from_bytes(view[offset:offset + length], 'big', signed=True), offset + length
+
+
+def _encode_ind(
+        ind: Union[int, bytes],
+) -> bytes:
+    """Encodes a document identifier: its type (1 byte) followed by the integer or the length-prefixed byte string.
+
+    :param ind: The document identifier, an integer or a byte string
+    :type ind: Union[int, bytes]
+    :returns: The encoded document identifier
+    :rtype: bytes
+    :raises ValueError: If the document identifier is neither an integer nor a byte string
+    """
+    if isinstance(ind, int):
+        return bytes((INTEGER,)) + _encode_int(ind)
+    if isinstance(ind, bytes):
+        return bytes((BYTE_STRING,)) + _encode_varint(len(ind)) + ind
+    raise ValueError('Invalid document identifier: {0!r}'.format(ind))
+
+
+def _decode_ind(
+        view: memoryview,
+        offset: int,
+) -> Tuple[Union[int, bytes], int]:
+    """Decodes a document identifier encoded by _encode_ind.
+
+    :param view: The data holding the document identifier
+    :type view: memoryview
+    :param offset: The position of the document identifier in the data
+    :type offset: int
+    :returns: The document identifier and the position following it
+    :rtype: Tuple[Union[int, bytes], int]
+    :raises IndexError: If the data ends within the document identifier
+    :raises ValueError: If the type of the document identifier is unknown
+    """
+    kind = view[offset]
+    if kind == INTEGER:
+        return _decode_int(view, offset + 1)
+    if kind != BYTE_STRING:
+        raise ValueError('Unknown document identifier type {0}'.format(kind))
+    (length, offset) = _decode_varint(view, offset + 1)
+    _check_length(view, offset + length)
+    return bytes(view[offset:offset + length]), offset + length
+
+
+def _to_bytes(
+        value: int,
+        length: int,
+) -> bytes:
+    """Converts an integer to its big-endian two's complement.
+
+    :param value: The integer
+    :type value: int
+    :param length: The number of bytes
+    :type length: int
+    :returns: The two's complement
+    :rtype: bytes
+    """
+    return value.to_bytes(length, 'big', signed=True)
+
+
+def _encode_short(
+        value: bytes,
+) -> bytes:
+    """Encodes a short byte string: its length (1 byte) followed by its bytes.
+
+    :param value: The byte string, at most 255 bytes long
+    :type value: bytes
+    :returns: The encoded byte string
+    :rtype: bytes
+    """
+    return bytes([len(value)]) + value
+
+
+def _decode_short(
+        view: memoryview,
+        offset: int,
+) -> Tuple[memoryview, int]:
+    """Decodes a byte string encoded by _encode_short, without copying it.
+
+    :param view: The data holding the byte string
+    :type view: memoryview
+    :param offset: The position of the byte string in the data
+    :type offset: int
+    :returns: A view of the byte string and the position following it
+    :rtype: Tuple[memoryview, int]
+    :raises IndexError: If the data ends within the byte string
+    """
+    length = view[offset]
+    _check_length(view, offset + 1 + length)
+    return view[offset + 1:offset + 1 + length], offset + 1 + length
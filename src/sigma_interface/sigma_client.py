@@ -1,5 +1,5 @@
 # Python imports
-from typing import Generic
+from typing import Any, Generic
 
 # Project imports
 from src.utils import AddToken, SrchToken
@@ -44,6 +44,20 @@ class SigmaClient(Generic[AddToken, SrchToken]):
         """
         pass
 
+    def compile_query(
+            self,
+            q: str,
+    ) -> Any:
+        """Compiles a query for repeated searches. The compiled query is accepted by srch_token in place of the query.
+        Schemes without compiled queries return the query itself.
+
+        :param q: The query, a string of characters, possibly containing wildcards
+        :type q: str
+        :returns: The compiled query
+        :rtype: Any
+        """
+        return q
+
     def add_token(
             self,
             ind: int,
@@ -59,3 +73,20 @@ class SigmaClient(Generic[AddToken, SrchToken]):
         :rtype: AddToken
         """
         pass
+
+    def del_token(
+            self,
+            ind: Any,
+            w: str,
+    ) -> Any:
+        """Creates a delete token for a document-keyword pair, to be send to the server. The token removes the pair
+        from the index, unlike the delete updates of Libertas, which are added to it.
+
+        :param ind: The document identifier of the document in the document-keyword pair that is to be removed
+        :type ind: Any
+        :param w: The keyword in the document-keyword pair that is to be removed
+        :type w: str
+        :returns: the delete token
+        :rtype: Any
+        """
+        pass
@@ -1,5 +1,6 @@
 # Python imports
-from typing import List, Generic
+from itertools import islice
+from typing import Any, Generic, Iterable, Iterator, List, Optional, Tuple
 
 # Project imports
 from src.utils import AddToken, SrchToken
@@ -40,6 +41,49 @@ class SigmaServer(Generic[AddToken, SrchToken]):
         :rtype: List[int]
         """
 
+    def search_iter(
+            self,
+            srch_token: SrchToken,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[int]:
+        """Searches the index for a query represented by a search token, yielding matching document identifiers.
+        Schemes that can stream their results, or that keep their entries in insertion order, should override this
+        method. By default the results of search() are yielded.
+
+        :param srch_token: The search token
+        :type srch_token: SrchToken
+        :param limit: The maximum number of results to yield, or None to yield all results
+        :type limit: Optional[int]
+        :param newest_first: Whether to yield the results in reverse insertion order
+        :type newest_first: bool
+        :returns: An iterator over the results
+        :rtype: Iterator[int]
+        :raises NotImplementedError: If results are to be yielded newest first, but the scheme does not keep its
+        entries in insertion order
+        """
+        if newest_first:
+            raise NotImplementedError('{0} does not keep its entries in insertion order'.format(type(self).__name__))
+        return islice(self.search(srch_token), limit)
+
+    def search_since(
+            self,
+            srch_token: SrchToken,
+            since: int = 0,
+    ) -> Tuple[List[int], int]:
+        """Searches the entries added after an insertion sequence number for a query represented by a search token.
+        Schemes that number their entries in insertion order should override this method.
+
+        :param srch_token: The search token
+        :type srch_token: SrchToken
+        :param since: The insertion sequence number returned by an earlier search, or 0 to search all entries
+        :type since: int
+        :returns: The results among the new entries, and the sequence number of the last added entry
+        :rtype: Tuple[List[int], int]
+        :raises NotImplementedError: If the scheme does not number its entries
+        """
+        raise NotImplementedError('{0} does not number its entries'.format(type(self).__name__))
+
     def add(
             self,
             add_token: AddToken,
@@ -52,3 +96,81 @@ class SigmaServer(Generic[AddToken, SrchToken]):
         :rtype: None
         """
         pass
+
+    def validate(
+            self,
+            add_tokens: List[AddToken],
+    ) -> None:
+        """Checks that a number of add tokens can be added to the index, without adding them, so callers can reject
+        updates before applying any of them. Schemes that cannot check tokens up front accept every token here.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: List[AddToken]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If any of the add tokens cannot be added
+        """
+        pass
+
+    def add_many(
+            self,
+            add_tokens: Iterable[AddToken],
+    ) -> None:
+        """Adds a number of document-keyword pairs, represented by add tokens, to the index.
+        Schemes that can ingest tokens in bulk should override this method, by default the tokens are added one by one.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: Iterable[AddToken]
+        :returns: None
+        :rtype: None
+        """
+        for add_token in add_tokens:
+            self.add(add_token)
+
+    def delete(
+            self,
+            del_token: Any,
+    ) -> None:
+        """Removes a document-keyword pair, represented by a delete token, from the index.
+
+        :param del_token: A delete token representing a document-keyword pair
+        :type del_token: Any
+        :returns: None
+        :rtype: None
+        """
+        pass
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[Any],
+    ) -> None:
+        """Removes a number of document-keyword pairs, represented by delete tokens, from the index.
+        Schemes that can remove entries in bulk should override this method, by default the tokens are removed one by
+        one.
+
+        :param del_tokens: Delete tokens representing document-keyword pairs
+        :type del_tokens: Iterable[Any]
+        :returns: None
+        :rtype: None
+        """
+        for del_token in del_tokens:
+            self.delete(del_token)
+
+    def replace(
+            self,
+            del_tokens: Iterable[Any],
+            add_tokens: Iterable[AddToken],
+    ) -> None:
+        """Removes a number of document-keyword pairs from the index and adds a number of others in their place.
+        The new pairs are added before the old ones are removed. Schemes that can be searched while they are updated
+        should override this method to apply both in a single step.
+
+        :param del_tokens: Delete tokens representing the document-keyword pairs to remove
+        :type del_tokens: Iterable[Any]
+        :param add_tokens: Add tokens representing the document-keyword pairs to add
+        :type add_tokens: Iterable[AddToken]
+        :returns: None
+        :rtype: None
+        """
+        self.add_many(add_tokens)
+        self.delete_many(del_tokens)
@@ -1,6 +1,11 @@
 # Python imports
+import re
+from collections import OrderedDict
 from enum import Enum
-from typing import Tuple, TypeVar
+from typing import Any, Generic, Hashable, List, Optional, Tuple, TypeVar, Union
+
+# Third-party imports
+from bitarray import bitarray
 
 
 class Op(Enum):
@@ -29,3 +34,123 @@ SrchToken = TypeVar('SrchToken')
 
 """Type declaration for Libertas updates, (t, op, ind, w) tuples."""
 Update = Tuple[int, Op, int, str]
+
+
+"""Type declaration for Libertas cleanup tokens, (delete tokens, add tokens) tuples. The delete tokens remove encrypted
+updates from the index of the underlying scheme, the add tokens add their consolidated replacements."""
+CleanupToken = Tuple[List[Any], List[AddToken]]
+
+
+"""Type declarations for Z&N tokens. Add tokens are (ind, Bloom filter, Bloom filter ID, PRF backend) tuples, search
+tokens are (Bloom filter positions, hashed positions, PRF backend) tuples. The index of a Z&N server holds
+(ind, Bloom filter, Bloom filter ID) entries. Document identifiers are integers, or byte strings such as the encrypted
+updates of Libertas."""
+ZNAddToken = Tuple[Union[int, bytes], bitarray, bytes, str]
+ZNSrchToken = Tuple[List[int], List[bytes], str]
+ZNEntry = Tuple[Union[int, bytes], bitarray, bytes]
+
+
+"""Generics for cache keys and values."""
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """A mapping holding at most a fixed number of items. When it is full, the least recently used item is evicted.
+    Lookups are counted as hits or misses.
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+    ) -> None:
+        """Initializes an empty cache.
+
+        :param max_size: The maximum number of items in the cache
+        :type max_size: int
+        :returns: None
+        :rtype: None
+        """
+        if max_size < 0:
+            raise ValueError('The size of the cache cannot be negative')
+        self.max_size = max_size
+        self.items: 'OrderedDict[K, V]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(
+            self,
+    ) -> int:
+        """Returns the number of items in the cache.
+
+        :returns: The number of items in the cache
+        :rtype: int
+        """
+        return len(self.items)
+
+    def get(
+            self,
+            key: K,
+    ) -> Optional[V]:
+        """Looks up an item, marking it as most recently used.
+
+        :param key: The key of the item
+        :type key: K
+        :returns: The value of the item, or None if it is not in the cache
+        :rtype: Optional[V]
+        """
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.items.move_to_end(key)
+        return value
+
+    def put(
+            self,
+            key: K,
+            value: V,
+    ) -> None:
+        """Stores an item as most recently used, evicting the least recently used item if the cache is full.
+
+        :param key: The key of the item
+        :type key: K
+        :param value: The value of the item, which cannot be None
+        :type value: V
+        :returns: None
+        :rtype: None
+        """
+        if self.max_size == 0:
+            return
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+    def clear(
+            self,
+    ) -> None:
+        """Removes all items from the cache.
+
+        :returns: None
+        :rtype: None
+        """
+        self.items.clear()
+
+
+def matches_query(
+        q: str,
+        w: str,
+) -> bool:
+    """Checks whether a keyword matches a query, in which _ matches a single character and * any number of characters.
+
+    :param q: The query, a string of characters, possibly containing _ and * wildcards
+    :type q: str
+    :param w: The keyword
+    :type w: str
+    :returns: Whether the keyword matches the query
+    :rtype: bool
+    """
+    pattern = ''.join('.' if c == '_' else '.*' if c == '*' else re.escape(c) for c in q)
+    return re.fullmatch(pattern, w, re.DOTALL) is not None
@@ -1,17 +1,20 @@
 # Python imports
 import math
 import os
-from typing import List, Tuple
+from array import array
+from typing import Dict, List, Sequence, Tuple, Union
 
 # Third-party imports
 from bitarray import bitarray
 
 # Project imports
-from src.crypto import hash_string_to_int, hash_int, hash_string, hash_bytes
+from src.crypto import get_prf_backend, PRF
 from src.sigma_interface.sigma_client import SigmaClient
+from src.utils import LRUCache, ZNAddToken, ZNSrchToken
+from src.zhao_nishide.zn_compiled_query import ZNCompiledQuery
 
 
-class ZNClient(SigmaClient[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[bytes]]]):
+class ZNClient(SigmaClient[ZNAddToken, ZNSrchToken]):
     """Zhao and Nishide client implementation.
 
     Based on: Fangming Zhao and Takashi Nishide. Searchable symmetric encryption supporting queries with
@@ -27,24 +30,89 @@ class ZNClient(SigmaClient[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
             self,
             fp_rate: float,
             average_keyword_length: int,
+            prf: str = 'hmac-sha256',
+            set_cache_size: int = 0,
+            position_cache_size: int = 0,
+            srch_token_cache_size: int = 0,
     ) -> None:
         """Initializes a Zhao and Nishide client.
 
         :param fp_rate: The false-positive rate of individual search results
         :type fp_rate: float
         :param average_keyword_length: The average length of keywords, used to determine optimal Bloom filter parameters
+        :param prf: The PRF backend of the scheme, one of crypto.PRF_BACKENDS. It is recorded in every token
+        :type prf: str
+        :param set_cache_size: The number of most recently used keywords and queries for which the S_K or S_T set is
+        kept, so tokens for the same keyword or query do not regenerate it
+        :type set_cache_size: int
+        :param position_cache_size: The number of most recently used set elements for which the Bloom filter positions
+        are kept. Elements repeat across keywords, as they are built from a small alphabet
+        :type position_cache_size: int
+        :param srch_token_cache_size: The number of most recently used queries for which the search token is kept
+        :type srch_token_cache_size: int
         :returns: None
         :rtype: None
         """
         super().__init__()
+        self.prf_backend = get_prf_backend(prf)
+        self.set_cache: LRUCache[Tuple[str, str], Tuple[str, ...]] = LRUCache(set_cache_size)
+        self.position_cache: LRUCache[str, array] = LRUCache(position_cache_size)
+        self.srch_token_cache: LRUCache[str, ZNSrchToken] = LRUCache(srch_token_cache_size)
+        self.epoch = 0
 
         # Estimate optimal Bloom filter parameters
         set_size = len(self._s_k('0' * average_keyword_length))
         self.bf_size = math.ceil(-(set_size * math.log(fp_rate)) / (math.log(2) ** 2))
         self.bf_hash_functions = math.ceil((self.bf_size / set_size) * math.log(2))
 
+        self.prfs_h = None
+        self.prf_g = None
+        self.position_table = None
         self.k = None
 
+    @property
+    def k(
+            self,
+    ) -> Tuple[List[bytes], bytes]:
+        """The client keys (k_h, k_g).
+
+        :returns: The keys k_h and k_g
+        :rtype: Tuple[List[bytes], bytes]
+        """
+        return self._k
+
+    @k.setter
+    def k(
+            self,
+            k: Tuple[List[bytes], bytes],
+    ) -> None:
+        """Sets the client keys (k_h, k_g) and recomputes the key-dependent state: a PRF object per key and the position
+        table. The position table holds the hash of every Bloom filter position under k_g, which does not depend on the
+        document-keyword pair, so it is computed once instead of for every add and search token.
+
+        Cached Bloom filter positions and search tokens are discarded and the key epoch is incremented, so queries
+        compiled under the previous keys are recompiled when they are used.
+
+        :param k: The keys k_h and k_g
+        :type k: Tuple[List[bytes], bytes]
+        :returns: None
+        :rtype: None
+        """
+        self._k = k
+        self.epoch += 1
+        self.position_cache.clear()
+        self.srch_token_cache.clear()
+        if k is None:
+            self.prfs_h = None
+            self.prf_g = None
+            self.position_table = None
+        else:
+            (k_h, k_g) = k
+            self.prfs_h: List[PRF] = [self.prf_backend(k) for k in k_h]
+            self.prf_g = self.prf_backend(k_g)
+            self.position_table: Tuple[bytes, ...] = tuple(
+                self.prf_g.eval_many(str(pos).encode('utf-8') for pos in range(self.bf_size)))
+
     def setup(
             self,
             security_parameter: int,
@@ -62,77 +130,180 @@ class ZNClient(SigmaClient[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
 
     def srch_token(
             self,
-            q: str,
-    ) -> Tuple[List[int], List[bytes]]:
+            q: Union[str, ZNCompiledQuery],
+    ) -> ZNSrchToken:
         """Creates a search token for a query, to be send to a Z&N server.
         The first part of the search token consists of Bloom filter positions, one per element in s_t(q).
-        The second part of the search token consists of hashes of these positions.
+        The second part of the search token consists of hashes of these positions. The third part is the name of the
+        PRF backend.
+
+        Search tokens are deterministic for fixed keys. Tokens of compiled queries and recently used queries are
+        reused, these are shared and should not be modified.
+
+        :param q: The query, a string of characters, possibly containing singular _ and * wildcards, or a query
+        compiled by this client
+        :type q: Union[str, ZNCompiledQuery]
+        :returns: The search token
+        :rtype: ZNSrchToken
+        """
+        if isinstance(q, ZNCompiledQuery):
+            if q.epoch != self.epoch:
+                q.srch_token = self.srch_token(q.q)
+                q.epoch = self.epoch
+            return q.srch_token
+
+        srch_token = self.srch_token_cache.get(q)
+        if srch_token is None:
+            srch_token = self._srch_token(q)
+            self.srch_token_cache.put(q, srch_token)
+        return srch_token
+
+    def compile_query(
+            self,
+            q: str,
+    ) -> ZNCompiledQuery:
+        """Compiles a query, creating its search token once so it can be reused for repeated searches.
 
         :param q: The query, a string of characters, possibly containing singular _ and * wildcards
         :type q: str
-        :returns: The search token
-        :rtype: (List[int], List[bytes])
+        :returns: The compiled query
+        :rtype: ZNCompiledQuery
         """
-        (k_h, k_g) = self.k
-        # Append the query with '\0' to indicate the end of the query. This way 'test' is interpreted differently from
-        # 'test*'.
-        s_t = self._s_t(q + '\0')
-        td1s: List[int] = [hash_string_to_int(k, e) % self.bf_size for e in s_t for k in k_h]
-        td2s: List[bytes] = [hash_int(k_g, pos) for pos in td1s]
-        return td1s, td2s
+        return ZNCompiledQuery(q, self.srch_token(q), self.epoch)
 
     def add_token(
             self,
-            ind: int,
+            ind: Union[int, bytes],
             w: str,
-    ) -> Tuple[int, bitarray, bytes]:
+    ) -> ZNAddToken:
         """Creates an add token for a document-keyword pair, to be send to a Z&N server.
-        Add tokens consist of the document identifier, Bloom filter and its ID.
+        Add tokens consist of the document identifier, Bloom filter, its ID and the name of the PRF backend.
 
         :param ind: The document identifier of the document-keyword pair to add
-        :type ind: int
+        :type ind: Union[int, bytes]
         :param w: The keyword of the document-keyword pair to add
         :type w: str
-        :returns: An add token, a tuple consisting of a document identifier, Bloom filter and its ID
-        :rtype: Tuple[int, bitarray, bytes]
+        :returns: An add token, a tuple consisting of a document identifier, Bloom filter, its ID and PRF backend
+        :rtype: ZNAddToken
         """
         # Append the keyword with '\0' to indicate the end of the keyword
-        s_k = self._s_k(w + '\0')
-        (k_h, k_g) = self.k
-        b_id = hash_string(k_g, str(ind) + w)
+        s_k = self._cached_set('k', w + '\0')
+        b_id = self.del_token(ind, w)
         bloom_filter = bitarray(self.bf_size)
+        bloom_filter.setall(False)
 
         # Fill Bloom filter
-        for e in s_k:
-            for k in k_h:
-                pos = hash_string_to_int(k, e) % self.bf_size
-                bloom_filter[pos] = True
-
-        # Mask Bloom filter
-        for pos in range(self.bf_size):
-            h = hash_bytes(b_id, hash_int(k_g, pos))
-            first_hash_bit = h[0] & 1
-            bloom_filter[pos] ^= first_hash_bit
-        return ind, bloom_filter, b_id
+        for pos in self._bloom_positions(s_k):
+            bloom_filter[pos] = True
+
+        # Mask Bloom filter, XORing the first bit of every position's hash into it at once
+        mask = bitarray()
+        mask.pack(bytes(h[0] & 1 for h in self.prf_backend(b_id).eval_many(self.position_table)))
+        bloom_filter ^= mask
+        return ind, bloom_filter, b_id, self.prf_backend.name
 
     def del_token(
             self,
-            ind: int,
+            ind: Union[int, bytes],
             w: str,
     ) -> bytes:
         """Creates a delete token for a document-keyword pair, to be send to a Z&N server.
-        A delete token is a Bloom filter ID.
+        A delete token is a Bloom filter ID. It is derived from the type and length of the document identifier followed
+        by the document identifier and the keyword, so no two document-keyword pairs share an ID (e.g. (1, '2a') and
+        (12, 'a')).
 
-        :param ind: The document identifier of the document-keyword pair to delete
-        :type ind: int
+        :param ind: The document identifier of the document-keyword pair to delete, an integer or a byte string
+        :type ind: Union[int, bytes]
         :param w: The keyword of the document-keyword pair to delete
         :type w: str
         :returns: A delete token, which is a Bloom filter ID
         :rtype: bytes
         """
-        (_, k_g) = self.k
-        b_id = hash_string(k_g, str(ind) + w)
-        return b_id
+        if isinstance(ind, bytes):
+            (kind, encoded_ind) = (b'b', ind)
+        else:
+            (kind, encoded_ind) = (b'i', str(ind).encode('utf-8'))
+        return self.prf_g.eval(kind + len(encoded_ind).to_bytes(4, 'big') + encoded_ind + w.encode('utf-8'))
+
+    def _srch_token(
+            self,
+            q: str,
+    ) -> ZNSrchToken:
+        """Computes the search token of a query, see srch_token.
+
+        :param q: The query, a string of characters, possibly containing singular _ and * wildcards
+        :type q: str
+        :returns: The search token
+        :rtype: ZNSrchToken
+        """
+        # Append the query with '\0' to indicate the end of the query. This way 'test' is interpreted differently from
+        # 'test*'.
+        s_t = self._cached_set('t', q + '\0')
+        td1s: List[int] = self._bloom_positions(s_t)
+        td2s: List[bytes] = [self.position_table[pos] for pos in td1s]
+        return td1s, td2s, self.prf_backend.name
+
+    def _cached_set(
+            self,
+            kind: str,
+            w: str,
+    ) -> Tuple[str, ...]:
+        """Generates the S_K or S_T set of a keyword or query, reusing it from the set cache when possible.
+
+        :param kind: 'k' for the S_K set of a keyword, 't' for the S_T set of a query
+        :type kind: str
+        :param w: The keyword or query for which the set is to be generated
+        :type w: str
+        :returns: The set
+        :rtype: Tuple[str, ...]
+        """
+        s = self.set_cache.get((kind, w))
+        if s is None:
+            s = tuple(self._s_k(w) if kind == 'k' else self._s_t(w))
+            self.set_cache.put((kind, w), s)
+        return s
+
+    def _bloom_positions(
+            self,
+            s: Sequence[str],
+    ) -> List[int]:
+        """Determines the Bloom filter positions of set elements, one per element per key in k_h. Positions of elements
+        that are not in the position cache are computed together, evaluating every key's PRF on all of them at once.
+
+        :param s: Elements of an S_K or S_T set
+        :type s: Sequence[str]
+        :returns: The Bloom filter positions of the elements, ordered by element and then by key
+        :rtype: List[int]
+        """
+        cache = self.position_cache
+        if cache.max_size == 0:
+            return [pos for element_positions in self._compute_bloom_positions(s) for pos in element_positions]
+
+        cached = [cache.get(e) for e in s]
+        missing = list(dict.fromkeys(e for e, element_positions in zip(s, cached) if element_positions is None))
+        if missing:
+            computed = dict(zip(missing, self._compute_bloom_positions(missing)))
+            for e, element_positions in computed.items():
+                cache.put(e, element_positions)
+            cached = [computed[e] if element_positions is None else element_positions
+                      for e, element_positions in zip(s, cached)]
+        return [pos for element_positions in cached for pos in element_positions]
+
+    def _compute_bloom_positions(
+            self,
+            s: Sequence[str],
+    ) -> List[array]:
+        """Computes the Bloom filter positions of set elements, evaluating every key's PRF on all elements at once.
+
+        :param s: Elements of an S_K or S_T set
+        :type s: Sequence[str]
+        :returns: Per element, an array holding its Bloom filter position for every key in k_h
+        :rtype: List[array]
+        """
+        es = [e.encode('utf-8') for e in s]
+        hashes = [prf.eval_many(es) for prf in self.prfs_h]
+        return [array('I', [int.from_bytes(h, 'big') % self.bf_size for h in element_hashes])
+                for element_hashes in zip(*hashes)]
 
     @classmethod
     def _s_k(
@@ -195,12 +366,7 @@ class ZNClient(SigmaClient[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
                  for c1 in range(len(w))
                  for c2 in range(c1 + 1, len(w))]
 
-        # Append '{occurrence}:'
-        unique_pairs = list(set(pairs))
-        pair_count_dict = {pair: pairs.count(pair) for pair in unique_pairs}
-        return [str(count + 1) + ':' + pair
-                for pair in pair_count_dict.keys()
-                for count in range(pair_count_dict[pair])]
+        return cls._number_occurrences(pairs)
 
     @classmethod
     def _s_k_p2(
@@ -220,12 +386,27 @@ class ZNClient(SigmaClient[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
                  for c1 in range(len(w))
                  for c2 in range(c1 + 1, len(w))]
 
-        # Append '{occurrence}:'
-        unique_pairs = list(set(pairs))
-        pair_count_dict = {pair: pairs.count(pair) for pair in unique_pairs}
-        return [str(count + 1) + ':' + pair
-                for pair in pair_count_dict.keys()
-                for count in range(pair_count_dict[pair])]
+        return cls._number_occurrences(pairs)
+
+    @classmethod
+    def _number_occurrences(
+            cls,
+            pairs: List[str],
+    ) -> List[str]:
+        """Prepends '{occurrence}:' to every pair, numbering repeated pairs 1, 2, ... in a single counting pass.
+
+        :param pairs: The pairs, possibly containing duplicates
+        :type pairs: List[str]
+        :returns: The numbered pairs
+        :rtype: List[str]
+        """
+        counts: Dict[str, int] = {}
+        numbered = []
+        for pair in pairs:
+            count = counts.get(pair, 0) + 1
+            counts[pair] = count
+            numbered.append(str(count) + ':' + pair)
+        return numbered
 
     @classmethod
     def _s_t(
@@ -293,12 +474,7 @@ class ZNClient(SigmaClient[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
                  for c1 in range(len(group)) if group[c1] != '_'
                  for c2 in range(c1 + 1, len(group)) if group[c2] != '_']
 
-        # Append '{occurrence}:'
-        unique_pairs = list(set(pairs))
-        pair_count_dict = {pair: pairs.count(pair) for pair in unique_pairs}
-        return [str(count + 1) + ':' + pair
-                for pair in pair_count_dict.keys()
-                for count in range(pair_count_dict[pair])]
+        return cls._number_occurrences(pairs)
 
     @classmethod
     def _s_t_p2(
@@ -0,0 +1,439 @@
+# Python imports
+from array import array
+from bisect import bisect_right
+from itertools import compress, islice
+from operator import xor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Third-party imports
+from bitarray import bitarray
+
+# Project imports
+from src.utils import ZNAddToken, ZNSrchToken
+from src.zhao_nishide.zn_index_file import ZNIndexFile
+from src.zhao_nishide.zn_server import ZNServer
+
+"""Type declaration for a segment of a columnar index, a (Bloom filter matrix, document identifiers, Bloom filter IDs,
+first row) tuple. The first row is the row number of the segment's first entry within the index."""
+Segment = Tuple[Union[bytearray, memoryview], Union[array, memoryview], Union[bytearray, memoryview], int]
+
+
+class ZNColumnarServer(ZNServer):
+    """Zhao and Nishide server storing its index in contiguous, array-backed columns instead of a list of entries.
+
+    All Bloom filters are stored in one packed bit matrix, one row of a fixed number of bytes per entry. Document
+    identifiers are stored in an array of 64-bit integers and Bloom filter IDs in one contiguous buffer, read through
+    memoryview slices. Deleted rows are marked in a bitarray of live rows until the index is compacted. Searches and
+    deletes work on row numbers, so no per-entry objects are kept besides the keys of the slot map. The insertion
+    sequence numbers of the rows are kept in a column as well. The index can be saved in the binary format of
+    ZNIndexFile.
+
+    Document identifiers should fit in a signed 64-bit integer, which rules out Libertas' encrypted updates.
+    """
+
+    def __init__(
+            self,
+            bf_size: Optional[int] = None,
+            mask_cache_bytes: int = 0,
+            hot_positions: int = 0,
+            adaptive_ordering: bool = False,
+            exploration_rate: float = .05,
+            prf: str = 'hmac-sha256',
+    ) -> None:
+        """Initializes a columnar Zhao and Nishide server.
+
+        :param bf_size: The size of the Bloom filters in the index (bits), taken from the first added entry when None
+        :type bf_size: Optional[int]
+        :param mask_cache_bytes: The memory budget for caching mask bits between searches (bytes). No mask bits are
+        cached when 0
+        :type mask_cache_bytes: int
+        :param hot_positions: The number of most recently searched positions for which the mask bits of new entries are
+        computed when they are added. Only used when mask bits are cached
+        :type hot_positions: int
+        :param adaptive_ordering: Whether to test the positions of a search token in order of their observed rejection
+        rate
+        :type adaptive_ordering: bool
+        :param exploration_rate: The probability that a search tests a random position first. Only used with adaptive
+        ordering
+        :type exploration_rate: float
+        :param prf: The PRF backend of the scheme, one of crypto.PRF_BACKENDS. Tokens created with a different backend are
+        rejected
+        :type prf: str
+        :returns: None
+        :rtype: None
+        """
+        super().__init__(mask_cache_bytes, hot_positions, adaptive_ordering, exploration_rate, prf)
+        self.bf_size = bf_size
+        self.b_id_size = self.prf_backend.output_size
+        self.row_offset = 0
+        self.bloom_filters = None
+        self.inds = None
+        self.b_ids = None
+        self.live = None
+
+    @property
+    def stride(
+            self,
+    ) -> Optional[int]:
+        """The number of bytes of a row in the Bloom filter matrix.
+
+        :returns: The row stride, or None if the Bloom filter size is not known yet
+        :rtype: Optional[int]
+        """
+        return None if self.bf_size is None else (self.bf_size + 7) // 8
+
+    def build_index(
+            self,
+    ) -> None:
+        """Sets up the Z&N server, creating an empty index. The list-based index of ZNServer is not used.
+
+        :returns: None
+        :rtype: None
+        """
+        super().build_index()
+        self.index = None
+        self.bloom_filters = bytearray()
+        self.inds = array('q')
+        self.b_ids = bytearray()
+        self.live = bitarray()
+
+    def _search_from(
+            self,
+            srch_token: ZNSrchToken,
+            first_row: int,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[int]:
+        """Searches the index from a row onwards, see ZNServer.search_iter.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param first_row: The first row to scan
+        :type first_row: int
+        :param limit: The maximum number of document IDs to yield, or None to yield all matches
+        :type limit: Optional[int]
+        :param newest_first: Whether to scan the index backwards, yielding matches in reverse insertion order
+        :type newest_first: bool
+        :returns: An iterator over the identifiers of matching documents
+        :rtype: Iterator[int]
+        :raises ValueError: If the search token was created with a different PRF backend
+        """
+        self._check_prf(srch_token[-1])
+        if limit is not None and limit <= 0:
+            return
+        pairs = self._order_positions(srch_token)
+        # Compaction replaces the columns, so a running search keeps scanning the columns it started with
+        (segments, live) = (self._segments(), self.live)
+        seen = set()
+        for (bloom_filters, inds, b_ids, segment_row) in reversed(segments) if newest_first else segments:
+            rows = len(inds)
+            starts = range(max(first_row - segment_row, 0), rows, self.BLOCK_SIZE)
+            for start in reversed(starts) if newest_first else starts:
+                block = range(start, min(start + self.BLOCK_SIZE, rows))
+                if self.tombstones:
+                    block = list(compress(block, live[segment_row + block.start:segment_row + block.stop]))
+                matches = self._scan_rows(block, pairs, bloom_filters, b_ids)
+                for row in reversed(matches) if newest_first else matches:
+                    ind = inds[row]
+                    if ind not in seen:
+                        seen.add(ind)
+                        yield ind
+                        if len(seen) == limit:
+                            return
+
+    def _first_after(
+            self,
+            since: int,
+    ) -> int:
+        """Determines the first row added after an insertion sequence number. The insertion sequence numbers of the rows
+        held in memory are kept in a column, rows before the row offset are numbered from 1 in row order.
+
+        :param since: The insertion sequence number
+        :type since: int
+        :returns: The first newer row, or the number of rows if there is none
+        :rtype: int
+        """
+        if since < self.row_offset:
+            return since
+        return self.row_offset + bisect_right(self.sequences, since)
+
+    def add(
+            self,
+            add_token: ZNAddToken,
+    ) -> None:
+        """Adds a document-keyword pair, represented by an add token, to the index.
+        Adding a pair that is already in the index has no effect.
+
+        :param add_token: An add token representing a document-keyword pair
+        :type add_token: ZNAddToken
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the add token was created with a different PRF backend, or does not fit the columns
+        """
+        self.add_many([add_token])
+
+    def add_many(
+            self,
+            add_tokens: Iterable[ZNAddToken],
+            validate: bool = False,
+    ) -> None:
+        """Adds a number of document-keyword pairs, represented by add tokens, to the index.
+        Tokens are taken from the iterable in batches. Each batch is checked to fit the columns before any of its tokens
+        is added, after which every column is extended once. Pairs that are already in the index, or earlier in the
+        batch, are skipped.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: Iterable[ZNAddToken]
+        :param validate: Whether to check the shape of the add tokens before adding them
+        :type validate: bool
+        :returns: None
+        :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend, does not fit the columns, or is
+        malformed when validating
+        """
+        add_tokens = iter(add_tokens)
+        while True:
+            batch = list(islice(add_tokens, self.BATCH_SIZE))
+            if not batch:
+                break
+            if validate:
+                self._validate(batch)
+
+            fresh = self._fresh_entries(batch)
+            if fresh:
+                inds = self._check_columns(fresh)
+                self._append_rows(fresh, inds)
+
+    def _fresh_entries(
+            self,
+            batch: List[ZNAddToken],
+    ) -> Dict[bytes, Tuple[int, bitarray]]:
+        """Collects the entries of a batch of add tokens that are neither in the index nor earlier in the batch.
+
+        :param batch: The add tokens
+        :type batch: List[ZNAddToken]
+        :returns: The document identifiers and Bloom filters of the new entries, by Bloom filter ID
+        :rtype: Dict[bytes, Tuple[int, bitarray]]
+        :raises ValueError: If an add token was created with a different PRF backend
+        """
+        slots = self.slots
+        fresh: Dict[bytes, Tuple[int, bitarray]] = {}
+        for (ind, bloom_filter, b_id, prf) in batch:
+            self._check_prf(prf)
+            if b_id not in slots and b_id not in fresh:
+                fresh[b_id] = (ind, bloom_filter)
+        return fresh
+
+    def _check_columns(
+            self,
+            fresh: Dict[bytes, Tuple[int, bitarray]],
+    ) -> array:
+        """Checks that new entries fit the columns, fixing the Bloom filter size when the index is still empty.
+
+        :param fresh: The document identifiers and Bloom filters of the new entries, by Bloom filter ID
+        :type fresh: Dict[bytes, Tuple[int, bitarray]]
+        :returns: The document identifiers of the new entries
+        :rtype: array
+        :raises ValueError: If an entry does not fit the columns
+        """
+        bf_size = self.bf_size if self.bf_size is not None else len(next(iter(fresh.values()))[1])
+        for b_id, (_, bloom_filter) in fresh.items():
+            if len(bloom_filter) != bf_size:
+                raise ValueError('Bloom filters should be bitarrays of length {0}'.format(bf_size))
+            if len(b_id) != self.b_id_size:
+                raise ValueError('Bloom filter IDs should be {0} bytes long'.format(self.b_id_size))
+        try:
+            inds = array('q', (ind for (ind, _) in fresh.values()))
+        except (OverflowError, TypeError):
+            raise ValueError('Document identifiers should be integers that fit in 64 bits')
+        self.bf_size = bf_size
+        return inds
+
+    def _append_rows(
+            self,
+            fresh: Dict[bytes, Tuple[int, bitarray]],
+            inds: array,
+    ) -> None:
+        """Extends every column once with new entries.
+
+        :param fresh: The document identifiers and Bloom filters of the new entries, by Bloom filter ID
+        :type fresh: Dict[bytes, Tuple[int, bitarray]]
+        :param inds: The document identifiers of the new entries
+        :type inds: array
+        :returns: None
+        :rtype: None
+        """
+        start = self.row_offset + len(self.inds)
+        self.inds.extend(inds)
+        self.bloom_filters.extend(b''.join(self._row(bloom_filter) for (_, bloom_filter) in fresh.values()))
+        self.b_ids.extend(b''.join(fresh.keys()))
+        live = bitarray(len(fresh))
+        live.setall(True)
+        self.live.extend(live)
+        self.sequences.extend(range(self.sequence + 1, self.sequence + 1 + len(fresh)))
+        self.sequence += len(fresh)
+        self.slots.update(zip(fresh.keys(), range(start, start + len(fresh))))
+        if self.mask_cache is not None:
+            self.mask_cache.precompute(list(fresh.keys()), self._mask_bits)
+
+    def save(
+            self,
+            path: str,
+    ) -> None:
+        """Writes the entries of the index to an index file, leaving out deleted rows (see ZNIndexFile). The file can be
+        opened by ZNMappedServer.
+
+        :param path: The path of the index file
+        :type path: str
+        :returns: None
+        :rtype: None
+        """
+        segments = self._segments()
+        (stride, b_id_size) = (self.stride or 0, self.b_id_size)
+        if self.tombstones:
+            live_rows = [list(compress(range(len(inds)), self.live[first_row:first_row + len(inds)]))
+                         for (_, inds, _, first_row) in segments]
+            bloom_filters = (b''.join(bloom_filters[row * stride:(row + 1) * stride] for row in rows)
+                             for (bloom_filters, _, _, _), rows in zip(segments, live_rows))
+            inds = (array('q', (inds[row] for row in rows)) for (_, inds, _, _), rows in zip(segments, live_rows))
+            b_ids = (b''.join(b_ids[row * b_id_size:(row + 1) * b_id_size] for row in rows)
+                     for (_, _, b_ids, _), rows in zip(segments, live_rows))
+        else:
+            bloom_filters = (segment[0] for segment in segments)
+            inds = (segment[1] for segment in segments)
+            b_ids = (segment[2] for segment in segments)
+        count = sum(len(inds) for (_, inds, _, _) in segments) - self.tombstones
+        ZNIndexFile.write(path, self.prf_backend.name, self.bf_size or 0, b_id_size, count, bloom_filters, inds, b_ids)
+
+    def _segments(
+            self,
+    ) -> List[Segment]:
+        """Lists the segments of the index, in index order. The columns held in memory form a single segment.
+
+        :returns: The segments
+        :rtype: List[Segment]
+        """
+        return [(self.bloom_filters, self.inds, self.b_ids, self.row_offset)]
+
+    def _validate(
+            self,
+            add_tokens: List[ZNAddToken],
+    ) -> None:
+        """Checks that add tokens consist of a 64-bit integer document identifier, a Bloom filter of the same size as the
+        Bloom filters in the index, a Bloom filter ID of the size of the column and the PRF backend of the index.
+
+        :param add_tokens: The add tokens to check
+        :type add_tokens: List[ZNAddToken]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If any of the add tokens is malformed
+        """
+        bf_size = self.bf_size
+        for add_token in add_tokens:
+            if not isinstance(add_token, tuple) or len(add_token) != 4:
+                raise ValueError('Add tokens should be (ind, Bloom filter, Bloom filter ID, PRF backend) tuples')
+            (ind, bloom_filter, b_id, prf) = add_token
+            self._check_prf(prf)
+            if bf_size is None:
+                bf_size = len(bloom_filter)
+            if not isinstance(ind, int) or not -(1 << 63) <= ind < 1 << 63:
+                raise ValueError('Invalid document identifier: {0!r}'.format(ind))
+            if not isinstance(bloom_filter, bitarray) or len(bloom_filter) != bf_size:
+                raise ValueError('Bloom filters should be bitarrays of length {0}'.format(bf_size))
+            if not isinstance(b_id, bytes) or len(b_id) != self.b_id_size:
+                raise ValueError('Bloom filter IDs should be {0} bytes long'.format(self.b_id_size))
+
+    def _remove(
+            self,
+            b_id: bytes,
+    ) -> None:
+        """Marks the row with the given Bloom filter ID as deleted, if it is in the index.
+
+        :param b_id: The Bloom filter ID of the entry to remove
+        :type b_id: bytes
+        :returns: None
+        :rtype: None
+        """
+        row = self.slots.pop(b_id, None)
+        if row is not None:
+            self.live[row] = False
+            self.tombstones += 1
+
+    def _compact_if_needed(
+            self,
+    ) -> None:
+        """Rebuilds the columns without deleted rows once they make up more than half of the index. Rows keep their
+        relative order. Cached mask bits of the deleted rows are dropped along with them.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.tombstones * 2 <= len(self.inds):
+            return
+        (stride, b_id_size) = (self.stride, self.b_id_size)
+        rows = list(compress(range(len(self.inds)), self.live))
+        with memoryview(self.bloom_filters) as bloom_filters, memoryview(self.b_ids) as b_ids:
+            self.bloom_filters = bytearray(b''.join(bloom_filters[row * stride:(row + 1) * stride] for row in rows))
+            self.b_ids = bytearray(b''.join(b_ids[row * b_id_size:(row + 1) * b_id_size] for row in rows))
+        self.inds = array('q', (self.inds[row] for row in rows))
+        self.sequences = array('Q', (self.sequences[row] for row in rows))
+        self.live = bitarray(len(rows))
+        self.live.setall(True)
+        with memoryview(self.b_ids) as b_ids:
+            self.slots = {bytes(b_ids[row * b_id_size:(row + 1) * b_id_size]): row for row in range(len(rows))}
+        self.tombstones = 0
+        if self.mask_cache is not None:
+            self.mask_cache.prune(self.slots.__contains__)
+
+    def _scan_rows(
+            self,
+            rows: Sequence[int],
+            pairs: List[Tuple[int, bytes]],
+            bloom_filters: bytearray,
+            b_ids: bytearray,
+    ) -> List[int]:
+        """Determines which rows match a search token, testing one position at a time across all rows and keeping only
+        the rows that survive each position (see ZNServer._scan). Bloom filter bits are read from the matrix directly.
+
+        :param rows: The row numbers to test
+        :type rows: Sequence[int]
+        :param pairs: The (position, hashed position) pairs of the search token, in the order they are to be tested
+        :type pairs: List[Tuple[int, bytes]]
+        :param bloom_filters: The Bloom filter matrix
+        :type bloom_filters: bytearray
+        :param b_ids: The Bloom filter ID buffer
+        :type b_ids: bytearray
+        :returns: The matching row numbers, in index order
+        :rtype: List[int]
+        """
+        (stride, b_id_size) = (self.stride, self.b_id_size)
+        survivors = rows
+        with memoryview(b_ids) as view:
+            for pos, h_pos in pairs:
+                if not survivors:
+                    break
+                (offset, shift) = (pos >> 3, 7 - (pos & 7))
+                bits = [(bloom_filters[row * stride + offset] >> shift) & 1 for row in survivors]
+                survivor_b_ids = [bytes(view[row * b_id_size:(row + 1) * b_id_size]) for row in survivors]
+                if self.mask_cache is None:
+                    mask_bits = self._mask_bits(survivor_b_ids, h_pos)
+                else:
+                    mask_bits = self.mask_cache.mask_bits(h_pos, survivor_b_ids, self._mask_bits)
+                tested = len(survivors)
+                survivors = list(compress(survivors, map(xor, bits, mask_bits)))
+                if self.adaptive_ordering:
+                    self._record_rejections(pos, tested, tested - len(survivors))
+        return list(survivors)
+
+    @staticmethod
+    def _row(
+            bloom_filter: bitarray,
+    ) -> bytes:
+        """Converts a Bloom filter to a row of the matrix, its bits in big-endian order padded to whole bytes.
+
+        :param bloom_filter: The Bloom filter
+        :type bloom_filter: bitarray
+        :returns: The row
+        :rtype: bytes
+        """
+        return bitarray(bloom_filter, endian='big').tobytes()
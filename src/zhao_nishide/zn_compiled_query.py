@@ -0,0 +1,41 @@
+# Project imports
+from src.utils import ZNSrchToken
+
+
+class ZNCompiledQuery(object):
+    """A query compiled by a Z&N client, holding its search token so it can be searched for repeatedly.
+
+    The token is only valid for the keys it was created with. Every compiled query records the key epoch of the client
+    that compiled it, the client recompiles the query when its keys have changed since.
+    """
+
+    def __init__(
+            self,
+            q: str,
+            srch_token: ZNSrchToken,
+            epoch: int,
+    ) -> None:
+        """Initializes a compiled query.
+
+        :param q: The query, a string of characters, possibly containing singular _ and * wildcards
+        :type q: str
+        :param srch_token: The search token of the query
+        :type srch_token: ZNSrchToken
+        :param epoch: The key epoch of the client at the time the search token was created
+        :type epoch: int
+        :returns: None
+        :rtype: None
+        """
+        self.q = q
+        self.srch_token = srch_token
+        self.epoch = epoch
+
+    def __repr__(
+            self,
+    ) -> str:
+        """Representation of the compiled query, leaving out the search token.
+
+        :returns: The representation
+        :rtype: str
+        """
+        return 'ZNCompiledQuery({0!r}, epoch={1})'.format(self.q, self.epoch)
@@ -0,0 +1,179 @@
+# Python imports
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterable, Union
+
+"""Type declaration for the buffers a section of an index file is written from."""
+Buffer = Union[bytes, bytearray, memoryview, array]
+
+
+class ZNIndexFile(object):
+    """Binary file format of a Z&N index, opened through mmap so it can be searched without reading it into memory.
+
+    The file consists of a 64-byte header followed by three sections holding the columns of the index, in the layout
+    of ZNColumnarServer. All integers are little-endian.
+
+    Header:
+        8s   magic, b'ZNINDEX\\0'
+        H    format version, currently 1
+        H    size of a Bloom filter ID (bytes)
+        I    size of a Bloom filter (bits)
+        Q    number of entries n
+        16s  name of the PRF backend, padded with zero bytes
+        24x  reserved, zero bytes
+
+    Sections:
+        Bloom filters         n rows of ceil(bf_size / 8) bytes, bits in big-endian order. Zero bytes are appended to
+                              the section to make its size a multiple of 8
+        Document identifiers  n signed 64-bit integers
+        Bloom filter IDs      n IDs of the Bloom filter ID size
+    """
+
+    """Header layout, see the class documentation."""
+    HEADER = struct.Struct('<8sHHIQ16s24x')
+    MAGIC = b'ZNINDEX\0'
+    VERSION = 1
+
+    def __init__(
+            self,
+            path: str,
+    ) -> None:
+        """Opens an index file, mapping it into memory read-only and checking its header.
+
+        :param path: The path of the index file
+        :type path: str
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the file is not a Z&N index file, has an unsupported version or is truncated
+        """
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        try:
+            if len(self.mmap) < self.HEADER.size:
+                raise ValueError('{0} is not a Z&N index file'.format(path))
+            (magic, version, self.b_id_size, self.bf_size, self.count, prf) = self.HEADER.unpack_from(self.mmap)
+            if magic != self.MAGIC:
+                raise ValueError('{0} is not a Z&N index file'.format(path))
+            if version != self.VERSION:
+                raise ValueError('Unsupported Z&N index file version {0}'.format(version))
+            self.prf = prf.rstrip(b'\0').decode('ascii')
+            self.stride = (self.bf_size + 7) // 8
+
+            filters_start = self.HEADER.size
+            inds_start = filters_start + self._padded(self.count * self.stride)
+            b_ids_start = inds_start + 8 * self.count
+            end = b_ids_start + self.count * self.b_id_size
+            if len(self.mmap) < end:
+                raise ValueError('{0} is truncated'.format(path))
+        except ValueError:
+            self.mmap.close()
+            raise
+
+        view = memoryview(self.mmap)
+        self.bloom_filters = view[filters_start:inds_start]
+        self.b_ids = view[b_ids_start:end]
+        if sys.byteorder == 'little':
+            self.inds = view[inds_start:b_ids_start].cast('q')
+        else:
+            self.inds = array('q', view[inds_start:b_ids_start])
+            self.inds.byteswap()
+        view.release()
+
+    def close(
+            self,
+    ) -> None:
+        """Unmaps the file. Searches still reading from it fail afterwards.
+
+        :returns: None
+        :rtype: None
+        """
+        for column in (self.bloom_filters, self.inds, self.b_ids):
+            if isinstance(column, memoryview):
+                column.release()
+        self.mmap.close()
+
+    @classmethod
+    def write(
+            cls,
+            path: str,
+            prf: str,
+            bf_size: int,
+            b_id_size: int,
+            count: int,
+            bloom_filters: Iterable[Buffer],
+            inds: Iterable[array],
+            b_ids: Iterable[Buffer],
+    ) -> None:
+        """Writes an index file. The sections are given as sequences of buffers that are written one after the other.
+        The file is written next to its destination first and moved into place once it is complete, so a crash never
+        leaves a partially written index behind.
+
+        :param path: The path of the index file
+        :type path: str
+        :param prf: The name of the PRF backend of the index
+        :type prf: str
+        :param bf_size: The size of the Bloom filters (bits)
+        :type bf_size: int
+        :param b_id_size: The size of the Bloom filter IDs (bytes)
+        :type b_id_size: int
+        :param count: The number of entries
+        :type count: int
+        :param bloom_filters: Buffers holding the Bloom filter rows
+        :type bloom_filters: Iterable[Buffer]
+        :param inds: Arrays holding the document identifiers
+        :type inds: Iterable[array]
+        :param b_ids: Buffers holding the Bloom filter IDs
+        :type b_ids: Iterable[Buffer]
+        :returns: None
+        :rtype: None
+        """
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, b_id_size, bf_size, count, prf.encode('ascii')))
+            size = cls._write_section(file, bloom_filters)
+            file.write(bytes(cls._padded(size) - size))
+            for column in inds:
+                if sys.byteorder != 'little':
+                    column = array('q', column)
+                    column.byteswap()
+                file.write(column)
+            cls._write_section(file, b_ids)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def _write_section(
+            file: BinaryIO,
+            buffers: Iterable[Buffer],
+    ) -> int:
+        """Writes a section of an index file.
+
+        :param file: The index file
+        :type file: BinaryIO
+        :param buffers: The buffers holding the section
+        :type buffers: Iterable[Buffer]
+        :returns: The size of the section (bytes)
+        :rtype: int
+        """
+        size = 0
+        for buffer in buffers:
+            size += file.write(buffer)
+        return size
+
+    @staticmethod
+    def _padded(
+            size: int,
+    ) -> int:
+        """Rounds the size of a section up to a multiple of 8 bytes, so the next section is aligned.
+
+        :param size: The size of the section (bytes)
+        :type size: int
+        :returns: The padded size (bytes)
+        :rtype: int
+        """
+        return (size + 7) // 8 * 8
@@ -0,0 +1,182 @@
+# Python imports
+from typing import Iterable, List, Optional
+
+# Third-party imports
+from bitarray import bitarray
+
+# Project imports
+from src.utils import ZNAddToken
+from src.zhao_nishide.zn_columnar_server import Segment, ZNColumnarServer
+from src.zhao_nishide.zn_index_file import ZNIndexFile
+
+
+class ZNMappedServer(ZNColumnarServer):
+    """Zhao and Nishide server searching an index file (see ZNIndexFile) in place, through mmap.
+
+    Opening an index file only maps it and reads its header, so the server is ready to search right away, whatever the
+    size of the index. The file is never modified: added entries go to a tail segment held in memory, in the columns of
+    ZNColumnarServer, and deleted rows of either segment are only marked as such. The slot map, which is needed to
+    update the index, is built on the first update. Save the index and open it again to fold the tail segment and the
+    deletions into a new file. The rows of the index file are numbered 1 to the number of rows in insertion sequence,
+    so numbers returned by search_since before the file was opened do not carry over.
+    """
+
+    def __init__(
+            self,
+            bf_size: Optional[int] = None,
+            mask_cache_bytes: int = 0,
+            hot_positions: int = 0,
+            adaptive_ordering: bool = False,
+            exploration_rate: float = .05,
+            prf: str = 'hmac-sha256',
+    ) -> None:
+        """Initializes a Zhao and Nishide server for searching index files, see ZNColumnarServer for the parameters.
+
+        :returns: None
+        :rtype: None
+        """
+        super().__init__(bf_size, mask_cache_bytes, hot_positions, adaptive_ordering, exploration_rate, prf)
+        self.index_file: Optional[ZNIndexFile] = None
+
+    def build_index(
+            self,
+    ) -> None:
+        """Sets up the Z&N server, creating an empty index without an index file. Any opened index file is closed.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+        super().build_index()
+        self.row_offset = 0
+
+    def open(
+            self,
+            path: str,
+    ) -> None:
+        """Opens an index file, replacing the current index by its entries.
+
+        :param path: The path of the index file
+        :type path: str
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the file is not a valid index file, or was written with different parameters
+        """
+        index_file = ZNIndexFile(path)
+        try:
+            self._check_prf(index_file.prf)
+            if index_file.b_id_size != self.b_id_size:
+                raise ValueError('Bloom filter IDs in {0} are {1} bytes long, expected {2}'
+                                 .format(path, index_file.b_id_size, self.b_id_size))
+        except ValueError:
+            index_file.close()
+            raise
+
+        self.build_index()
+        self.index_file = index_file
+        if index_file.count:
+            self.bf_size = index_file.bf_size
+        self.row_offset = index_file.count
+        self.sequence = index_file.count
+        self.live = bitarray(index_file.count)
+        self.live.setall(True)
+        self.slots = None
+
+    def close(
+            self,
+    ) -> None:
+        """Closes the opened index file, if any, leaving an empty index.
+
+        :returns: None
+        :rtype: None
+        """
+        self.build_index()
+
+    def add_many(
+            self,
+            add_tokens: Iterable[ZNAddToken],
+            validate: bool = False,
+    ) -> None:
+        """Adds a number of document-keyword pairs, represented by add tokens, to the tail segment.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: Iterable[ZNAddToken]
+        :param validate: Whether to check the shape of the add tokens before adding them
+        :type validate: bool
+        :returns: None
+        :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend, does not fit the columns, or is
+        malformed when validating
+        """
+        self._load_slots()
+        super().add_many(add_tokens, validate)
+
+    def delete(
+            self,
+            del_token: bytes,
+    ) -> None:
+        """Marks a document-keyword pair, represented by a delete token, as deleted.
+
+        :param del_token: A delete token representing a document-keyword pair
+        :type del_token: bytes
+        :returns: None
+        :rtype: None
+        """
+        self._load_slots()
+        super().delete(del_token)
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[bytes],
+    ) -> None:
+        """Marks a number of document-keyword pairs, represented by delete tokens, as deleted.
+
+        :param del_tokens: Delete tokens representing document-keyword pairs
+        :type del_tokens: Iterable[bytes]
+        :returns: None
+        :rtype: None
+        """
+        self._load_slots()
+        super().delete_many(del_tokens)
+
+    def _load_slots(
+            self,
+    ) -> None:
+        """Builds the slot map of the opened index file, if that has not been done yet.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.slots is not None:
+            return
+        b_id_size = self.b_id_size
+        with memoryview(self.index_file.b_ids) as b_ids:
+            self.slots = {bytes(b_ids[row * b_id_size:(row + 1) * b_id_size]): row
+                          for row in range(self.index_file.count) if self.live[row]}
+
+    def _compact_if_needed(
+            self,
+    ) -> None:
+        """Does nothing, as the index file cannot be compacted in place. Deleted rows are left out when the index is
+        saved.
+
+        :returns: None
+        :rtype: None
+        """
+        pass
+
+    def _segments(
+            self,
+    ) -> List[Segment]:
+        """Lists the segments of the index: the index file, if any, followed by the tail segment.
+
+        :returns: The segments
+        :rtype: List[Segment]
+        """
+        segments = super()._segments()
+        if self.index_file is not None:
+            index_file = self.index_file
+            segments.insert(0, (index_file.bloom_filters, index_file.inds, index_file.b_ids, 0))
+        return segments
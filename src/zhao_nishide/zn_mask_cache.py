@@ -0,0 +1,166 @@
+# Python imports
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+
+class MaskBitCache(object):
+    """Memory-bounded cache of Z&N mask bits, keyed by Bloom filter ID and hashed Bloom filter position.
+
+    A mask bit only depends on the Bloom filter ID of an entry and the hash of a position, so it can be reused by every
+    search that tests that position. Bits are grouped into columns, one per position, matching the column-wise search
+    of ZNServer. When the byte budget is exceeded, least recently used columns are evicted as a whole.
+    """
+
+    """Estimated number of bytes used to cache a single mask bit (a dict slot referencing a shared Bloom filter ID)."""
+    BYTES_PER_BIT = 64
+
+    def __init__(
+            self,
+            max_bytes: int,
+            hot_positions: int = 0,
+    ) -> None:
+        """Initializes an empty cache.
+
+        :param max_bytes: The memory budget of the cache (bytes)
+        :type max_bytes: int
+        :param hot_positions: The number of most recently used positions for which mask bits of new entries are
+        computed ahead of time
+        :type hot_positions: int
+        :returns: None
+        :rtype: None
+        """
+        if max_bytes < 0:
+            raise ValueError('The memory budget of the cache cannot be negative')
+        self.max_bits = max_bytes // self.BYTES_PER_BIT
+        self.hot_positions = hot_positions
+        self.columns: 'OrderedDict[bytes, Dict[bytes, int]]' = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def mask_bits(
+            self,
+            h_pos: bytes,
+            b_ids: List[bytes],
+            compute: Callable[[List[bytes], bytes], List[int]],
+    ) -> List[int]:
+        """Looks up the mask bits of a number of entries at a position, computing and storing the missing ones.
+
+        :param h_pos: The hashed Bloom filter position
+        :type h_pos: bytes
+        :param b_ids: The Bloom filter IDs of the entries
+        :type b_ids: List[bytes]
+        :param compute: Function computing mask bits for a list of Bloom filter IDs and a hashed position
+        :type compute: Callable[[List[bytes], bytes], List[int]]
+        :returns: The mask bits, in the order of the Bloom filter IDs
+        :rtype: List[int]
+        """
+        column = self._touch(h_pos)
+        bits = list(map(column.get, b_ids))
+        missing = [i for i, bit in enumerate(bits) if bit is None]
+        self.hits += len(bits) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            missing_b_ids = [b_ids[i] for i in missing]
+            computed = compute(missing_b_ids, h_pos)
+            for i, bit in zip(missing, computed):
+                bits[i] = bit
+            self._store(h_pos, missing_b_ids, computed)
+        return bits
+
+    def precompute(
+            self,
+            b_ids: List[bytes],
+            compute: Callable[[List[bytes], bytes], List[int]],
+    ) -> None:
+        """Computes the mask bits of newly added entries for the most recently used positions.
+
+        :param b_ids: The Bloom filter IDs of the new entries
+        :type b_ids: List[bytes]
+        :param compute: Function computing mask bits for a list of Bloom filter IDs and a hashed position
+        :type compute: Callable[[List[bytes], bytes], List[int]]
+        :returns: None
+        :rtype: None
+        """
+        if self.hot_positions <= 0:
+            return
+        hot = list(self.columns.keys())[-self.hot_positions:]
+        for h_pos in hot:
+            if h_pos in self.columns:
+                self._store(h_pos, b_ids, compute(b_ids, h_pos))
+
+    def prune(
+            self,
+            is_live: Callable[[bytes], bool],
+    ) -> None:
+        """Removes the mask bits of entries that are no longer in the index. This walks the whole cache, so it is meant
+        to be called when the index drops its deleted entries in bulk, keeping deletes themselves constant time. Columns
+        are replaced instead of changed, so searches running at the same time can keep using them.
+
+        :param is_live: Function determining whether the entry with a Bloom filter ID is still in the index
+        :type is_live: Callable[[bytes], bool]
+        :returns: None
+        :rtype: None
+        """
+        for h_pos, column in list(self.columns.items()):
+            self.columns[h_pos] = {b_id: bit for b_id, bit in list(column.items()) if is_live(b_id)}
+        self.size = sum(map(len, list(self.columns.values())))
+
+    def clear(
+            self,
+    ) -> None:
+        """Removes all cached mask bits.
+
+        :returns: None
+        :rtype: None
+        """
+        self.columns.clear()
+        self.size = 0
+
+    def _touch(
+            self,
+            h_pos: bytes,
+    ) -> Dict[bytes, int]:
+        """Returns the column of a position, marking it as most recently used.
+
+        :param h_pos: The hashed Bloom filter position
+        :type h_pos: bytes
+        :returns: The cached mask bits of the position, by Bloom filter ID
+        :rtype: Dict[bytes, int]
+        """
+        column = self.columns.get(h_pos)
+        if column is None:
+            column = self.columns[h_pos] = {}
+        else:
+            self.columns.move_to_end(h_pos)
+        return column
+
+    def _store(
+            self,
+            h_pos: bytes,
+            b_ids: List[bytes],
+            bits: List[int],
+    ) -> None:
+        """Stores mask bits in the column of a position, evicting other columns when the budget is exceeded. When the
+        column alone exceeds the budget, only the bits that fit are stored.
+
+        :param h_pos: The hashed Bloom filter position
+        :type h_pos: bytes
+        :param b_ids: The Bloom filter IDs of the entries
+        :type b_ids: List[bytes]
+        :param bits: The mask bits of the entries
+        :type bits: List[int]
+        :returns: None
+        :rtype: None
+        """
+        column = self.columns[h_pos]
+        while self.size + len(b_ids) > self.max_bits:
+            victim = next((key for key in self.columns if key != h_pos), None)
+            if victim is None:
+                break
+            self.size -= len(self.columns.pop(victim))
+
+        before = len(column)
+        room = max(self.max_bits - self.size, 0)
+        column.update(zip(b_ids[:room], bits[:room]))
+        self.size += len(column) - before
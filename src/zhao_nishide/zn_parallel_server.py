@@ -0,0 +1,262 @@
+# Python imports
+import multiprocessing
+import os
+from multiprocessing.connection import Connection
+from typing import Any, Iterable, List, Optional
+
+# Project imports
+from src.crypto import get_prf_backend
+from src.sigma_interface.sigma_server import SigmaServer
+from src.utils import ZNAddToken, ZNSrchToken
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class ZNParallelServer(SigmaServer[ZNAddToken, ZNSrchToken]):
+    """Zhao and Nishide server that scans its index on multiple cores.
+
+    The index is split into shards, one per worker process. Every shard is a regular ZNServer that lives inside its
+    worker, so entries are only transferred once, when they are added. Add and delete tokens are routed to the shard
+    owning the Bloom filter ID, search tokens are broadcast to all shards and the partial results are merged. Workers
+    answer every command, exceptions raised in a worker are sent back and raised again in the parent process.
+    """
+
+    def __init__(
+            self,
+            workers: Optional[int] = None,
+            prf: str = 'hmac-sha256',
+    ) -> None:
+        """Initializes a parallel Zhao and Nishide server.
+
+        :param workers: The number of worker processes, defaults to the number of available cores
+        :type workers: Optional[int]
+        :param prf: The PRF backend of the scheme, one of crypto.PRF_BACKENDS. Tokens created with a different backend are
+        rejected
+        :type prf: str
+        :returns: None
+        :rtype: None
+        """
+        super().__init__()
+        self.prf = get_prf_backend(prf).name
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        if self.workers < 1:
+            raise ValueError('The number of workers should be at least 1')
+        self.processes: List[multiprocessing.Process] = []
+        self.connections: List[Connection] = []
+
+    def build_index(
+            self,
+    ) -> None:
+        """Sets up the server, starting one worker process per shard, each holding an empty index.
+
+        :returns: None
+        :rtype: None
+        """
+        self.close()
+        for _ in range(self.workers):
+            (parent_connection, child_connection) = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, args=(child_connection, self.prf), daemon=True)
+            process.start()
+            child_connection.close()
+            self.processes.append(process)
+            self.connections.append(parent_connection)
+
+    def search(
+            self,
+            srch_token: ZNSrchToken,
+    ) -> List[int]:
+        """Searches all shards in parallel for a query represented by a search token and merges the results.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :returns: A list containing the identifiers of matching documents and possibly some other documents, as the
+        use of Bloom filters introduce false positives.
+        :rtype: List[int]
+        :raises ValueError: If the search token was created with a different PRF backend
+        """
+        self._check_prf(srch_token[-1])
+        for connection in self.connections:
+            connection.send(('search', (srch_token,)))
+
+        results = []
+        seen = set()
+        for partial_results in self._receive(self.connections):
+            for ind in partial_results:
+                if ind not in seen:
+                    seen.add(ind)
+                    results.append(ind)
+        return results
+
+    def add(
+            self,
+            add_token: ZNAddToken,
+    ) -> None:
+        """Adds a document-keyword pair, represented by an add token, to the shard owning its Bloom filter ID.
+
+        :param add_token: An add token representing a document-keyword pair
+        :type add_token: ZNAddToken
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the add token was created with a different PRF backend
+        """
+        (_, _, b_id, prf) = add_token
+        self._check_prf(prf)
+        connection = self.connections[self._shard(b_id)]
+        connection.send(('add', (add_token,)))
+        self._receive([connection])
+
+    def add_many(
+            self,
+            add_tokens: Iterable[ZNAddToken],
+            validate: bool = False,
+    ) -> None:
+        """Adds a number of document-keyword pairs, represented by add tokens, sending one message per shard.
+        When validating, every shard checks its part of the tokens before adding any of them.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: Iterable[ZNAddToken]
+        :param validate: Whether to check the shape of the add tokens before adding them
+        :type validate: bool
+        :returns: None
+        :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend, or is malformed when validating
+        """
+        shards: List[List[ZNAddToken]] = [[] for _ in range(self.workers)]
+        for add_token in add_tokens:
+            (_, _, b_id, prf) = add_token
+            self._check_prf(prf)
+            shards[self._shard(b_id)].append(add_token)
+        connections = [connection for connection, shard in zip(self.connections, shards) if shard]
+        for connection, shard in zip(self.connections, shards):
+            if shard:
+                connection.send(('add_many', (shard, validate)))
+        self._receive(connections)
+
+    def delete(
+            self,
+            del_token: bytes,
+    ) -> None:
+        """Deletes a document-keyword pair, represented by a delete token, from the shard owning its Bloom filter ID.
+
+        :param del_token: A delete token representing a document-keyword pair
+        :type del_token: bytes
+        :returns: None
+        :rtype: None
+        """
+        connection = self.connections[self._shard(del_token)]
+        connection.send(('delete', (del_token,)))
+        self._receive([connection])
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[bytes],
+    ) -> None:
+        """Deletes a number of document-keyword pairs, represented by delete tokens, sending one message per shard.
+
+        :param del_tokens: Delete tokens representing document-keyword pairs
+        :type del_tokens: Iterable[bytes]
+        :returns: None
+        :rtype: None
+        """
+        shards: List[List[bytes]] = [[] for _ in range(self.workers)]
+        for del_token in del_tokens:
+            shards[self._shard(del_token)].append(del_token)
+        connections = [connection for connection, shard in zip(self.connections, shards) if shard]
+        for connection, shard in zip(self.connections, shards):
+            if shard:
+                connection.send(('delete_many', (shard,)))
+        self._receive(connections)
+
+    def close(
+            self,
+    ) -> None:
+        """Stops all worker processes, discarding their shards.
+
+        :returns: None
+        :rtype: None
+        """
+        for connection in self.connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        self.connections = []
+
+    @staticmethod
+    def _receive(
+            connections: List[Connection],
+    ) -> List[Any]:
+        """Receives the answers of a number of workers. All answers are received before an exception sent back by a
+        worker is raised, so every connection is ready for the next command.
+
+        :param connections: The connections to the workers
+        :type connections: List[Connection]
+        :returns: The results of the commands, in the order of the connections
+        :rtype: List[Any]
+        :raises Exception: The first exception raised by a worker
+        """
+        answers = [connection.recv() for connection in connections]
+        for (status, result) in answers:
+            if status == 'error':
+                raise result
+        return [result for (_, result) in answers]
+
+    def _check_prf(
+            self,
+            prf: str,
+    ) -> None:
+        """Checks that a token was created with the PRF backend of the index, before it is sent to a worker.
+
+        :param prf: The name of the PRF backend recorded in the token
+        :type prf: str
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the token was created with a different PRF backend
+        """
+        if prf != self.prf:
+            raise ValueError('Token created with PRF backend \'{0}\', but the index uses \'{1}\''.format(prf, self.prf))
+
+    def _shard(
+            self,
+            b_id: bytes,
+    ) -> int:
+        """Determines which shard owns a Bloom filter ID.
+
+        :param b_id: The Bloom filter ID
+        :type b_id: bytes
+        :returns: The index of the owning shard
+        :rtype: int
+        """
+        return int.from_bytes(b_id[:4], 'big') % self.workers
+
+
+def _serve_shard(
+        connection: Connection,
+        prf: str,
+) -> None:
+    """Worker loop holding one shard of the index. Handles commands until it is asked to close. Every command is a
+    method of the shard with its arguments, and is answered with ('ok', result) or ('error', exception).
+
+    :param connection: The connection to the parent process
+    :type connection: Connection
+    :param prf: The PRF backend of the scheme
+    :type prf: str
+    :returns: None
+    :rtype: None
+    """
+    shard = ZNServer(prf=prf)
+    shard.build_index()
+    commands = {'add', 'add_many', 'delete', 'delete_many', 'search'}
+    while True:
+        (command, arguments) = connection.recv()
+        if command == 'close':
+            break
+        try:
+            if command not in commands:
+                raise ValueError('Unknown shard command: {0}'.format(command))
+            result = getattr(shard, command)(*arguments)
+        except Exception as error:
+            connection.send(('error', error))
+        else:
+            connection.send(('ok', result))
+    connection.close()
@@ -0,0 +1,58 @@
+# Python imports
+from array import array
+from typing import FrozenSet, List, Optional
+
+# Project imports
+from src.utils import ZNEntry
+
+
+class ZNSegment(object):
+    """A segment of a segmented Z&N index: a run of index entries, their insertion sequence numbers and the Bloom filter
+    IDs of the entries in it that have been deleted. The tombstones are an immutable set that is replaced on every
+    delete, so searches can keep a reference to it without seeing later deletes.
+
+    Once a segment has been merged into another one, it only refers to the segment that replaced it, so Bloom filter
+    IDs that are mapped to it can still be resolved to the segment holding their entry.
+    """
+
+    def __init__(
+            self,
+            entries: List[ZNEntry],
+            sequences: array,
+    ) -> None:
+        """Initializes a segment.
+
+        :param entries: The index entries of the segment, in index order
+        :type entries: List[ZNEntry]
+        :param sequences: The insertion sequence numbers of the entries, an array of unsigned 64-bit integers
+        :type sequences: array
+        :returns: None
+        :rtype: None
+        """
+        self.entries: Optional[List[ZNEntry]] = entries
+        self.sequences: Optional[array] = sequences
+        self.tombstones: FrozenSet[bytes] = frozenset()
+        self.merged_into: Optional[ZNSegment] = None
+
+    def __len__(
+            self,
+    ) -> int:
+        """Determines the number of entries in the segment that have not been deleted.
+
+        :returns: The number of live entries
+        :rtype: int
+        """
+        return len(self.entries) - len(self.tombstones)
+
+    def resolve(
+            self,
+    ) -> 'ZNSegment':
+        """Follows the segments this segment has been merged into, to the segment currently holding its entries.
+
+        :returns: The segment holding the entries of this segment
+        :rtype: ZNSegment
+        """
+        segment = self
+        while segment.merged_into is not None:
+            segment = segment.merged_into
+        return segment
@@ -0,0 +1,529 @@
+# Python imports
+import math
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+# Project imports
+from src.utils import ZNAddToken, ZNEntry, ZNSrchToken
+from src.zhao_nishide.zn_segment import ZNSegment
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class ZNSegmentedServer(ZNServer):
+    """Zhao and Nishide server keeping its index in segments, in the style of a log-structured merge tree.
+
+    New entries are appended to a mutable head segment. Once the head is full it is sealed, after which its entries
+    never move. Deletes only add the Bloom filter ID of an entry to the tombstones of the segment holding it. A merge,
+    running in a background thread, rewrites adjacent sealed segments into a single one without their deleted entries:
+    merge_factor segments of the same size tier are merged into one of the next tier, and a segment of which more than
+    half of the entries have been deleted is rewritten on its own. Searches scan a snapshot of the segments and skip
+    tombstoned entries, so neither adds nor deletes rebuild what a search is scanning. Entries keep their insertion
+    order across merges.
+    """
+
+    """Number of entries after which the head segment is sealed."""
+    HEAD_SIZE = 16384
+
+    """Number of segments of the same size tier that are merged into one."""
+    MERGE_FACTOR = 4
+
+    def __init__(
+            self,
+            head_size: int = HEAD_SIZE,
+            merge_factor: int = MERGE_FACTOR,
+            background_merge: bool = True,
+            mask_cache_bytes: int = 0,
+            hot_positions: int = 0,
+            adaptive_ordering: bool = False,
+            exploration_rate: float = .05,
+            prf: str = 'hmac-sha256',
+    ) -> None:
+        """Initializes a segmented Zhao and Nishide server, see ZNServer for the parameters not listed here.
+
+        :param head_size: The number of entries after which the head segment is sealed
+        :type head_size: int
+        :param merge_factor: The number of segments of the same size tier that are merged into one
+        :type merge_factor: int
+        :param background_merge: Whether segments are merged by a background thread. If not, merges only happen when
+        merge is called
+        :type background_merge: bool
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the head size is not positive, or the merge factor is smaller than 2
+        """
+        super().__init__(mask_cache_bytes, hot_positions, adaptive_ordering, exploration_rate, prf)
+        if head_size < 1:
+            raise ValueError('The head size should be at least 1')
+        if merge_factor < 2:
+            raise ValueError('The merge factor should be at least 2')
+        self.head_size = head_size
+        self.merge_factor = merge_factor
+        self.background_merge = background_merge
+        self.head: Optional[ZNSegment] = None
+        self.segments: List[ZNSegment] = []
+        self.merges = 0
+        self.lock = threading.RLock()
+        self.merge_requested = threading.Condition(self.lock)
+        self.merging = threading.Lock()
+        self.merger: Optional[threading.Thread] = None
+        self.stopped = False
+
+    def __getstate__(
+            self,
+    ) -> dict:
+        """Determines the state to pickle, leaving out the locks and the merge thread. The segments are copied while
+        holding the lock, so the state is consistent even while a merge is running.
+
+        :returns: The state of the server
+        :rtype: dict
+        """
+        with self.lock:
+            state = self.__dict__.copy()
+            slots: Dict[bytes, ZNSegment] = {}
+            copies = []
+            for segment in self.segments + [self.head]:
+                copy = ZNSegment(list(segment.entries), array('Q', segment.sequences))
+                copy.tombstones = segment.tombstones
+                slots.update((b_id, copy) for (_, _, b_id) in copy.entries if b_id not in copy.tombstones)
+                copies.append(copy)
+        (state['segments'], state['head'], state['slots']) = (copies[:-1], copies[-1], slots)
+        for attribute in ['lock', 'merge_requested', 'merging', 'merger']:
+            del state[attribute]
+        return state
+
+    def __setstate__(
+            self,
+            state: dict,
+    ) -> None:
+        """Restores a pickled server, starting a new merge thread.
+
+        :param state: The state of the server
+        :type state: dict
+        :returns: None
+        :rtype: None
+        """
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+        self.merge_requested = threading.Condition(self.lock)
+        self.merging = threading.Lock()
+        self.merger = None
+        self._start_merger()
+
+    def build_index(
+            self,
+    ) -> None:
+        """Sets up the Z&N server, creating an index consisting of an empty head segment. The slot map holds the
+        segment an entry was added to, which is resolved to the segment currently holding it when it is deleted.
+
+        :returns: None
+        :rtype: None
+        """
+        self.close()
+        super().build_index()
+        self.index = None
+        self.sequences = None
+        self.slots: Dict[bytes, ZNSegment] = {}
+        self.head = ZNSegment([], array('Q'))
+        self.segments = []
+        self._start_merger()
+
+    def close(
+            self,
+    ) -> None:
+        """Stops the merge thread, if it is running. Searches and updates are still possible, but no longer trigger
+        merges.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.merger is None:
+            return
+        with self.lock:
+            self.stopped = True
+            self.merge_requested.notify()
+        self.merger.join()
+        self.merger = None
+
+    def search_iter(
+            self,
+            srch_token: ZNSrchToken,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[int]:
+        """Searches the index for a query represented by a search token, yielding matching document IDs as they are
+        found. Each document ID is yielded once. The search scans the segments as they were when it started, skipping
+        the entries that were deleted by then.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param limit: The maximum number of document IDs to yield, or None to yield all matches
+        :type limit: Optional[int]
+        :param newest_first: Whether to scan the segments backwards, yielding matches in reverse insertion order
+        :type newest_first: bool
+        :returns: An iterator over the identifiers of matching documents and possibly some other documents, as the use
+        of Bloom filters introduce false positives.
+        :rtype: Iterator[int]
+        :raises ValueError: If the search token was created with a different PRF backend
+        """
+        return self._search_snapshot(srch_token, None, 0, limit, newest_first)
+
+    def search_since(
+            self,
+            srch_token: ZNSrchToken,
+            since: int = 0,
+    ) -> Tuple[List[int], int]:
+        """Searches the entries added after an insertion sequence number for a query represented by a search token. Every
+        segment keeps the insertion sequence numbers of its entries, so only the entries added since are scanned.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param since: The insertion sequence number returned by an earlier search, or 0 to search all entries
+        :type since: int
+        :returns: The identifiers of matching documents among the new entries, and the sequence number of the last
+        added entry, to be passed to the next search
+        :rtype: Tuple[List[int], int]
+        :raises ValueError: If the search token was created with a different PRF backend, or the sequence number is
+        beyond that of the last added entry
+        """
+        with self.lock:
+            (snapshot, sequence) = (self._snapshot(), self.sequence)
+        if not 0 <= since <= sequence:
+            raise ValueError('Unknown insertion sequence number: {0}'.format(since))
+        return list(self._search_snapshot(srch_token, snapshot, since)), sequence
+
+    def _search_snapshot(
+            self,
+            srch_token: ZNSrchToken,
+            snapshot: Optional[List[Tuple[List[ZNEntry], array, int, FrozenSet[bytes]]]],
+            since: int,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[int]:
+        """Searches a snapshot of the segments for the entries added after an insertion sequence number, see
+        search_iter.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param snapshot: The snapshot to search, or None to take one when the search starts
+        :type snapshot: Optional[List[Tuple[List[ZNEntry], array, int, FrozenSet[bytes]]]]
+        :param since: The insertion sequence number after which entries are scanned, 0 to scan all entries
+        :type since: int
+        :param limit: The maximum number of document IDs to yield, or None to yield all matches
+        :type limit: Optional[int]
+        :param newest_first: Whether to scan the segments backwards, yielding matches in reverse insertion order
+        :type newest_first: bool
+        :returns: An iterator over the identifiers of matching documents
+        :rtype: Iterator[int]
+        :raises ValueError: If the search token was created with a different PRF backend
+        """
+        self._check_prf(srch_token[-1])
+        if limit is not None and limit <= 0:
+            return
+        pairs = self._order_positions(srch_token)
+        seen = set()
+        if snapshot is None:
+            snapshot = self._snapshot()
+        for (entries, sequences, size, tombstones) in reversed(snapshot) if newest_first else snapshot:
+            starts = range(bisect_right(sequences, since, 0, size) if since else 0, size, self.BLOCK_SIZE)
+            for start in reversed(starts) if newest_first else starts:
+                block = entries[start:min(start + self.BLOCK_SIZE, size)]
+                if tombstones:
+                    block = [entry for entry in block if entry[2] not in tombstones]
+                matches = self._scan(block, pairs)
+                for ind, _, _ in reversed(matches) if newest_first else matches:
+                    if ind not in seen:
+                        seen.add(ind)
+                        yield ind
+                        if len(seen) == limit:
+                            return
+
+    def add(
+            self,
+            add_token: ZNAddToken,
+    ) -> None:
+        """Adds a document-keyword pair, represented by an add token, to the head segment.
+        Adding a pair that is already in the index has no effect.
+
+        :param add_token: An add token representing a document-keyword pair
+        :type add_token: ZNAddToken
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the add token was created with a different PRF backend
+        """
+        self.add_many([add_token])
+
+    def add_many(
+            self,
+            add_tokens: Iterable[ZNAddToken],
+            validate: bool = False,
+    ) -> None:
+        """Adds a number of document-keyword pairs, represented by add tokens, to the head segment, sealing it whenever
+        it is full. Pairs that are already in the index, or earlier in the batch, are skipped.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: Iterable[ZNAddToken]
+        :param validate: Whether to check the shape of the add tokens before adding them
+        :type validate: bool
+        :returns: None
+        :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend, or is malformed when validating
+        """
+        add_tokens = iter(add_tokens)
+        while True:
+            batch = list(islice(add_tokens, self.BATCH_SIZE))
+            if not batch:
+                break
+            if validate:
+                self._validate(batch)
+
+            with self.lock:
+                slots = self.slots
+                fresh: Dict[bytes, ZNEntry] = {}
+                for (ind, bloom_filter, b_id, prf) in batch:
+                    self._check_prf(prf)
+                    if b_id not in slots and b_id not in fresh:
+                        fresh[b_id] = (ind, bloom_filter, b_id)
+
+                entries = list(fresh.values())
+                while entries:
+                    room = self.head_size - len(self.head.entries)
+                    (added, entries) = (entries[:room], entries[room:])
+                    self.head.entries.extend(added)
+                    self.head.sequences.extend(range(self.sequence + 1, self.sequence + 1 + len(added)))
+                    self.sequence += len(added)
+                    slots.update((b_id, self.head) for (_, _, b_id) in added)
+                    if len(self.head.entries) >= self.head_size:
+                        self._seal()
+            if self.mask_cache is not None and fresh:
+                self.mask_cache.precompute(list(fresh.keys()), self._mask_bits)
+
+    def delete(
+            self,
+            del_token: bytes,
+    ) -> None:
+        """Deletes a document-keyword pair, represented by a delete token, by adding it to the tombstones of the
+        segment holding it.
+
+        :param del_token: A delete token representing a document-keyword pair
+        :type del_token: bytes
+        :returns: None
+        :rtype: None
+        """
+        self.delete_many([del_token])
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[bytes],
+    ) -> None:
+        """Deletes a number of document-keyword pairs, represented by delete tokens, by adding them to the tombstones of
+        the segments holding them.
+
+        :param del_tokens: Delete tokens representing document-keyword pairs
+        :type del_tokens: Iterable[bytes]
+        :returns: None
+        :rtype: None
+        """
+        with self.lock:
+            deleted: Dict[ZNSegment, List[bytes]] = {}
+            for del_token in del_tokens:
+                segment = self.slots.pop(del_token, None)
+                if segment is not None:
+                    deleted.setdefault(segment.resolve(), []).append(del_token)
+                    self.tombstones += 1
+            for segment, b_ids in deleted.items():
+                segment.tombstones = segment.tombstones.union(b_ids)
+            if self._pick_merge() is not None:
+                self.merge_requested.notify()
+
+    def replace(
+            self,
+            del_tokens: Iterable[bytes],
+            add_tokens: Iterable[ZNAddToken],
+    ) -> None:
+        """Deletes a number of document-keyword pairs and adds a number of others in their place, in a single step, so
+        concurrent searches see either the old or the new pairs.
+
+        :param del_tokens: Delete tokens representing the document-keyword pairs to delete
+        :type del_tokens: Iterable[bytes]
+        :param add_tokens: Add tokens representing the document-keyword pairs to add
+        :type add_tokens: Iterable[ZNAddToken]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend
+        """
+        with self.lock:
+            self.add_many(add_tokens)
+            self.delete_many(del_tokens)
+
+    def merge(
+            self,
+    ) -> None:
+        """Performs merges until no segments qualify for merging. Used when there is no background merge thread.
+
+        :returns: None
+        :rtype: None
+        """
+        while self._merge_next():
+            pass
+
+    def _snapshot(
+            self,
+    ) -> List[Tuple[List[ZNEntry], array, int, FrozenSet[bytes]]]:
+        """Captures the segments for a search: per segment its entries, their insertion sequence numbers, the number of
+        entries to scan and its tombstones. Sealed segments are never modified, the head segment is only appended to and
+        deletes replace the tombstones instead of changing them, so a snapshot stays valid while the index changes. As
+        it is taken while holding the lock, a snapshot sees a replace either completely or not at all.
+
+        :returns: The (entries, sequences, size, tombstones) tuples of the segments, in index order
+        :rtype: List[Tuple[List[ZNEntry], array, int, FrozenSet[bytes]]]
+        """
+        with self.lock:
+            return [(segment.entries, segment.sequences, len(segment.entries), segment.tombstones)
+                    for segment in self.segments + [self.head]]
+
+    def _seal(
+            self,
+    ) -> None:
+        """Seals the head segment, starting a new one, and signals the merge thread. The lock should be held.
+
+        :returns: None
+        :rtype: None
+        """
+        self.segments = self.segments + [self.head]
+        self.head = ZNSegment([], array('Q'))
+        self.merge_requested.notify()
+
+    def _tier(
+            self,
+            segment: ZNSegment,
+    ) -> int:
+        """Determines the size tier of a sealed segment. Segments of tier t hold fewer than head_size * merge_factor^(t+1)
+        live entries.
+
+        :param segment: The segment
+        :type segment: ZNSegment
+        :returns: The tier
+        :rtype: int
+        """
+        size = len(segment)
+        if size < self.head_size * self.merge_factor:
+            return 0
+        return int(math.log(size / self.head_size, self.merge_factor))
+
+    def _pick_merge(
+            self,
+    ) -> Optional[Tuple[int, int]]:
+        """Picks the next sealed segments to merge: a segment of which more than half of the entries have been deleted,
+        or else the oldest run of merge_factor adjacent segments of the same tier. The lock should be held.
+
+        :returns: The start and end of the range of segments to merge, or None if there is nothing to merge
+        :rtype: Optional[Tuple[int, int]]
+        """
+        segments = self.segments
+        for i, segment in enumerate(segments):
+            if len(segment.tombstones) * 2 > len(segment.entries):
+                return i, i + 1
+        tiers = [self._tier(segment) for segment in segments]
+        for i in range(len(segments) - self.merge_factor + 1):
+            if len(set(tiers[i:i + self.merge_factor])) == 1:
+                return i, i + self.merge_factor
+        return None
+
+    def _merge_next(
+            self,
+    ) -> bool:
+        """Performs the next merge, if any segments qualify for merging. Merges run one at a time.
+
+        :returns: Whether a merge was performed
+        :rtype: bool
+        """
+        with self.merging:
+            with self.lock:
+                victims = self._pick_merge()
+            if victims is None:
+                return False
+            self._merge(*victims)
+            return True
+
+    def _merge(
+            self,
+            start: int,
+            end: int,
+    ) -> None:
+        """Rewrites a range of adjacent sealed segments into one segment without their deleted entries. The entries are
+        copied without holding the lock. Entries deleted in the meantime are added to the tombstones of the new segment.
+        As only one merge runs at a time and sealing only appends segments, the range remains valid. Cached mask bits of
+        deleted entries are dropped once the merge is done.
+
+        :param start: The start of the range of segments
+        :type start: int
+        :param end: The end of the range of segments (exclusive)
+        :type end: int
+        :returns: None
+        :rtype: None
+        """
+        with self.lock:
+            victims = self.segments[start:end]
+            dropped = [victim.tombstones for victim in victims]
+        kept = [(entry, sequence) for victim, tombstones in zip(victims, dropped)
+                for entry, sequence in zip(victim.entries, victim.sequences) if entry[2] not in tombstones]
+        entries = [entry for (entry, _) in kept]
+        merged = ZNSegment(entries, array('Q', (sequence for (_, sequence) in kept)))
+
+        with self.lock:
+            for victim, tombstones in zip(victims, dropped):
+                merged.tombstones = merged.tombstones.union(victim.tombstones - tombstones)
+                victim.merged_into = merged
+                victim.entries = None
+                victim.sequences = None
+                self.tombstones -= len(tombstones)
+            self.segments = self.segments[:start] + ([merged] if entries else []) + self.segments[end:]
+            self.merges += 1
+            if self.mask_cache is not None:
+                self.mask_cache.prune(self.slots.__contains__)
+
+    def _start_merger(
+            self,
+    ) -> None:
+        """Starts the merge thread, if merges run in the background.
+
+        :returns: None
+        :rtype: None
+        """
+        self.stopped = False
+        if self.background_merge:
+            self.merger = threading.Thread(target=self._merge_periodically, daemon=True)
+            self.merger.start()
+
+    def _merge_periodically(
+            self,
+    ) -> None:
+        """Background loop performing merges whenever segments qualify for merging, until the server is closed.
+
+        :returns: None
+        :rtype: None
+        """
+        while True:
+            with self.lock:
+                while self._pick_merge() is None and not self.stopped:
+                    self.merge_requested.wait()
+                if self.stopped:
+                    return
+            self._merge_next()
+
+    def _any_entry(
+            self,
+    ) -> Optional[ZNEntry]:
+        """Finds an entry of the index, used to check that new entries have the same shape.
+
+        :returns: An entry of the index, or None if the index is empty
+        :rtype: Optional[ZNEntry]
+        """
+        with self.lock:
+            for segment in self.segments + [self.head]:
+                if segment.entries:
+                    return segment.entries[0]
+        return None
@@ -1,15 +1,22 @@
 # Python imports
-from typing import List, Tuple
+import random
+from array import array
+from bisect import bisect_right
+from itertools import compress, islice
+from operator import xor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Third-party imports
 from bitarray import bitarray
 
 # Project imports
-from src.crypto import hash_bytes
+from src.crypto import get_prf_backend
 from src.sigma_interface.sigma_server import SigmaServer
+from src.utils import ZNAddToken, ZNEntry, ZNSrchToken
+from src.zhao_nishide.zn_mask_cache import MaskBitCache
 
 
-class ZNServer(SigmaServer[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[bytes]]]):
+class ZNServer(SigmaServer[ZNAddToken, ZNSrchToken]):
     """Zhao and Nishide server implementation.
 
     Based on: Fangming Zhao and Takashi Nishide. Searchable symmetric encryption supporting queries with
@@ -21,66 +28,257 @@ class ZNServer(SigmaServer[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
     presence of 0 or more characters.
     """
 
+    """Bounds on the number of tested entries a position's rejection rate is based on, for adaptive ordering."""
+    MIN_POSITION_SAMPLES = 16
+    MAX_POSITION_SAMPLES = 1 << 20
+
+    """Number of entries scanned column by column before the matches among them are yielded."""
+    BLOCK_SIZE = 4096
+
+    """Number of add tokens taken from a stream at a time when adding in bulk."""
+    BATCH_SIZE = 65536
+
     def __init__(
             self,
+            mask_cache_bytes: int = 0,
+            hot_positions: int = 0,
+            adaptive_ordering: bool = False,
+            exploration_rate: float = .05,
+            prf: str = 'hmac-sha256',
     ) -> None:
         """Initializes a Zhao and Nishide server.
 
+        :param mask_cache_bytes: The memory budget for caching mask bits between searches (bytes). No mask bits are
+        cached when 0
+        :type mask_cache_bytes: int
+        :param hot_positions: The number of most recently searched positions for which the mask bits of new entries are
+        computed when they are added. Only used when mask bits are cached
+        :type hot_positions: int
+        :param adaptive_ordering: Whether to test the positions of a search token in order of their observed rejection
+        rate, so most entries are rejected after as few mask bit computations as possible
+        :type adaptive_ordering: bool
+        :param exploration_rate: The probability that a search tests a random position first, keeping the statistics of
+        rarely tested positions up to date. Only used with adaptive ordering
+        :type exploration_rate: float
+        :param prf: The PRF backend of the scheme, one of crypto.PRF_BACKENDS. Tokens created with a different backend are
+        rejected
+        :type prf: str
         :returns: None
         :rtype: None
         """
         super().__init__()
+        self.prf_backend = get_prf_backend(prf)
         self.index = None
+        self.slots = None
+        self.tombstones = None
+        self.sequences = None
+        self.sequence = None
+        self.mask_cache = MaskBitCache(mask_cache_bytes, hot_positions) if mask_cache_bytes > 0 else None
+
+        self.adaptive_ordering = adaptive_ordering
+        self.exploration_rate = exploration_rate
+        # Per position: [number of entries tested, number of entries rejected]
+        self.position_statistics: Dict[int, List[int]] = {}
+        self.random = random.Random()
 
     def build_index(
             self,
     ) -> None:
         """Sets up the Z&N server, creating an empty index.
+        Deleted entries are replaced by None (a tombstone) so that the slots of other entries remain valid. Every added
+        entry is numbered with an increasing insertion sequence number, kept in a column next to the index.
 
         :returns: None
         :rtype: None
         """
-        self.index: List[(bytes, bitarray)] = []
+        self.index: List[Optional[ZNEntry]] = []
+        self.slots: Dict[bytes, int] = {}
+        self.tombstones = 0
+        self.sequences = array('Q')
+        self.sequence = 0
+        if self.mask_cache is not None:
+            self.mask_cache.clear()
 
     def search(
             self,
-            srch_token: Tuple[List[int], List[bytes]],
+            srch_token: ZNSrchToken,
     ) -> List[int]:
         """Searches the index for a query represented by a search token and returns matching document IDs.
         The first part of a search token consists of Bloom filter positions, one per element in s_t(q). The second part
-        of a search token consists of hashes of these positions.
+        of a search token consists of hashes of these positions. The third part is the PRF backend used to create it.
 
         :param srch_token: The search token
-        :type srch_token: Tuple[List[int], List[bytes]]
+        :type srch_token: ZNSrchToken
         :returns: A list containing the identifiers of matching documents and possibly some other documents, as the
         use of Bloom filters introduce false positives.
         :rtype: List[int]
+        :raises ValueError: If the search token was created with a different PRF backend
         """
-        (td1s, td2s) = srch_token
-        results = []
-        for ind, bit_array, b_id in self.index:
-            for pos, h_pos in zip(td1s, td2s):
-                mask_bit = hash_bytes(b_id, h_pos)[0] & 1
-                if bit_array[pos] ^ mask_bit == 0:
-                    break
-            else:
-                if ind not in results:
-                    results.append(ind)
-        return results
+        return list(self.search_iter(srch_token))
+
+    def search_iter(
+            self,
+            srch_token: ZNSrchToken,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[int]:
+        """Searches the index for a query represented by a search token, yielding matching document IDs as they are
+        found. Each document ID is yielded once. The scan stops as soon as the limit is reached, or when the caller stops
+        consuming the iterator.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param limit: The maximum number of document IDs to yield, or None to yield all matches
+        :type limit: Optional[int]
+        :param newest_first: Whether to scan the index backwards, yielding matches in reverse insertion order
+        :type newest_first: bool
+        :returns: An iterator over the identifiers of matching documents and possibly some other documents, as the use
+        of Bloom filters introduce false positives.
+        :rtype: Iterator[int]
+        :raises ValueError: If the search token was created with a different PRF backend
+        """
+        return self._search_from(srch_token, 0, limit, newest_first)
+
+    def search_since(
+            self,
+            srch_token: ZNSrchToken,
+            since: int = 0,
+    ) -> Tuple[List[int], int]:
+        """Searches the entries added after an insertion sequence number for a query represented by a search token. The
+        index holds its entries in insertion order, so only the entries added since are scanned.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param since: The insertion sequence number returned by an earlier search, or 0 to search all entries
+        :type since: int
+        :returns: The identifiers of matching documents among the new entries, and the sequence number of the last
+        added entry, to be passed to the next search
+        :rtype: Tuple[List[int], int]
+        :raises ValueError: If the search token was created with a different PRF backend, or the sequence number is
+        beyond that of the last added entry
+        """
+        if not 0 <= since <= self.sequence:
+            raise ValueError('Unknown insertion sequence number: {0}'.format(since))
+        return list(self._search_from(srch_token, self._first_after(since))), self.sequence
+
+    def _first_after(
+            self,
+            since: int,
+    ) -> int:
+        """Determines the slot of the first entry added after an insertion sequence number.
+
+        :param since: The insertion sequence number
+        :type since: int
+        :returns: The slot of the first newer entry, or the size of the index if there is none
+        :rtype: int
+        """
+        return bisect_right(self.sequences, since)
+
+    def _search_from(
+            self,
+            srch_token: ZNSrchToken,
+            first_slot: int,
+            limit: Optional[int] = None,
+            newest_first: bool = False,
+    ) -> Iterator[int]:
+        """Searches the index from a slot onwards, see search_iter.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :param first_slot: The slot of the first entry to scan
+        :type first_slot: int
+        :param limit: The maximum number of document IDs to yield, or None to yield all matches
+        :type limit: Optional[int]
+        :param newest_first: Whether to scan the blocks, and the matches within each block, in reverse order
+        :type newest_first: bool
+        :returns: An iterator over the identifiers of matching documents
+        :rtype: Iterator[int]
+        :raises ValueError: If the search token was created with a different PRF backend
+        """
+        self._check_prf(srch_token[-1])
+        if limit is not None and limit <= 0:
+            return
+        pairs = self._order_positions(srch_token)
+        index = self.index
+        seen = set()
+        starts = range(first_slot, len(index), self.BLOCK_SIZE)
+        for start in reversed(starts) if newest_first else starts:
+            block = index[start:start + self.BLOCK_SIZE]
+            if self.tombstones:
+                block = list(filter(None, block))
+            matches = self._scan(block, pairs)
+            for ind, _, _ in reversed(matches) if newest_first else matches:
+                if ind not in seen:
+                    seen.add(ind)
+                    yield ind
+                    if len(seen) == limit:
+                        return
 
     def add(
             self,
-            add_token: Tuple[int, bitarray, bytes],
+            add_token: ZNAddToken,
     ) -> None:
         """Adds a document-keyword pair, represented by an add token, to the index.
-        An add token consists of a document identifier, a Bloom filter and its ID.
+        An add token consists of a document identifier, a Bloom filter, its ID and the PRF backend used to create it.
+        Adding a pair that is already in the index has no effect.
 
         :param add_token: An add token representing a document-keyword pair
-        :type add_token: Tuple[int, bitarray, bytes]
+        :type add_token: ZNAddToken
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the add token was created with a different PRF backend
+        """
+        (ind, bloom_filter, b_id, prf) = add_token
+        self._check_prf(prf)
+        if b_id in self.slots:
+            return
+        self.slots[b_id] = len(self.index)
+        self.index.append((ind, bloom_filter, b_id))
+        self.sequence += 1
+        self.sequences.append(self.sequence)
+        if self.mask_cache is not None:
+            self.mask_cache.precompute([b_id], self._mask_bits)
+
+    def add_many(
+            self,
+            add_tokens: Iterable[ZNAddToken],
+            validate: bool = False,
+    ) -> None:
+        """Adds a number of document-keyword pairs, represented by add tokens, to the index.
+        Tokens are taken from the iterable in batches. Each batch grows the index and the slot map once, and pairs that
+        are already in the index, or earlier in the batch, are skipped. When validating, a batch is checked as a whole
+        before any of its tokens is added.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: Iterable[ZNAddToken]
+        :param validate: Whether to check the shape of the add tokens before adding them
+        :type validate: bool
         :returns: None
         :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend, or is malformed when validating
         """
-        self.index.append(add_token)
+        add_tokens = iter(add_tokens)
+        while True:
+            batch = list(islice(add_tokens, self.BATCH_SIZE))
+            if not batch:
+                break
+            if validate:
+                self._validate(batch)
+
+            slots = self.slots
+            fresh: Dict[bytes, ZNEntry] = {}
+            for (ind, bloom_filter, b_id, prf) in batch:
+                self._check_prf(prf)
+                if b_id not in slots and b_id not in fresh:
+                    fresh[b_id] = (ind, bloom_filter, b_id)
+
+            start = len(self.index)
+            self.index.extend(fresh.values())
+            slots.update(zip(fresh.keys(), range(start, len(self.index))))
+            self.sequences.extend(range(self.sequence + 1, self.sequence + 1 + len(fresh)))
+            self.sequence += len(fresh)
+            if self.mask_cache is not None and fresh:
+                self.mask_cache.precompute(list(fresh.keys()), self._mask_bits)
 
     def delete(
             self,
@@ -94,4 +292,237 @@ class ZNServer(SigmaServer[Tuple[bytes, bitarray, bytes], Tuple[List[int], List[
         :returns: None
         :rtype: None
         """
-        self.index = [(ind, bf, b_id) for (ind, bf, b_id) in self.index if b_id != del_token]
+        self._remove(del_token)
+        self._compact_if_needed()
+
+    def delete_many(
+            self,
+            del_tokens: Iterable[bytes],
+    ) -> None:
+        """Deletes a number of document-keyword pairs, represented by delete tokens, from the index.
+
+        :param del_tokens: Delete tokens representing document-keyword pairs
+        :type del_tokens: Iterable[bytes]
+        :returns: None
+        :rtype: None
+        """
+        for del_token in del_tokens:
+            self._remove(del_token)
+        self._compact_if_needed()
+
+    def validate(
+            self,
+            add_tokens: List[ZNAddToken],
+    ) -> None:
+        """Checks that a number of add tokens can be added to the index, without adding them.
+
+        :param add_tokens: Add tokens representing document-keyword pairs
+        :type add_tokens: List[ZNAddToken]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If an add token was created with a different PRF backend or is malformed
+        """
+        self._validate(add_tokens)
+
+    def _validate(
+            self,
+            add_tokens: List[ZNAddToken],
+    ) -> None:
+        """Checks that add tokens consist of an integer or byte string document identifier, a Bloom filter of the same
+        size as the Bloom filters in the index, a Bloom filter ID and the PRF backend of the index.
+
+        :param add_tokens: The add tokens to check
+        :type add_tokens: List[ZNAddToken]
+        :returns: None
+        :rtype: None
+        :raises ValueError: If any of the add tokens is malformed
+        """
+        existing = self._any_entry()
+        bf_size = len(existing[1]) if existing is not None else None
+        for add_token in add_tokens:
+            if not isinstance(add_token, tuple) or len(add_token) != 4:
+                raise ValueError('Add tokens should be (ind, Bloom filter, Bloom filter ID, PRF backend) tuples')
+            (ind, bloom_filter, b_id, prf) = add_token
+            self._check_prf(prf)
+            if bf_size is None:
+                bf_size = len(bloom_filter)
+            if not isinstance(ind, (int, bytes)):
+                raise ValueError('Invalid document identifier: {0!r}'.format(ind))
+            if not isinstance(bloom_filter, bitarray) or len(bloom_filter) != bf_size:
+                raise ValueError('Bloom filters should be bitarrays of length {0}'.format(bf_size))
+            if not isinstance(b_id, bytes) or len(b_id) != self.prf_backend.output_size:
+                raise ValueError('Bloom filter IDs should be {0} bytes long'.format(self.prf_backend.output_size))
+
+    def _any_entry(
+            self,
+    ) -> Optional[ZNEntry]:
+        """Finds an entry of the index, used to check that new entries have the same shape.
+
+        :returns: An entry of the index, or None if the index is empty
+        :rtype: Optional[ZNEntry]
+        """
+        return next(filter(None, self.index), None)
+
+    def _check_prf(
+            self,
+            prf: str,
+    ) -> None:
+        """Checks that a token was created with the PRF backend of the index.
+
+        :param prf: The name of the PRF backend recorded in the token
+        :type prf: str
+        :returns: None
+        :rtype: None
+        :raises ValueError: If the token was created with a different PRF backend
+        """
+        if prf != self.prf_backend.name:
+            raise ValueError('Token created with PRF backend \'{0}\', but the index uses \'{1}\''
+                             .format(prf, self.prf_backend.name))
+
+    def _remove(
+            self,
+            b_id: bytes,
+    ) -> None:
+        """Replaces the entry with the given Bloom filter ID by a tombstone, if it is in the index.
+
+        :param b_id: The Bloom filter ID of the entry to remove
+        :type b_id: bytes
+        :returns: None
+        :rtype: None
+        """
+        slot = self.slots.pop(b_id, None)
+        if slot is not None:
+            self.index[slot] = None
+            self.tombstones += 1
+
+    def _compact_if_needed(
+            self,
+    ) -> None:
+        """Removes all tombstones from the index once they make up more than half of it. Entries keep their relative
+        order. As every compaction is preceded by at least as many deletes as there are entries left, deletes take
+        amortized constant time. Cached mask bits of the removed entries are dropped along with them.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.tombstones * 2 <= len(self.index):
+            return
+        self.sequences = array('Q', compress(self.sequences, self.index))
+        self.index = list(filter(None, self.index))
+        self.slots = {b_id: slot for slot, (_, _, b_id) in enumerate(self.index)}
+        self.tombstones = 0
+        if self.mask_cache is not None:
+            self.mask_cache.prune(self.slots.__contains__)
+
+    def _scan(
+            self,
+            entries: List[ZNEntry],
+            pairs: List[Tuple[int, bytes]],
+    ) -> List[ZNEntry]:
+        """Determines which entries match a search token. The token is evaluated one position at a time across all
+        entries, keeping only the entries that survive each position. Most entries are rejected after one or two
+        positions, so later columns are small.
+
+        :param entries: The index entries to test
+        :type entries: List[ZNEntry]
+        :param pairs: The (position, hashed position) pairs of the search token, in the order they are to be tested
+        :type pairs: List[Tuple[int, bytes]]
+        :returns: The matching entries, in index order
+        :rtype: List[ZNEntry]
+        """
+        survivors = entries
+        for pos, h_pos in pairs:
+            if not survivors:
+                break
+            bits = [bit_array[pos] for (_, bit_array, _) in survivors]
+            b_ids = [b_id for (_, _, b_id) in survivors]
+            if self.mask_cache is None:
+                mask_bits = self._mask_bits(b_ids, h_pos)
+            else:
+                mask_bits = self.mask_cache.mask_bits(h_pos, b_ids, self._mask_bits)
+            tested = len(survivors)
+            survivors = list(compress(survivors, map(xor, bits, mask_bits)))
+            if self.adaptive_ordering:
+                self._record_rejections(pos, tested, tested - len(survivors))
+        return survivors
+
+    def _order_positions(
+            self,
+            srch_token: ZNSrchToken,
+    ) -> List[Tuple[int, bytes]]:
+        """Determines in which order the positions of a search token are tested. Duplicate positions are tested once.
+        With adaptive ordering, positions that rejected the largest share of entries in earlier searches are tested
+        first. Positions that have not been tested often enough are considered maximally selective, and with a small
+        probability a random position is moved to the front.
+
+        :param srch_token: The search token
+        :type srch_token: ZNSrchToken
+        :returns: The (position, hashed position) pairs of the search token in the order they are to be tested
+        :rtype: List[Tuple[int, bytes]]
+        """
+        (td1s, td2s, _) = srch_token
+        pairs = list(dict.fromkeys(zip(td1s, td2s)))
+        if not self.adaptive_ordering:
+            return pairs
+
+        pairs.sort(key=lambda pair: self._rejection_rate(pair[0]), reverse=True)
+        if len(pairs) > 1 and self.random.random() < self.exploration_rate:
+            pairs.insert(0, pairs.pop(self.random.randrange(1, len(pairs))))
+        return pairs
+
+    def _rejection_rate(
+            self,
+            pos: int,
+    ) -> float:
+        """Estimates the share of entries rejected when testing a position.
+
+        :param pos: The Bloom filter position
+        :type pos: int
+        :returns: The observed rejection rate, or 1 if the position has not been tested often enough
+        :rtype: float
+        """
+        statistics = self.position_statistics.get(pos)
+        if statistics is None or statistics[0] < self.MIN_POSITION_SAMPLES:
+            return 1.
+        return statistics[1] / statistics[0]
+
+    def _record_rejections(
+            self,
+            pos: int,
+            tested: int,
+            rejected: int,
+    ) -> None:
+        """Updates the statistics of a position after testing it. Counts are halved once they grow large, so recent
+        searches weigh more than old ones.
+
+        :param pos: The Bloom filter position
+        :type pos: int
+        :param tested: The number of entries tested
+        :type tested: int
+        :param rejected: The number of entries rejected
+        :type rejected: int
+        :returns: None
+        :rtype: None
+        """
+        statistics = self.position_statistics.setdefault(pos, [0, 0])
+        statistics[0] += tested
+        statistics[1] += rejected
+        if statistics[0] > self.MAX_POSITION_SAMPLES:
+            statistics[0] //= 2
+            statistics[1] //= 2
+
+    def _mask_bits(
+            self,
+            b_ids: List[bytes],
+            h_pos: bytes,
+    ) -> List[int]:
+        """Computes the mask bits of a number of entries at a hashed Bloom filter position.
+
+        :param b_ids: The Bloom filter IDs of the entries
+        :type b_ids: List[bytes]
+        :param h_pos: The hashed Bloom filter position
+        :type h_pos: bytes
+        :returns: The mask bits, in the order of the Bloom filter IDs
+        :rtype: List[int]
+        """
+        return [h[0] & 1 for h in self.prf_backend.eval_keys(b_ids, h_pos)]
@@ -0,0 +1,129 @@
+# Python imports
+import asyncio
+import unittest
+
+# Project imports
+from src.libertas.libertas_client import LibertasClient
+from src.libertas.libertas_server import LibertasServer
+from src.network.async_client import AsyncClient, AsyncConnection
+from src.network.protocol import encode_batch, FrameType, Status
+from src.network.server import NetworkServer
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestLibertasAsyncClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        backend = LibertasServer(ZNServer())
+        backend.build_index()
+        self.server = NetworkServer(backend, report_interval=0)
+        await self.server.start()
+        (self.host, self.port) = self.server.address
+
+        libertas_client = LibertasClient(ZNClient(.01, 6))
+        libertas_client.setup((256, 2048))
+        self.client = AsyncClient(libertas_client, self.host, self.port, connections=2, batch_size=8)
+        await self.client.connect()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def test_add_search_delete(self):
+        await self.client.add(1, 'abc')
+        await asyncio.gather(*[self.client.add(ind, 'abd') for ind in range(2, 5)])
+        self.assertEqual([1, 2, 3, 4], sorted(await self.client.search('ab*')))
+
+        await self.client.delete(2, 'abd')
+        self.assertEqual([1, 3, 4], sorted(await self.client.search('ab*')))
+
+    async def test_batching(self):
+        await asyncio.gather(*[self.client.add(ind, 'abc') for ind in range(20)])
+        stats = await self.client.stats()
+
+        # 20 updates in batches of at most 8, followed by the stats request
+        self.assertEqual(21, stats['requests'])
+        self.assertEqual(4, stats['frames'])
+        self.assertEqual(list(range(20)), sorted(await self.client.search('abc')))
+
+    async def test_batch_delay(self):
+        self.client.batch_delay = 60000
+        adds = [asyncio.ensure_future(self.client.add(ind, 'abc')) for ind in range(3)]
+        await asyncio.sleep(0)
+        self.assertEqual(3, len(self.client.batch))
+
+        self.client.flush()
+        await asyncio.gather(*adds)
+        self.assertEqual([0, 1, 2], sorted(await self.client.search('abc')))
+
+    async def test_short_batch_response(self):
+        async def truncated_request(frame_type, payload):
+            return encode_batch([(Status.OK.value, b'')])
+
+        for connection in self.client.connections:
+            connection.request = truncated_request
+        adds = [self.client.add(ind, 'abc') for ind in range(3)]
+        results = await asyncio.wait_for(asyncio.gather(*adds, return_exceptions=True), 5)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_pipelining(self):
+        searches = await asyncio.gather(*[self.client.search('a*') for _ in range(10)])
+        self.assertEqual([[]] * 10, searches)
+        self.assertEqual(2, len(self.client.connections))
+        self.assertTrue(all(not connection.pending for connection in self.client.connections))
+
+    async def test_timestamps(self):
+        await asyncio.gather(*[self.client.add(ind, 'abc') for ind in range(50)])
+        self.assertEqual(50, self.client.client.t)
+
+
+class TestZNAsyncClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = NetworkServer(ZNServer(), report_interval=0)
+        self.server.backend.build_index()
+        await self.server.start()
+        (self.host, self.port) = self.server.address
+
+        zn_client = ZNClient(.01, 6)
+        zn_client.setup(256)
+        self.client = AsyncClient(zn_client, self.host, self.port, batch_size=1)
+        await self.client.connect()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def test_add_search_delete(self):
+        await asyncio.gather(*[self.client.add(ind, 'abc') for ind in range(3)])
+        await self.client.delete(1, 'abc')
+        self.assertEqual([0, 2], sorted(await self.client.search('abc')))
+
+    async def test_errors(self):
+        connection = await AsyncConnection.open(self.host, self.port)
+        with self.assertRaises(ValueError):
+            await connection.request(FrameType.ADD, b'\x09')
+        await connection.close()
+        with self.assertRaises(ConnectionError):
+            await connection.request(FrameType.STATS, b'')
+
+    async def test_writes_are_serialized(self):
+        connection = await AsyncConnection.open(self.host, self.port)
+        drain = connection.writer.drain
+        draining = []
+
+        async def tracked_drain():
+            # Concurrent drains of a paused transport raise AssertionError before Python 3.10
+            draining.append(None)
+            self.assertEqual(1, len(draining))
+            await asyncio.sleep(0)
+            await drain()
+            draining.pop()
+
+        connection.writer.drain = tracked_drain
+        await asyncio.gather(*[connection.request(FrameType.STATS, b'') for _ in range(8)])
+        await connection.close()
+
+    async def test_not_connected(self):
+        client = AsyncClient(self.client.client, self.host, self.port)
+        with self.assertRaises(ConnectionError):
+            await client.search('abc')
@@ -1,9 +1,11 @@
 # Python imports
+import hashlib
+import hmac
 import os
 import unittest
 
 # Project imports
-from src.crypto import encrypt, decrypt
+from src.crypto import decrypt, decrypt_bytes, encrypt, encrypt_bytes, get_prf_backend, PRF, PRF_BACKENDS
 
 
 class TestEncrypt(unittest.TestCase):
@@ -21,6 +23,55 @@ class TestEncrypt(unittest.TestCase):
                 result = decrypt(key, cipher_text)
                 self.assertEqual(plain_text, result)
 
+    def test_byte_encryptions(self):
+        key = os.urandom(256 // 8)
+        for plain_text in [b'', b'\x01', os.urandom(15), os.urandom(16), os.urandom(17), os.urandom(100)]:
+            cipher_text = encrypt_bytes(key, plain_text)
+            self.assertEqual(0, len(cipher_text) % 16)
+            self.assertEqual(plain_text, decrypt_bytes(key, cipher_text))
+        self.assertNotEqual(encrypt_bytes(key, b'abc'), encrypt_bytes(key, b'abc'))
+
+    def test_invalid_byte_encryptions(self):
+        key = os.urandom(256 // 8)
+        cipher_text = encrypt_bytes(key, b'abc')
+        self.assertRaises(ValueError, decrypt_bytes, key, cipher_text[:-1])
+        self.assertRaises(ValueError, decrypt_bytes, key, cipher_text[:16])
+
+
+class TestPRF(unittest.TestCase):
+    def setUp(self):
+        self.keys = [os.urandom(16), os.urandom(32), os.urandom(64), os.urandom(65), os.urandom(256)]
+        self.messages = [b'', b'1', b'1:2:a,b', os.urandom(32), os.urandom(100)]
+
+    def test_eval_matches_hmac(self):
+        for k in self.keys:
+            prf = PRF(k)
+            expected = [hmac.new(k, e, hashlib.sha256).digest() for e in self.messages]
+            self.assertEqual(expected, [prf.eval(e) for e in self.messages])
+            self.assertEqual(expected, prf.eval_many(self.messages))
+
+    def test_eval_keys_matches_hmac(self):
+        for e in self.messages:
+            expected = [hmac.new(k, e, hashlib.sha256).digest() for k in self.keys]
+            self.assertEqual(expected, PRF.eval_keys(self.keys, e))
+
+    def test_backends_are_consistent(self):
+        for backend in PRF_BACKENDS.values():
+            for k in self.keys:
+                prf = backend(k)
+                expected = [prf.eval(e) for e in self.messages]
+                self.assertEqual(expected, prf.eval_many(self.messages))
+                self.assertEqual(expected, [backend(k).eval(e) for e in self.messages])
+                for e, h in zip(self.messages, expected):
+                    self.assertEqual(backend.output_size, len(h))
+                    self.assertEqual([h], backend.eval_keys([k], e))
+            self.assertNotEqual(backend(self.keys[0]).eval(b'1'), backend(self.keys[1]).eval(b'1'))
+            self.assertIs(backend, get_prf_backend(backend.name))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_prf_backend('md5')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,9 +3,11 @@ import unittest
 
 # Project imports
 from src.libertas.libertas_client import LibertasClient
+from src.libertas.libertas_replay import UpdateReplay
 from src.libertas.libertas_server import LibertasServer
 from src.utils import Op
 from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_segmented_server import ZNSegmentedServer
 from src.zhao_nishide.zn_server import ZNServer
 
 
@@ -35,8 +37,33 @@ class TestEncryptUpdates(unittest.TestCase):
 
         cipher_text = self.client._encrypt_update(t, op, ind, w)
         result = self.client._decrypt_update(cipher_text)
+        self.assertIsInstance(cipher_text, bytes)
         self.assertEqual(update, result)
 
+    def test_truncated_update(self):
+        cipher_text = self.client._encrypt_update(1, Op.ADD, 2, 'abc')
+        self.assertRaises(ValueError, self.client._decrypt_update, cipher_text[:-1])
+
+    def test_keyword_dictionary(self):
+        client = LibertasClient(ZNClient(.01, 3), keyword_dictionary=True)
+        client.setup((256, 2048))
+        w = 'a' * 40
+        cipher_text = client._encrypt_update(1, Op.DEL, 2, w)
+        self.assertLess(len(cipher_text), len(self.client._encrypt_update(1, Op.DEL, 2, w)))
+        self.assertEqual((1, Op.DEL, 2, w), client._decrypt_update(cipher_text))
+
+        client.add_token(3, 'abc')
+        client.add_token(4, w)
+        self.assertEqual([w, 'abc'], client.keywords)
+
+    def test_search_with_keyword_dictionary(self):
+        client = LibertasClient(ZNClient(.01, 3), keyword_dictionary=True)
+        client.setup((256, 2048))
+        for (ind, w) in [(1, 'abc'), (2, 'abd'), (3, 'xyz')]:
+            self.server.add(client.add_token(ind, w))
+        self.server.add(client.del_token(2, 'abd'))
+        self.assertEqual([1], client.dec_search(self.server.search(client.srch_token('ab_'))))
+
 
 class TestUniquenessOfTokens(unittest.TestCase):
     def setUp(self):
@@ -86,6 +113,24 @@ class TestAdd(unittest.TestCase):
             self.assertEqual([1], result)
 
 
+class TestAddMany(unittest.TestCase):
+    def setUp(self):
+        zn_client = ZNClient(.01, 6)
+        zn_server = ZNServer()
+        self.client = LibertasClient(zn_client)
+        self.server = LibertasServer(zn_server)
+        self.client.setup((256, 2048))
+        self.server.build_index()
+
+    def test_add_and_delete_many(self):
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(10))
+        self.server.delete_many(self.client.del_token(ind, 'abc') for ind in range(5))
+        srch_token = self.client.srch_token('abc')
+        encrypted_result = self.server.search(srch_token)
+        result = self.client.dec_search(encrypted_result)
+        self.assertEqual(list(range(5, 10)), sorted(result))
+
+
 class TestDelete(unittest.TestCase):
     def setUp(self):
         zn_client = ZNClient(.01, 6)
@@ -291,5 +336,272 @@ class TestSearch(unittest.TestCase):
             self.assertTrue(set(r).issubset(set(result)))
 
 
+class TestSearchIter(unittest.TestCase):
+    def setUp(self):
+        zn_client = ZNClient(.01, 6)
+        zn_server = ZNServer()
+        self.client = LibertasClient(zn_client)
+        self.server = LibertasServer(zn_server)
+        self.client.setup((256, 2048))
+        self.server.build_index()
+
+        for ind in range(20):
+            add_token = self.client.add_token(ind, 'abc')
+            self.server.add(add_token)
+
+    def test_streamed_results(self):
+        srch_token = self.client.srch_token('abc')
+        encrypted_result = list(self.server.search_iter(srch_token))
+        result = self.client.dec_search(encrypted_result)
+        self.assertEqual(list(range(20)), sorted(result))
+
+    def test_limit(self):
+        srch_token = self.client.srch_token('abc')
+        encrypted_result = list(self.server.search_iter(srch_token, limit=5))
+        self.assertEqual(5, len(encrypted_result))
+
+    def test_limit_counts_updates(self):
+        for ind in range(3):
+            self.server.delete(self.client.del_token(ind, 'abc'))
+        srch_token = self.client.srch_token('abc')
+        encrypted_result = list(self.server.search_iter(srch_token, limit=3, newest_first=True))
+        self.assertEqual(3, len(encrypted_result))
+        self.assertEqual([], self.client.dec_search(encrypted_result))
+
+
+class TestCompiledQuery(unittest.TestCase):
+    def setUp(self):
+        zn_client = ZNClient(.01, 6)
+        zn_server = ZNServer()
+        self.client = LibertasClient(zn_client)
+        self.server = LibertasServer(zn_server)
+        self.client.setup((256, 2048))
+        self.server.build_index()
+
+    def test_compiled_query(self):
+        query = self.client.compile_query('ab*')
+        self.server.add(self.client.add_token(1, 'abc'))
+        self.assertEqual([1], self.client.dec_search(self.server.search(self.client.srch_token(query))))
+        self.server.add(self.client.add_token(2, 'abd'))
+        self.server.add(self.client.del_token(1, 'abc'))
+        self.assertEqual([2], self.client.dec_search(self.server.search(self.client.srch_token(query))))
+
+
+class TestUpdateReplay(unittest.TestCase):
+    def test_last_writer_wins(self):
+        updates = [(1, Op.ADD, 1, 'abc'), (2, Op.DEL, 1, 'abc'), (3, Op.ADD, 1, 'abc'), (4, Op.ADD, 2, 'abc'),
+                   (5, Op.DEL, 2, 'abc'), (6, Op.DEL, 3, 'abc')]
+        replay = UpdateReplay()
+        replay.apply_many(updates)
+        self.assertEqual([1], replay.results())
+
+    def test_any_order(self):
+        updates = [(1, Op.ADD, 1, 'abc'), (2, Op.DEL, 1, 'abc'), (3, Op.ADD, 2, 'abc'), (4, Op.DEL, 2, 'abc'),
+                   (5, Op.ADD, 2, 'abc')]
+        for ordering in [updates, updates[::-1], updates[1::2] + updates[::2]]:
+            replay = UpdateReplay()
+            replay.apply_many(ordering)
+            self.assertEqual([2], replay.results())
+
+    def test_per_keyword(self):
+        updates = [(1, Op.ADD, 1, 'abc'), (2, Op.ADD, 1, 'abd'), (3, Op.ADD, 2, 'abd'), (4, Op.DEL, 1, 'abc')]
+        replay = UpdateReplay()
+        replay.apply_many(updates)
+        self.assertEqual([1, 2], sorted(replay.results()))
+        self.assertEqual({'abd': [1, 2]}, {w: sorted(inds) for (w, inds) in replay.results_per_keyword().items()})
+
+
+class TestDecSearch(unittest.TestCase):
+    def setUp(self):
+        zn_client = ZNClient(.01, 6)
+        zn_server = ZNServer()
+        self.client = LibertasClient(zn_client)
+        self.server = LibertasServer(zn_server)
+        self.client.setup((256, 2048))
+        self.server.build_index()
+
+    def test_group_by_keyword(self):
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(3))
+        self.server.add_many(self.client.add_token(ind, 'abd') for ind in range(2, 5))
+        self.server.delete(self.client.del_token(0, 'abc'))
+        encrypted_result = self.server.search(self.client.srch_token('ab*'))
+
+        result = self.client.dec_search(encrypted_result, group_by_keyword=True)
+        self.assertEqual({'abc': [1, 2], 'abd': [2, 3, 4]}, {w: sorted(inds) for (w, inds) in result.items()})
+        self.assertEqual([1, 2, 3, 4], sorted(self.client.dec_search(encrypted_result)))
+
+    def test_server_order(self):
+        for _ in range(3):
+            self.server.add(self.client.add_token(1, 'abc'))
+            self.server.delete(self.client.del_token(1, 'abc'))
+        self.server.add(self.client.add_token(1, 'abc'))
+        encrypted_result = self.server.search(self.client.srch_token('abc'))
+        self.assertEqual([1], self.client.dec_search(encrypted_result))
+        self.assertEqual([1], self.client.dec_search(encrypted_result[::-1]))
+
+
+class TestCleanup(unittest.TestCase):
+    def setUp(self):
+        self.client = LibertasClient(ZNClient(.01, 6))
+        self.client.setup((256, 2048))
+        self.server = LibertasServer(ZNServer())
+        self.server.build_index()
+
+    def test_cleanup(self):
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(4))
+        self.server.add(self.client.add_token(5, 'abd'))
+        self.server.delete_many(self.client.del_token(ind, 'abc') for ind in range(2))
+        self.server.add(self.client.add_token(0, 'abc'))
+        self.server.add(self.client.add_token(1, 'xyz'))
+        obsolete_result = self.server.search(self.client.srch_token('abc'))
+        self.assertEqual(7, len(obsolete_result))
+
+        (result, cleanup_token) = self.client.consolidate('abc', obsolete_result)
+        self.assertEqual([0, 2, 3], sorted(result))
+        self.server.cleanup(cleanup_token)
+
+        encrypted_result = self.server.search(self.client.srch_token('abc'))
+        self.assertEqual(3, len(encrypted_result))
+        self.assertTrue(set(encrypted_result).isdisjoint(obsolete_result))
+        self.assertEqual([0, 2, 3], sorted(self.client.dec_search(encrypted_result)))
+        self.assertEqual([5], self.client.dec_search(self.server.search(self.client.srch_token('abd'))))
+        self.assertEqual([1], self.client.dec_search(self.server.search(self.client.srch_token('xyz'))))
+
+        # Consolidated results hold no obsolete updates
+        self.assertIsNone(self.client.consolidate('abc', encrypted_result)[1])
+
+    def test_updates_after_cleanup(self):
+        self.server.add(self.client.add_token(1, 'abc'))
+        self.server.delete(self.client.del_token(1, 'abc'))
+        self.server.add(self.client.add_token(1, 'abc'))
+        (_, cleanup_token) = self.client.consolidate('a*', self.server.search(self.client.srch_token('a*')))
+        self.server.cleanup(cleanup_token)
+
+        self.server.delete(self.client.del_token(1, 'abc'))
+        self.assertEqual([], self.client.dec_search(self.server.search(self.client.srch_token('a*'))))
+
+    def test_false_positives(self):
+        self.server.add(self.client.add_token(1, 'abd'))
+        self.server.delete(self.client.del_token(1, 'abd'))
+        self.server.add(self.client.add_token(2, 'abc'))
+        self.server.delete(self.client.del_token(2, 'abc'))
+        encrypted_result = self.server.search(self.client.srch_token('ab*'))
+
+        # Pretend that only the add update of 'abd' was returned, as a false positive of a search for 'abc'
+        abd_add = [c for c in encrypted_result if self.client._decrypt_update(c)[1] == Op.ADD and
+                   self.client._decrypt_update(c)[3] == 'abd']
+        abc_updates = [c for c in encrypted_result if self.client._decrypt_update(c)[3] == 'abc']
+        (_, cleanup_token) = self.client.consolidate('abc', abc_updates + abd_add)
+        self.server.cleanup(cleanup_token)
+        self.assertEqual(2, len(self.server.search(self.client.srch_token('abd'))))
+        self.assertEqual([], self.client.dec_search(self.server.search(self.client.srch_token('ab*'))))
+
+
+class TestSearchSince(unittest.TestCase):
+    def setUp(self):
+        self.client = LibertasClient(ZNClient(.01, 6), search_cache_size=2)
+        self.client.setup((256, 2048))
+        self.server = LibertasServer(ZNServer())
+        self.server.build_index()
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(5))
+
+    def search(self, q, group_by_keyword=False):
+        since = self.client.watermark(q)
+        (encrypted_result, watermark) = self.server.search_since(self.client.srch_token(q), since)
+        self.new_updates = len(encrypted_result)
+        return self.client.dec_search_since(q, encrypted_result, since, watermark, group_by_keyword)
+
+    def test_incremental_search(self):
+        self.assertEqual([0, 1, 2, 3, 4], sorted(self.search('abc')))
+        self.assertEqual(5, self.client.watermark('abc'))
+
+        self.server.delete(self.client.del_token(1, 'abc'))
+        self.server.add(self.client.add_token(5, 'abd'))
+        self.assertEqual([0, 2, 3, 4], sorted(self.search('abc')))
+        self.assertEqual(1, self.new_updates)
+        self.assertEqual({'abc': [0, 2, 3, 4], 'abd': [5]},
+                         {w: sorted(inds) for (w, inds) in self.search('ab*', group_by_keyword=True).items()})
+        self.assertEqual([0, 2, 3, 4], sorted(self.search('abc')))
+        self.assertEqual(0, self.new_updates)
+
+    def test_cache_eviction(self):
+        for q in ['abc', 'ab_', 'a*']:
+            self.search(q)
+        self.assertEqual(0, self.client.watermark('abc'))
+        self.assertEqual([0, 1, 2, 3, 4], sorted(self.search('abc')))
+        self.assertEqual(5, self.new_updates)
+
+    def test_segmented_index(self):
+        self.server = LibertasServer(ZNSegmentedServer(head_size=2, background_merge=False))
+        self.server.build_index()
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(5))
+        self.assertEqual([0, 1, 2, 3, 4], sorted(self.search('abc')))
+        self.server.delete(self.client.del_token(1, 'abc'))
+        self.server.sigma.merge()
+        self.assertEqual([0, 2, 3, 4], sorted(self.search('abc')))
+        self.assertEqual(1, self.new_updates)
+        self.server.sigma.close()
+
+    def test_eviction_between_watermark_and_replay(self):
+        self.search('abc')
+        since = self.client.watermark('abc')
+        self.server.delete(self.client.del_token(1, 'abc'))
+        (encrypted_result, watermark) = self.server.search_since(self.client.srch_token('abc'), since)
+        for q in ['ab_', 'a*']:
+            self.search(q)
+
+        self.assertRaises(ValueError, self.client.dec_search_since, 'abc', encrypted_result, since, watermark)
+        self.assertEqual(0, self.client.watermark('abc'))
+        self.assertEqual([0, 2, 3, 4], sorted(self.search('abc')))
+
+    def test_cleanup_empties_cache(self):
+        self.search('abc')
+        self.server.delete(self.client.del_token(1, 'abc'))
+        (_, cleanup_token) = self.client.consolidate('abc', self.server.search(self.client.srch_token('abc')))
+        self.server.cleanup(cleanup_token)
+        self.assertEqual(0, self.client.watermark('abc'))
+        self.assertEqual([0, 2, 3, 4], sorted(self.search('abc')))
+
+
+class TestTopK(unittest.TestCase):
+    def setUp(self):
+        self.client = LibertasClient(ZNClient(.01, 6))
+        self.client.setup((256, 2048))
+        self.server = LibertasServer(ZNServer())
+        self.server.build_index()
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(10))
+        self.server.delete(self.client.del_token(9, 'abc'))
+        self.server.add(self.client.add_token(3, 'abc'))
+        self.server.add(self.client.add_token(20, 'xyz'))
+
+    def stream(self, q):
+        self.streamed = 0
+        for cipher_text in self.server.search_iter(self.client.srch_token(q), newest_first=True):
+            self.streamed += 1
+            yield cipher_text
+
+    def test_topk(self):
+        self.assertEqual([3, 8, 7], self.client.dec_search_topk('abc', self.stream('abc'), 3))
+        self.assertEqual(5, self.streamed)
+        self.assertEqual([3, 8, 7, 6, 5, 4, 2, 1, 0], self.client.dec_search_topk('abc', self.stream('abc'), 20))
+        self.assertEqual([], self.client.dec_search_topk('abc', self.stream('abc'), 0))
+
+    def test_matches_dec_search(self):
+        for q in ['abc', 'a*', '*', 'x_z']:
+            topk = self.client.dec_search_topk(q, self.stream(q), 100)
+            self.assertEqual(sorted(self.client.dec_search(self.server.search(self.client.srch_token(q)))), sorted(topk))
+
+    def test_deleted_after_readd(self):
+        self.server.delete(self.client.del_token(3, 'abc'))
+        self.assertEqual([8, 7], self.client.dec_search_topk('abc', self.stream('abc'), 2))
+
+    def test_out_of_order_updates(self):
+        # The delete is made after the add, but reaches the index first
+        add_token = self.client.add_token(30, 'abc')
+        self.server.delete(self.client.del_token(30, 'abc'))
+        self.server.add(add_token)
+        self.assertEqual([3, 8, 7, 6, 5, 4, 2, 1, 0], self.client.dec_search_topk('abc', self.stream('abc'), 20))
+
+
 if __name__ == '__main__':
     unittest.main()
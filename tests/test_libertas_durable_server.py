@@ -0,0 +1,164 @@
+# Python imports
+import os
+import tempfile
+import unittest
+
+# Project imports
+from src.libertas.libertas_client import LibertasClient
+from src.libertas.libertas_durable_server import LibertasDurableServer
+from src.libertas.libertas_update_log import UpdateLog
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestRecovery(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.client = LibertasClient(ZNClient(.01, 6))
+        self.client.setup((256, 2048))
+        self.server = LibertasDurableServer(ZNServer(), self.directory.name)
+        self.server.build_index()
+
+        self.server.add(self.client.add_token(1, 'abc'))
+        self.server.add_many(self.client.add_token(ind, 'abd') for ind in range(2, 5))
+        self.server.delete(self.client.del_token(2, 'abd'))
+
+    def tearDown(self):
+        self.server.close()
+        self.directory.cleanup()
+
+    def search(self, server, q):
+        return sorted(self.client.dec_search(server.search(self.client.srch_token(q))))
+
+    def restart(self):
+        self.server.close()
+        server = LibertasDurableServer(ZNServer(), self.directory.name)
+        server.recover()
+        return server
+
+    def test_replay_log(self):
+        server = self.restart()
+        self.assertEqual([1, 3, 4], self.search(server, 'ab*'))
+        self.assertEqual(3, server.log.seq)
+        server.close()
+
+    def test_rejected_update_is_not_logged(self):
+        add_token = self.client.add_token(5, 'abe')
+        with self.assertRaises(ValueError):
+            self.server.add(add_token[:-1] + ('unknown',))
+        self.assertEqual(3, self.server.log.seq)
+
+        server = self.restart()
+        self.assertEqual([1, 3, 4], self.search(server, 'ab*'))
+        server.add(add_token)
+        self.assertEqual([1, 3, 4, 5], self.search(server, 'ab*'))
+        server.close()
+
+    def test_rejected_bulk_update_is_not_applied(self):
+        self.server.sigma.BATCH_SIZE = 4
+        add_tokens = [self.client.add_token(ind, 'abe') for ind in range(5, 15)]
+        add_tokens[-1] = add_tokens[-1][:-1] + ('unknown',)
+        with self.assertRaises(ValueError):
+            self.server.add_many(add_tokens)
+        self.assertEqual([1, 3, 4], self.search(self.server, 'ab*'))
+        self.assertEqual(3, self.server.log.seq)
+
+        server = self.restart()
+        self.assertEqual([1, 3, 4], self.search(server, 'ab*'))
+        server.close()
+
+    def test_checkpoint(self):
+        self.server.checkpoint()
+        self.assertEqual(0, os.path.getsize(self.server.log.path))
+        self.server.delete_many([self.client.del_token(1, 'abc')])
+
+        server = self.restart()
+        self.assertEqual([3, 4], self.search(server, 'ab*'))
+        self.assertEqual(1, server.records_since_checkpoint)
+        server.add(self.client.add_token(5, 'abe'))
+        self.assertEqual(5, server.log.seq)
+        server.close()
+
+    def test_cleanup(self):
+        (_, cleanup_token) = self.client.consolidate('ab*', self.server.search(self.client.srch_token('ab*')))
+        self.server.cleanup(cleanup_token)
+
+        server = self.restart()
+        self.assertEqual([1, 3, 4], self.search(server, 'ab*'))
+        self.assertEqual(3, len(server.search(self.client.srch_token('ab*'))))
+        self.assertEqual(4, server.log.seq)
+        server.close()
+
+    def test_search_since(self):
+        srch_token = self.client.srch_token('ab*')
+        self.server.checkpoint()
+        self.server.add(self.client.add_token(5, 'abe'))
+
+        server = self.restart()
+        (encrypted_result, sequence) = server.search_since(srch_token, 5)
+        self.assertEqual([5], self.client.dec_search(encrypted_result))
+        self.assertEqual(6, sequence)
+        server.close()
+
+    def test_automatic_checkpoint(self):
+        server = LibertasDurableServer(ZNServer(), self.directory.name, checkpoint_records=2)
+        server.build_index()
+        for ind in range(5):
+            server.add(self.client.add_token(ind, 'abc'))
+        self.assertEqual(1, server.records_since_checkpoint)
+        server.close()
+
+        server = LibertasDurableServer(ZNServer(), self.directory.name)
+        server.recover()
+        self.assertEqual(list(range(5)), self.search(server, 'abc'))
+        server.close()
+
+    def test_torn_tail(self):
+        self.server.close()
+        with open(self.server.log.path, 'ab') as file:
+            file.write(b'\x10\x00\x00\x00partial')
+        server = self.restart()
+        self.assertEqual([1, 3, 4], self.search(server, 'ab*'))
+        server.add(self.client.add_token(5, 'abe'))
+        server.close()
+        server = self.restart()
+        self.assertEqual([1, 3, 4, 5], self.search(server, 'ab*'))
+        server.close()
+
+
+class TestUpdateLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'updates.log')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fsync_batching(self):
+        log = UpdateLog(self.path, fsync_records=10)
+        log.open()
+        for i in range(25):
+            log.append('add', i)
+        self.assertEqual(2, log.syncs)
+        self.assertEqual(5, log.unsynced)
+        log.close()
+        self.assertEqual(3, log.syncs)
+
+        log = UpdateLog(self.path)
+        self.assertEqual([(i + 1, 'add', i) for i in range(20, 25)], log.recover(20))
+
+    def test_fsync_interval(self):
+        log = UpdateLog(self.path, fsync_interval=1)
+        log.open()
+        log.append('add', 0)
+        log.stopped.wait(.2)
+        self.assertEqual(0, log.unsynced)
+        log.close()
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            UpdateLog(self.path, fsync_records=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+# Python imports
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+# Project imports
+from src.libertas.libertas_client import LibertasClient
+from src.libertas.libertas_server import LibertasServer
+from src.network.client import NetworkClient
+from src.network.protocol import decode_batch, encode_batch, encode_frame, FrameType
+from src.network.server import NetworkServer
+from src.serialization import decode_updates, encode_token
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class ServerThread(object):
+    """Runs a network server on an event loop in a background thread."""
+
+    def __init__(self, backend, path=None):
+        self.loop = asyncio.new_event_loop()
+        self.server = NetworkServer(backend, report_interval=0)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(port=0, path=path), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class TestProtocol(unittest.TestCase):
+    def test_batch(self):
+        items = [(1, b'abc'), (3, b''), (2, b'\x00' * 300)]
+        self.assertEqual(items, decode_batch(encode_batch(items)))
+
+
+class TestZNNetworkServer(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 6)
+        self.client.setup(256)
+        backend = ZNServer()
+        backend.build_index()
+        self.server = ServerThread(backend)
+        (host, port) = self.server.server.address
+        self.connection = NetworkClient(host, port)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.stop()
+
+    def test_add_search_delete(self):
+        self.connection.add(self.client.add_token(1, 'abc'))
+        self.connection.add_many([self.client.add_token(2, 'abd'), self.client.add_token(3, 'xyz')])
+        self.assertEqual([1, 2], sorted(self.connection.search(self.client.srch_token('ab*'))))
+
+        self.connection.delete(self.client.del_token(1, 'abc'))
+        self.connection.delete_many([self.client.del_token(3, 'xyz')])
+        self.assertEqual([2], self.connection.search(self.client.srch_token('ab*')))
+        self.assertEqual([], self.connection.search(self.client.srch_token('xyz')))
+
+    def test_pipelining(self):
+        request_ids = [self.connection.send(FrameType.ADD, encode_token(self.client.add_token(ind, 'abc')))
+                       for ind in range(20)]
+        request_ids.append(self.connection.send(FrameType.SEARCH, encode_token(self.client.srch_token('abc'))))
+        responses = [self.connection.receive() for _ in request_ids]
+
+        self.assertEqual(request_ids, [request_id for (request_id, _) in responses])
+        self.assertEqual(list(range(20)), sorted(decode_updates(responses[-1][1])))
+
+    def test_mixed_batch(self):
+        items = [(FrameType.ADD.value, encode_token(self.client.add_token(1, 'abc'))),
+                 (FrameType.ADD.value, encode_token(self.client.add_token(2, 'abc'))),
+                 (FrameType.SEARCH.value, encode_token(self.client.srch_token('abc'))),
+                 (FrameType.DELETE.value, encode_token(self.client.del_token(1, 'abc'))),
+                 (FrameType.SEARCH.value, encode_token(self.client.srch_token('abc')))]
+        responses = decode_batch(self.connection.request(FrameType.BATCH, encode_batch(items)))
+
+        self.assertEqual(5, len(responses))
+        self.assertEqual([1, 2], sorted(decode_updates(responses[2][1])))
+        self.assertEqual([2], decode_updates(responses[4][1]))
+
+    def test_errors(self):
+        (ind, bloom_filter, b_id, _) = self.client.add_token(1, 'abc')
+        self.assertRaises(ValueError, self.connection.add, (ind, bloom_filter, b_id, 'blake2b'))
+        self.assertRaises(ValueError, self.connection.request, FrameType.ADD, b'\x09')
+        self.connection.socket.sendall(encode_frame(7, 42, b''))
+        self.assertRaises(ValueError, self.connection.receive)
+
+        # The connection remains usable after failed requests
+        self.connection.add(self.client.add_token(1, 'abc'))
+        self.assertEqual([1], self.connection.search(self.client.srch_token('abc')))
+
+    def test_stats(self):
+        self.connection.add_many([self.client.add_token(ind, 'abc') for ind in range(3)])
+        stats = self.connection.stats()
+        self.assertEqual(2, stats['frames'])
+        self.assertEqual(4, stats['requests'])
+        self.assertEqual(0, stats['errors'])
+        self.assertEqual(1, stats['connections'])
+
+
+class TestLibertasNetworkServer(unittest.TestCase):
+    def setUp(self):
+        self.client = LibertasClient(ZNClient(.01, 6))
+        self.client.setup((256, 2048))
+        backend = LibertasServer(ZNServer())
+        backend.build_index()
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'libertas.sock')
+        self.server = ServerThread(backend, path)
+        self.connection = NetworkClient(path=path)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.stop()
+        self.directory.cleanup()
+
+    def search(self, q):
+        return sorted(self.client.dec_search(self.connection.search(self.client.srch_token(q))))
+
+    def test_add_search_delete(self):
+        self.connection.add(self.client.add_token(1, 'abc'))
+        self.connection.add_many(self.client.add_token(ind, 'abd') for ind in range(2, 5))
+        self.assertEqual([1, 2, 3, 4], self.search('ab*'))
+
+        self.connection.delete(self.client.del_token(2, 'abd'))
+        self.connection.delete_many([self.client.del_token(3, 'abd')])
+        self.assertEqual([1, 4], self.search('ab*'))
+
+    def test_cleanup(self):
+        self.connection.add_many(self.client.add_token(ind, 'abc') for ind in range(3))
+        self.connection.delete(self.client.del_token(1, 'abc'))
+        (result, cleanup_token) = self.client.consolidate('abc', self.connection.search(self.client.srch_token('abc')))
+        self.assertEqual([0, 2], sorted(result))
+        self.connection.cleanup(cleanup_token)
+        self.assertEqual(2, len(self.connection.search(self.client.srch_token('abc'))))
+        self.assertEqual([0, 2], self.search('abc'))
+
+    def test_search_since(self):
+        self.connection.add_many(self.client.add_token(ind, 'abc') for ind in range(3))
+        (encrypted_result, sequence) = self.connection.search_since(self.client.srch_token('abc'))
+        self.assertEqual((3, 3), (len(encrypted_result), sequence))
+        self.connection.add(self.client.add_token(3, 'abc'))
+        (encrypted_result, sequence) = self.connection.search_since(self.client.srch_token('abc'), sequence)
+        self.assertEqual([3], self.client.dec_search(encrypted_result))
+        self.assertEqual(4, sequence)
+        self.assertRaises(ValueError, self.connection.search_since, self.client.srch_token('abc'), 5)
@@ -0,0 +1,124 @@
+# Python imports
+import pickle
+import timeit
+import unittest
+
+# Project imports
+from src.libertas.libertas_client import LibertasClient
+from src.utils import Op
+from src.serialization import decode_add_token, decode_del_token, decode_srch_token, decode_token, decode_updates, \
+    decode_update_record, encode_add_token, encode_del_token, encode_srch_token, encode_token, encode_update_record, \
+    encode_updates, HEADER, VERSION
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 6)
+        self.client.setup(2048)
+
+    def test_add_token(self):
+        for ind in [0, 1, -1, 1 << 600, -(1 << 600)]:
+            add_token = self.client.add_token(ind, 'abc')
+            self.assertEqual(add_token, decode_add_token(encode_add_token(add_token)))
+
+    def test_srch_token(self):
+        for q in ['abc', 'a*c', 'a_c', '*']:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(srch_token, decode_srch_token(encode_srch_token(srch_token)))
+
+        # Positions of one to five varint bytes, including a repeated one
+        td1s = [1, 200, 20000, 1 << 30, 200]
+        srch_token = (td1s, [bytes([pos % 251]) * 16 for pos in td1s], 'aes')
+        self.assertEqual(srch_token, decode_srch_token(encode_srch_token(srch_token)))
+
+    def test_del_token(self):
+        del_token = self.client.del_token(1, 'abc')
+        self.assertEqual(del_token, decode_del_token(encode_del_token(del_token)))
+
+    def test_updates(self):
+        updates = [0, 1, -1, 127, 128, 255, 1 << 1000]
+        self.assertEqual(updates, decode_updates(encode_updates(updates)))
+        self.assertEqual([], decode_updates(encode_updates([])))
+        updates = [b'', b'abc', bytes(200)]
+        self.assertEqual(updates, decode_updates(encode_updates(updates)))
+        self.assertRaises(ValueError, encode_updates, [1, b'abc'])
+
+    def test_bytes_ind(self):
+        add_token = self.client.add_token(bytes(range(48)), 'abc')
+        self.assertEqual(add_token, decode_add_token(encode_add_token(add_token)))
+
+    def test_update_record(self):
+        for update in [(1, Op.ADD, 2, 'abc'), (1 << 40, Op.DEL, -300, 'ab\u00e7'), (0, Op.ADD, 0, '')]:
+            self.assertEqual(update, decode_update_record(encode_update_record(update)))
+        record = encode_update_record((5, Op.DEL, 7, 'abc'), keyword_id=1)
+        self.assertEqual((5, Op.DEL, 7, 'abc'), decode_update_record(record, ['xyz', 'abc']))
+        self.assertRaises(ValueError, decode_update_record, record)
+        self.assertRaises(ValueError, decode_update_record, record, ['xyz'])
+
+    def test_decode_token(self):
+        tokens = [self.client.add_token(1, 'abc'), self.client.srch_token('a*'), self.client.del_token(1, 'abc')]
+        self.assertEqual(tokens, [decode_token(encode_token(token)) for token in tokens])
+
+    def test_zero_copy(self):
+        data = encode_srch_token(self.client.srch_token('a*c'))
+        (_, td2s, _) = decode_srch_token(data)
+        self.assertTrue(all(isinstance(h_pos, memoryview) and h_pos.obj is data for h_pos in td2s))
+
+    def test_search_decoded_tokens(self):
+        server = ZNServer()
+        server.build_index()
+        server.add_many(decode_token(encode_token(self.client.add_token(ind, w)))
+                        for (ind, w) in [(1, 'abc'), (2, 'abd'), (3, 'xyz')])
+        self.assertEqual([1, 2], sorted(server.search(decode_token(encode_token(self.client.srch_token('ab*'))))))
+
+
+class TestInvalidData(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 6)
+        self.client.setup(256)
+
+    def test_version(self):
+        data = bytearray(encode_token(self.client.add_token(1, 'abc')))
+        data[0] = VERSION + 1
+        self.assertRaises(ValueError, decode_token, data)
+
+    def test_kind(self):
+        self.assertRaises(ValueError, decode_srch_token, encode_del_token(b'abc'))
+        self.assertRaises(ValueError, decode_token, encode_updates([1]))
+        self.assertRaises(ValueError, encode_token, [1, 2])
+
+    def test_truncated(self):
+        for data in [encode_token(self.client.add_token(1, 'abc')), encode_token(self.client.srch_token('a*')),
+                     encode_del_token(b'abc'), encode_updates([1 << 100])]:
+            for end in [0, HEADER.size, len(data) - 1]:
+                self.assertRaises(ValueError, decode_token if data[1] != 4 else decode_updates, data[:end])
+
+    def test_inconsistent_hashes(self):
+        (td1s, td2s, prf) = self.client.srch_token('abc')
+        self.assertRaises(ValueError, encode_srch_token, ([1, 1], [td2s[0], td2s[1]], prf))
+        self.assertRaises(ValueError, encode_srch_token, ([1, 2], [td2s[0], td2s[1][1:]], prf))
+
+
+class TestComparedToPickle(unittest.TestCase):
+    def setUp(self):
+        client = LibertasClient(ZNClient(.01, 6))
+        client.setup((256, 2048))
+        self.add_tokens = [client.add_token(ind, 'abc{0}'.format(ind)) for ind in range(50)]
+        self.srch_tokens = [client.srch_token(q) for q in ['abc1', 'a*1', 'abc_', 'a*']]
+        self.updates = [add_token[0] for add_token in self.add_tokens]
+
+    def test_size(self):
+        for add_token in self.add_tokens:
+            self.assertLess(len(encode_token(add_token)), len(pickle.dumps(add_token)))
+        for srch_token in self.srch_tokens:
+            self.assertLess(len(encode_token(srch_token)), len(pickle.dumps(srch_token)))
+        self.assertLess(len(encode_updates(self.updates)), len(pickle.dumps(self.updates)))
+
+    def test_speed(self):
+        # Timings are noisy, so only check that encoding is not an order of magnitude slower than pickle
+        for values in [self.add_tokens, self.srch_tokens]:
+            encode_time = timeit.timeit(lambda: [decode_token(encode_token(value)) for value in values], number=5)
+            pickle_time = timeit.timeit(lambda: [pickle.loads(pickle.dumps(value)) for value in values], number=5)
+            self.assertLess(encode_time, pickle_time * 10)
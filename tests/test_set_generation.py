@@ -679,5 +679,23 @@ class TestSTp2(unittest.TestCase):
         )
 
 
+class TestSetCache(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 7, set_cache_size=2)
+        self.client.setup(2048)
+
+    def test_cached_sets_are_unchanged(self):
+        for _ in range(2):
+            self.assertEqual(self.client._s_k('keyword'), list(self.client._cached_set('k', 'keyword')))
+            self.assertEqual(self.client._s_t('k*y_ord'), list(self.client._cached_set('t', 'k*y_ord')))
+        self.assertEqual(2, self.client.set_cache.hits)
+
+    def test_tokens_use_cache(self):
+        self.assertEqual(self.client.add_token(1, 'keyword'), self.client.add_token(1, 'keyword'))
+        self.assertEqual(self.client.srch_token('key*'), self.client.srch_token('key*'))
+        self.assertEqual(2, self.client.set_cache.hits)
+        self.assertEqual(2, len(self.client.set_cache))
+
+
 if __name__ == '__main__':
     unittest.main()
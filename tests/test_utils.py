@@ -0,0 +1,58 @@
+# Python imports
+import unittest
+
+# Project imports
+from src.utils import LRUCache, matches_query
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_least_recently_used_item_is_evicted(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_disabled_cache(self):
+        cache = LRUCache(0)
+        cache.put('a', 1)
+        self.assertEqual(0, len(cache))
+        self.assertIsNone(cache.get('a'))
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+
+
+class TestMatchesQuery(unittest.TestCase):
+    def test_wildcards(self):
+        self.assertTrue(matches_query('abc', 'abc'))
+        self.assertFalse(matches_query('abc', 'abcd'))
+        self.assertTrue(matches_query('a_c', 'abc'))
+        self.assertFalse(matches_query('a_c', 'ac'))
+        self.assertTrue(matches_query('a*', 'a'))
+        self.assertTrue(matches_query('*c', 'abc'))
+        self.assertTrue(matches_query('*', ''))
+
+    def test_special_characters(self):
+        self.assertTrue(matches_query('a.c', 'a.c'))
+        self.assertFalse(matches_query('a.c', 'abc'))
+        self.assertTrue(matches_query('a[*', 'a[\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,17 @@ class TestSetup(unittest.TestCase):
             self.assertEqual(security_parameter // 8, len(k))
         self.assertEqual(security_parameter // 8, len(k_g))
 
+    def test_position_table(self):
+        client = ZNClient(.01, 6)
+        client.setup(2048)
+        other_client = ZNClient(.01, 6)
+        other_client.setup(2048)
+        other_client.k = client.k
+
+        self.assertEqual(client.bf_size, len(client.position_table))
+        self.assertEqual(client.position_table, other_client.position_table)
+        self.assertEqual(client.add_token(1, 'abc'), other_client.add_token(1, 'abc'))
+
     def test_build_index(self):
         server = ZNServer()
         server.build_index()
@@ -52,6 +63,51 @@ class TestAdd(unittest.TestCase):
             self.assertEqual([1], result)
 
 
+class TestAddMany(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 6)
+        self.client.setup(2048)
+        self.server = ZNServer()
+        self.server.build_index()
+
+    def test_add_many(self):
+        keywords = ['abc', 'abcd', 'abcde', 'abcdef']
+        self.server.add_many(self.client.add_token(ind, w) for ind, w in zip(range(len(keywords)), keywords))
+
+        for ind, w in zip(range(len(keywords)), keywords):
+            srch_token = self.client.srch_token(w)
+            self.assertIn(ind, self.server.search(srch_token))
+        for b_id, slot in self.server.slots.items():
+            self.assertEqual(b_id, self.server.index[slot][2])
+
+    def test_duplicates_are_skipped(self):
+        add_token = self.client.add_token(1, 'abc')
+        self.server.add(add_token)
+        self.server.add_many([add_token, self.client.add_token(2, 'abc'), self.client.add_token(2, 'abc')])
+        self.assertEqual(2, len(self.server.index))
+
+    def test_small_batches(self):
+        self.server.BATCH_SIZE = 3
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(10))
+        srch_token = self.client.srch_token('abc')
+        self.assertTrue(set(range(10)).issubset(set(self.server.search(srch_token))))
+
+    def test_validation(self):
+        (ind, bloom_filter, b_id, prf) = self.client.add_token(1, 'abc')
+        invalid_tokens = [
+            (ind, bloom_filter, b_id),
+            ('1', bloom_filter, b_id, prf),
+            (ind, bloom_filter[:-1], b_id, prf),
+            (ind, bloom_filter, b_id[:-1], prf),
+            (ind, bloom_filter, b_id, 'blake2b'),
+        ]
+
+        for invalid_token in invalid_tokens:
+            with self.assertRaises(ValueError):
+                self.server.add_many([(ind, bloom_filter, b_id, prf), invalid_token], validate=True)
+            self.assertEqual([], self.server.index)
+
+
 class TestDelete(unittest.TestCase):
     def setUp(self):
         self.client = ZNClient(.01, 6)
@@ -92,6 +148,145 @@ class TestDelete(unittest.TestCase):
         result = self.server.search(srch_token)
         self.assertEqual([1], result)
 
+    def test_idempotent_add(self):
+        add_token = self.client.add_token(3, 'abc')
+        self.server.add(add_token)
+        size = len(self.server.index)
+        self.server.add(add_token)
+        self.server.add(self.client.add_token(3, 'abc'))
+        self.assertEqual(size, len(self.server.index))
+
+    def test_concatenation_collisions(self):
+        pairs = [(31, '2a'), (312, 'a'), (b'31', '2a'), (b'312', 'a')]
+        self.assertEqual(len(pairs), len({self.client.del_token(ind, w) for (ind, w) in pairs}))
+
+        size = len(self.server.index)
+        self.server.add_many(self.client.add_token(ind, w) for (ind, w) in pairs)
+        self.assertEqual(size + len(pairs), len(self.server.index))
+        self.assertIn(312, self.server.search(self.client.srch_token('a')))
+        self.assertIn(31, self.server.search(self.client.srch_token('2a')))
+
+    def test_delete_unknown_pair(self):
+        size = len(self.server.index)
+        self.server.delete(self.client.del_token(3, 'unknown'))
+        self.assertEqual(size, len(self.server.index))
+
+    def test_delete_many(self):
+        self.server.delete_many(self.client.del_token(1, w) for w in self.keywords)
+        for w in self.keywords:
+            srch_token = self.client.srch_token(w)
+            result = self.server.search(srch_token)
+            self.assertNotIn(1, result)
+            self.assertIn(2, result)
+
+    def test_slots_after_compaction(self):
+        self.server.delete_many(self.client.del_token(1, w) for w in self.keywords)
+        self.server.delete(self.client.del_token(2, 'abc'))
+        self.assertEqual(0, self.server.tombstones)
+        for b_id, slot in self.server.slots.items():
+            self.assertEqual(b_id, self.server.index[slot][2])
+        self.server.delete(self.client.del_token(2, 'abcd'))
+        self.assertNotIn(self.client.del_token(2, 'abcd'), self.server.slots)
+        srch_token = self.client.srch_token('abc*')
+        self.assertTrue({2}.issubset(set(self.server.search(srch_token))))
+
+        # Without any entries of document 2 left, it cannot be returned as a false positive
+        self.server.delete_many(self.client.del_token(2, w) for w in self.keywords[2:])
+        srch_token = self.client.srch_token('abcd')
+        self.assertNotIn(2, self.server.search(srch_token))
+
+
+class TestPositionCache(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 6)
+        self.client.setup(2048)
+        self.cached_client = ZNClient(.01, 6, position_cache_size=64)
+        self.cached_client.k = self.client.k
+
+    def test_tokens_are_unchanged(self):
+        for _ in range(2):
+            self.assertEqual(self.client.add_token(1, 'abcabc'), self.cached_client.add_token(1, 'abcabc'))
+            self.assertEqual(self.client.srch_token('a*c_'), self.cached_client.srch_token('a*c_'))
+        self.assertLess(0, self.cached_client.position_cache.hits)
+
+    def test_size_cap(self):
+        for i in range(20):
+            self.cached_client.add_token(i, str(i) * 3)
+        self.assertEqual(64, len(self.cached_client.position_cache))
+
+    def test_key_change_clears_cache(self):
+        self.cached_client.add_token(1, 'abc')
+        self.cached_client.setup(2048)
+        self.assertEqual(0, len(self.cached_client.position_cache))
+
+
+class TestSrchTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 6, srch_token_cache_size=2)
+        self.client.setup(2048)
+
+    def test_cached_tokens_are_unchanged(self):
+        srch_token = self.client.srch_token('a*c')
+        self.assertIs(srch_token, self.client.srch_token('a*c'))
+        self.assertEqual(srch_token, self.client._srch_token('a*c'))
+        self.assertEqual(1, self.client.srch_token_cache.hits)
+
+    def test_compiled_query(self):
+        query = self.client.compile_query('a*c')
+        self.assertEqual(self.client._srch_token('a*c'), self.client.srch_token(query))
+
+        server = ZNServer()
+        server.build_index()
+        server.add(self.client.add_token(1, 'abc'))
+        self.assertEqual([1], server.search(self.client.srch_token(query)))
+
+    def test_key_change_invalidates(self):
+        query = self.client.compile_query('a*c')
+        self.client.srch_token('abc')
+        self.client.setup(2048)
+        self.assertEqual(0, len(self.client.srch_token_cache))
+        self.assertEqual(self.client._srch_token('a*c'), self.client.srch_token(query))
+        self.assertEqual(self.client.epoch, query.epoch)
+
+
+class TestPRFBackends(unittest.TestCase):
+    def test_backends(self):
+        keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc']
+        queries = ['abc', '*a*', 'a*', '*c', 'ab_', '*c_bc_*']
+        results = [[0], [0, 1, 2, 3, 4], [0, 1, 4], [0, 2, 4], [0, 1], [4]]
+
+        for prf in ['hmac-sha256', 'blake2b', 'aes']:
+            client = ZNClient(.01, 10, prf)
+            client.setup(2048)
+            server = ZNServer(prf=prf)
+            server.build_index()
+            server.add_many((client.add_token(ind, w) for ind, w in zip(range(len(keywords)), keywords)),
+                            validate=True)
+
+            for q, r in zip(queries, results):
+                srch_token = client.srch_token(q)
+                self.assertTrue(set(r).issubset(set(server.search(srch_token))))
+
+    def test_mixed_backends_are_rejected(self):
+        client = ZNClient(.01, 10, 'blake2b')
+        client.setup(2048)
+        server = ZNServer()
+        server.build_index()
+
+        with self.assertRaises(ValueError):
+            server.add(client.add_token(1, 'abc'))
+        with self.assertRaises(ValueError):
+            server.add_many([client.add_token(1, 'abc')])
+        with self.assertRaises(ValueError):
+            server.search(client.srch_token('abc'))
+        self.assertEqual([], server.index)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            ZNClient(.01, 10, 'md5')
+        with self.assertRaises(ValueError):
+            ZNServer(prf='md5')
+
 
 class TestSearch(unittest.TestCase):
     def setUp(self):
@@ -242,5 +437,125 @@ class TestSearch(unittest.TestCase):
             self.assertTrue(set(r).issubset(result))
 
 
+class TestSearchIter(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNServer()
+        self.server.build_index()
+
+        for ind in range(50):
+            add_token = self.client.add_token(ind, 'abc')
+            self.server.add(add_token)
+            add_token = self.client.add_token(ind, 'abcd')
+            self.server.add(add_token)
+
+    def test_matches_search(self):
+        srch_token = self.client.srch_token('abc*')
+        self.assertEqual(self.server.search(srch_token), list(self.server.search_iter(srch_token)))
+
+    def test_results_are_unique(self):
+        srch_token = self.client.srch_token('abc*')
+        result = list(self.server.search_iter(srch_token))
+        self.assertEqual(len(set(result)), len(result))
+        self.assertTrue(set(range(50)).issubset(set(result)))
+
+    def test_limit(self):
+        srch_token = self.client.srch_token('abc*')
+        self.assertEqual(10, len(list(self.server.search_iter(srch_token, limit=10))))
+        self.assertEqual([], list(self.server.search_iter(srch_token, limit=0)))
+
+    def test_small_blocks(self):
+        self.server.BLOCK_SIZE = 7
+        srch_token = self.client.srch_token('abc')
+        self.assertTrue(set(range(50)).issubset(set(self.server.search_iter(srch_token))))
+
+    def test_newest_first(self):
+        srch_token = self.client.srch_token('abc*')
+        self.assertEqual(self.server.search(srch_token)[::-1], list(self.server.search_iter(srch_token, newest_first=True)))
+        self.assertEqual([49, 48], list(self.server.search_iter(srch_token, limit=2, newest_first=True)))
+
+        self.server.BLOCK_SIZE = 7
+        self.server.delete(self.client.del_token(49, 'abc'))
+        self.server.delete(self.client.del_token(49, 'abcd'))
+        self.assertEqual(list(range(48, -1, -1)), list(self.server.search_iter(srch_token, newest_first=True)))
+
+
+class TestSearchSince(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNServer()
+        self.server.build_index()
+        self.server.add_many(self.client.add_token(ind, 'abc') for ind in range(10))
+        self.srch_token = self.client.srch_token('abc')
+
+    def test_search_since(self):
+        (result, sequence) = self.server.search_since(self.srch_token)
+        self.assertEqual(list(range(10)), sorted(result))
+        self.assertEqual(10, sequence)
+
+        self.server.add(self.client.add_token(10, 'abc'))
+        self.server.add_many(self.client.add_token(ind, w) for (ind, w) in [(11, 'abc'), (12, 'xyz')])
+        (result, sequence) = self.server.search_since(self.srch_token, sequence)
+        self.assertEqual([10, 11], sorted(result))
+        self.assertEqual(13, sequence)
+        self.assertEqual(([], 13), self.server.search_since(self.srch_token, sequence))
+
+    def test_sequences_survive_compaction(self):
+        self.server.delete_many(self.client.del_token(ind, 'abc') for ind in range(8))
+        self.assertEqual(2, len(self.server.index))
+        self.server.add(self.client.add_token(0, 'abc'))
+        self.assertEqual([0, 8, 9], sorted(self.server.search_since(self.srch_token, 0)[0]))
+        self.assertEqual([9, 0], self.server.search_since(self.srch_token, 9)[0])
+        self.assertEqual([0], self.server.search_since(self.srch_token, 10)[0])
+
+    def test_unknown_sequence(self):
+        self.assertRaises(ValueError, self.server.search_since, self.srch_token, 11)
+        self.assertRaises(ValueError, self.server.search_since, self.srch_token, -1)
+
+
+class TestAdaptiveOrdering(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNServer(adaptive_ordering=True, exploration_rate=.5)
+        self.server.build_index()
+        self.reference = ZNServer()
+        self.reference.build_index()
+
+        keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc', 'test', 'testcase', 'testcasesimulator']
+        for ind, w in zip(range(len(keywords)), keywords):
+            add_token = self.client.add_token(ind, w)
+            self.server.add(add_token)
+            self.reference.add(add_token)
+
+    def test_results_are_unaffected(self):
+        queries = ['*a*', 'a*', '*c', '*ab*', 'ab_', '*', '*c_bc_*', '*d*', 'test*', '*es*es*']
+
+        for _ in range(3):
+            for q in queries:
+                srch_token = self.client.srch_token(q)
+                self.assertEqual(set(self.reference.search(srch_token)), set(self.server.search(srch_token)))
+
+    def test_selective_positions_are_tested_first(self):
+        server = ZNServer(adaptive_ordering=True, exploration_rate=0)
+        server.build_index()
+        server.add_many(self.client.add_token(ind, 'w{0}'.format(ind)) for ind in range(2 * server.MIN_POSITION_SAMPLES))
+        srch_token = self.client.srch_token('abc')
+        positions = list(dict.fromkeys(srch_token[0]))
+        self.assertGreater(len(positions), 2)
+
+        # The last position has not been tested yet, the others reject more entries the later they come
+        for rejected, pos in enumerate(positions[:-1]):
+            server._record_rejections(pos, 1000, rejected)
+        expected = [positions[-1]] + positions[-2::-1]
+        self.assertEqual(expected, [pos for (pos, _) in server._order_positions(srch_token)])
+
+        # The untested position is tested first, against every entry
+        server.search(srch_token)
+        self.assertEqual(2 * server.MIN_POSITION_SAMPLES, server.position_statistics[positions[-1]][0])
+
+
 if __name__ == '__main__':
     unittest.main()
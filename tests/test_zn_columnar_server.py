@@ -0,0 +1,105 @@
+# Python imports
+import unittest
+
+# Third-party imports
+from bitarray import bitarray
+
+# Project imports
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_columnar_server import ZNColumnarServer
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestColumnarSearch(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNColumnarServer()
+        self.server.build_index()
+        self.reference = ZNServer()
+        self.reference.build_index()
+
+        self.keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc', 'test', 'testcase', '25-01-1996', '11-09-2001']
+        for ind, w in zip(range(len(self.keywords)), self.keywords):
+            add_token = self.client.add_token(ind, w)
+            self.server.add(add_token)
+            self.reference.add(add_token)
+
+    def test_search_matches_list_index(self):
+        queries = ['abc', '*a*', 'a*', '*c', 'ab_', '*', 'test*', '__-__-2001', '*d*']
+
+        for q in queries:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(self.reference.search(srch_token), self.server.search(srch_token))
+
+    def test_newest_first(self):
+        for q in ['*a*', '*']:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(self.reference.search(srch_token)[::-1],
+                             list(self.server.search_iter(srch_token, newest_first=True)))
+
+    def test_search_since(self):
+        srch_token = self.client.srch_token('*')
+        add_tokens = [self.client.add_token(ind, 'tail') for ind in range(20, 25)]
+        self.server.add_many(add_tokens)
+        self.reference.add_many(add_tokens)
+        for since in range(self.reference.sequence + 1):
+            self.assertEqual(self.reference.search_since(srch_token, since), self.server.search_since(srch_token, since))
+
+        # Sequence numbers are kept through compaction
+        del_tokens = [self.client.del_token(ind, w) for ind, w in enumerate(self.keywords[:8])]
+        self.server.delete_many(del_tokens)
+        self.reference.delete_many(del_tokens)
+        self.assertEqual(6, len(self.server.inds))
+        for since in range(self.reference.sequence + 1):
+            self.assertEqual(self.reference.search_since(srch_token, since), self.server.search_since(srch_token, since))
+        self.assertRaises(ValueError, self.server.search_since, srch_token, self.server.sequence + 1)
+
+    def test_layout(self):
+        self.assertEqual(len(self.keywords), len(self.server.inds))
+        self.assertEqual(len(self.keywords) * self.server.stride, len(self.server.bloom_filters))
+        self.assertEqual(len(self.keywords) * 32, len(self.server.b_ids))
+
+    def test_idempotent_add(self):
+        self.server.add(self.client.add_token(0, 'abc'))
+        self.assertEqual(len(self.keywords), len(self.server.inds))
+
+    def test_delete_and_compaction(self):
+        del_tokens = [self.client.del_token(ind, w) for ind, w in enumerate(self.keywords)]
+        self.server.delete_many(del_tokens[:4])
+        self.reference.delete_many(del_tokens[:4])
+        self.assertEqual(4, self.server.tombstones)
+        self.assertNotIn(0, self.server.search(self.client.srch_token('abc')))
+
+        self.server.delete(del_tokens[4])
+        self.reference.delete(del_tokens[4])
+        self.assertEqual(0, self.server.tombstones)
+        self.assertEqual(list(range(5, len(self.keywords))), list(self.server.inds))
+        self.assertEqual(list(range(len(self.keywords) - 5)), [self.server.slots[b_id] for b_id in del_tokens[5:]])
+        for q in ['test*', '*', '*a*']:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(self.reference.search(srch_token), self.server.search(srch_token))
+
+    def test_rejects_large_document_identifiers(self):
+        with self.assertRaises(ValueError):
+            self.server.add(self.client.add_token(1 << 64, 'abc'))
+        self.assertEqual(len(self.keywords), len(self.server.inds))
+
+    def test_rejects_other_bloom_filter_sizes(self):
+        (ind, bloom_filter, b_id, prf) = self.client.add_token(20, 'abc')
+        with self.assertRaises(ValueError):
+            self.server.add((ind, bloom_filter + bitarray('1'), b_id, prf))
+        with self.assertRaises(ValueError):
+            self.server.validate([self.client.add_token(21, 'abc'), (ind, bloom_filter + bitarray('1'), b_id, prf)])
+        with self.assertRaises(ValueError):
+            self.server.validate([self.client.add_token(1 << 64, 'abc')])
+        self.server.validate([self.client.add_token(21, 'abc')])
+
+    def test_little_endian_bloom_filter(self):
+        (ind, bloom_filter, b_id, prf) = self.client.add_token(20, 'little')
+        self.server.add((ind, bitarray(bloom_filter, endian='little'), b_id, prf))
+        self.assertIn(20, self.server.search(self.client.srch_token('little')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Python imports
+import os
+import tempfile
+import unittest
+
+# Project imports
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_columnar_server import ZNColumnarServer
+from src.zhao_nishide.zn_index_file import ZNIndexFile
+from src.zhao_nishide.zn_mapped_server import ZNMappedServer
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestMappedServer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'index.zn')
+
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.reference = ZNServer()
+        self.reference.build_index()
+        columnar_server = ZNColumnarServer()
+        columnar_server.build_index()
+
+        self.keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc', 'test', 'testcase', '25-01-1996', '11-09-2001']
+        add_tokens = [self.client.add_token(ind, w) for ind, w in enumerate(self.keywords)]
+        self.reference.add_many(add_tokens)
+        columnar_server.add_many(add_tokens)
+        columnar_server.save(self.path)
+
+        self.server = ZNMappedServer()
+        self.server.open(self.path)
+
+    def tearDown(self):
+        self.server.close()
+        self.directory.cleanup()
+
+    def assertSameResults(self, queries):
+        for q in queries:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(self.reference.search(srch_token), self.server.search(srch_token))
+
+    def test_header(self):
+        index_file = ZNIndexFile(self.path)
+        self.assertEqual(len(self.keywords), index_file.count)
+        self.assertEqual(self.client.bf_size, index_file.bf_size)
+        self.assertEqual('hmac-sha256', index_file.prf)
+        self.assertEqual(list(range(len(self.keywords))), list(index_file.inds))
+        index_file.close()
+
+    def test_search(self):
+        self.assertIsNone(self.server.slots)
+        self.assertSameResults(['abc', '*a*', 'a*', '*c', 'ab_', '*', 'test*', '__-__-2001', '*d*'])
+
+    def test_updates(self):
+        add_tokens = [self.client.add_token(ind, 'tail') for ind in range(20, 25)]
+        self.server.add_many(add_tokens)
+        self.reference.add_many(add_tokens)
+        self.server.add(self.client.add_token(0, 'abc'))
+        self.assertEqual(len(self.keywords) + 5, len(self.server.slots))
+
+        del_tokens = [self.client.del_token(0, 'abc'), self.client.del_token(20, 'tail')]
+        self.server.delete_many(del_tokens)
+        self.reference.delete_many(del_tokens)
+        self.assertSameResults(['abc', 'tail', '*a*'])
+
+    def test_search_since(self):
+        srch_token = self.client.srch_token('*')
+        add_tokens = [self.client.add_token(ind, 'tail') for ind in range(20, 25)]
+        self.server.add_many(add_tokens)
+        self.reference.add_many(add_tokens)
+        del_tokens = [self.client.del_token(1, 'aba'), self.client.del_token(21, 'tail')]
+        self.server.delete_many(del_tokens)
+        self.reference.delete_many(del_tokens)
+
+        self.assertEqual(len(self.keywords) + 5, self.server.sequence)
+        for since in range(self.reference.sequence + 1):
+            self.assertEqual(self.reference.search_since(srch_token, since), self.server.search_since(srch_token, since))
+
+    def test_save_and_reopen(self):
+        self.server.add(self.client.add_token(20, 'tail'))
+        self.server.delete(self.client.del_token(0, 'abc'))
+        self.server.save(self.path)
+        self.server.open(self.path)
+
+        self.reference.add(self.client.add_token(20, 'tail'))
+        self.reference.delete(self.client.del_token(0, 'abc'))
+        self.assertEqual(len(self.keywords), self.server.row_offset)
+        self.assertSameResults(['abc', 'tail', '*'])
+
+    def test_invalid_files(self):
+        with self.assertRaises(ValueError):
+            ZNMappedServer(prf='blake2b').open(self.path)
+
+        self.server.close()
+        with open(self.path, 'r+b') as file:
+            file.truncate(100)
+        with self.assertRaises(ValueError):
+            ZNMappedServer().open(self.path)
+
+        with open(self.path, 'r+b') as file:
+            file.write(b'NOTANIDX')
+        with self.assertRaises(ValueError):
+            ZNMappedServer().open(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# Python imports
+import unittest
+
+# Project imports
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_mask_cache import MaskBitCache
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestMaskBitCache(unittest.TestCase):
+    def setUp(self):
+        self.computed = []
+
+    def compute(self, b_ids, h_pos):
+        self.computed.extend(b_ids)
+        return [b_id[0] & 1 for b_id in b_ids]
+
+    def test_hits_skip_computation(self):
+        cache = MaskBitCache(1 << 20)
+        b_ids = [bytes([n]) * 32 for n in range(10)]
+
+        first = cache.mask_bits(b'pos', b_ids, self.compute)
+        second = cache.mask_bits(b'pos', b_ids, self.compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(10, len(self.computed))
+        self.assertEqual(10, cache.hits)
+        self.assertEqual(10, cache.misses)
+
+    def test_budget_evicts_least_recently_used_column(self):
+        cache = MaskBitCache(10 * MaskBitCache.BYTES_PER_BIT)
+        b_ids = [bytes([n]) * 32 for n in range(6)]
+
+        cache.mask_bits(b'pos1', b_ids, self.compute)
+        cache.mask_bits(b'pos2', b_ids, self.compute)
+
+        self.assertLessEqual(cache.size, cache.max_bits)
+        self.assertNotIn(b'pos1', cache.columns)
+        self.assertIn(b'pos2', cache.columns)
+
+    def test_precompute_hot_positions(self):
+        cache = MaskBitCache(1 << 20, hot_positions=1)
+        cache.mask_bits(b'pos1', [b'a' * 32], self.compute)
+        cache.mask_bits(b'pos2', [b'a' * 32], self.compute)
+
+        cache.precompute([b'b' * 32], self.compute)
+
+        self.assertIn(b'b' * 32, cache.columns[b'pos2'])
+        self.assertNotIn(b'b' * 32, cache.columns[b'pos1'])
+
+    def test_prune(self):
+        cache = MaskBitCache(1 << 20)
+        b_ids = [bytes([n]) * 32 for n in range(4)]
+        cache.mask_bits(b'pos1', b_ids, self.compute)
+        cache.mask_bits(b'pos2', b_ids[:2], self.compute)
+
+        cache.prune(set(b_ids[2:]).__contains__)
+
+        self.assertEqual(2, cache.size)
+        self.assertEqual(set(b_ids[2:]), set(cache.columns[b'pos1']))
+        self.assertFalse(cache.columns[b'pos2'])
+
+
+class TestCachedSearch(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNServer(mask_cache_bytes=1 << 20, hot_positions=8)
+        self.server.build_index()
+        self.reference = ZNServer()
+        self.reference.build_index()
+
+    def test_search_matches_uncached_server(self):
+        keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc', 'test', 'testcase']
+        queries = ['*a*', 'a*', '*c', '*ab*', 'ab_', '*', '*c_bc_*', '*d*', 'test*']
+
+        for ind, w in zip(range(len(keywords)), keywords):
+            add_token = self.client.add_token(ind, w)
+            self.server.add(add_token)
+            self.reference.add(add_token)
+            for q in queries:
+                srch_token = self.client.srch_token(q)
+                self.assertEqual(self.reference.search(srch_token), self.server.search(srch_token))
+        self.assertGreater(self.server.mask_cache.hits, 0)
+
+    def test_compaction_prunes_mask_bits(self):
+        keywords = ['abc', 'aba', 'bac', 'cab']
+        self.server.add_many(self.client.add_token(ind, w) for ind, w in enumerate(keywords))
+        self.server.search(self.client.srch_token('*a*'))
+        size = self.server.mask_cache.size
+
+        # Deletes leave the cache alone, the compaction following the third delete prunes it
+        del_tokens = [self.client.del_token(ind, w) for ind, w in enumerate(keywords[:3])]
+        self.server.delete_many(del_tokens[:2])
+        self.assertEqual(size, self.server.mask_cache.size)
+        self.server.delete(del_tokens[2])
+
+        self.assertEqual(1, len(self.server.index))
+        self.assertLess(self.server.mask_cache.size, size)
+        for column in self.server.mask_cache.columns.values():
+            self.assertFalse(set(del_tokens) & set(column))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# Python imports
+import unittest
+
+# Project imports
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_parallel_server import ZNParallelServer
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestParallelSearch(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNParallelServer(3)
+        self.server.build_index()
+        self.reference = ZNServer()
+        self.reference.build_index()
+
+        self.keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc', 'test', 'testcase', '25-01-1996', '11-09-2001']
+        for ind, w in zip(range(len(self.keywords)), self.keywords):
+            add_token = self.client.add_token(ind, w)
+            self.server.add(add_token)
+            self.reference.add(add_token)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_search_matches_single_process(self):
+        queries = ['abc', '*a*', 'a*', '*c', 'ab_', '*', 'test*', '__-__-2001', '*d*']
+
+        for q in queries:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(set(self.reference.search(srch_token)), set(self.server.search(srch_token)))
+
+    def test_newest_first(self):
+        self.assertRaises(NotImplementedError, self.server.search_iter, self.client.srch_token('abc'), None, True)
+
+    def test_delete(self):
+        del_token = self.client.del_token(0, 'abc')
+        self.server.delete(del_token)
+        srch_token = self.client.srch_token('abc')
+        self.assertNotIn(0, self.server.search(srch_token))
+
+    def test_bulk_updates(self):
+        self.server.add_many(self.client.add_token(ind, 'bulk') for ind in range(20, 30))
+        self.server.delete_many(self.client.del_token(ind, 'bulk') for ind in range(20, 25))
+        srch_token = self.client.srch_token('bulk')
+        result = set(self.server.search(srch_token))
+        self.assertTrue(set(range(25, 30)).issubset(result))
+        self.assertFalse(set(range(20, 25)) & result)
+
+    def test_worker_errors_are_raised(self):
+        (ind, bloom_filter, b_id, prf) = self.client.add_token(40, 'error')
+        with self.assertRaises(ValueError):
+            self.server.add_many([(ind, bloom_filter[:-1], b_id, prf)], validate=True)
+
+        # The workers keep serving commands after an error
+        srch_token = self.client.srch_token('abc')
+        self.assertEqual(set(self.reference.search(srch_token)), set(self.server.search(srch_token)))
+        self.assertNotIn(40, self.server.search(self.client.srch_token('error')))
+
+    def test_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            ZNParallelServer(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+# Python imports
+import pickle
+import unittest
+
+# Project imports
+from src.zhao_nishide.zn_client import ZNClient
+from src.zhao_nishide.zn_segmented_server import ZNSegmentedServer
+from src.zhao_nishide.zn_server import ZNServer
+
+
+class TestSegmentedServer(unittest.TestCase):
+    def setUp(self):
+        self.client = ZNClient(.01, 10)
+        self.client.setup(2048)
+        self.server = ZNSegmentedServer(head_size=4, merge_factor=2, background_merge=False)
+        self.server.build_index()
+        self.reference = ZNServer()
+        self.reference.build_index()
+
+        self.keywords = ['abc', 'aba', 'bac', 'cab', 'abcabcabc', 'test', 'testcase', '25-01-1996', '11-09-2001']
+        add_tokens = [self.client.add_token(ind, w) for ind, w in enumerate(self.keywords)]
+        self.server.add_many(add_tokens)
+        self.reference.add_many(add_tokens)
+
+    def tearDown(self):
+        self.server.close()
+
+    def assertSameResults(self, server):
+        for q in ['abc', '*a*', 'a*', '*c', 'ab_', '*', 'test*', '__-__-2001', '*d*']:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(self.reference.search(srch_token), server.search(srch_token))
+
+    def delete(self, ind):
+        del_token = self.client.del_token(ind, self.keywords[ind])
+        self.server.delete(del_token)
+        self.reference.delete(del_token)
+
+    def test_segments(self):
+        self.assertEqual([4, 4], [len(segment.entries) for segment in self.server.segments])
+        self.assertEqual(1, len(self.server.head.entries))
+        self.assertSameResults(self.server)
+
+    def test_merge(self):
+        self.server.merge()
+        self.assertEqual([8], [len(segment.entries) for segment in self.server.segments])
+        self.assertSameResults(self.server)
+
+    def test_delete_and_compaction(self):
+        for ind in [0, 1, 5]:
+            self.delete(ind)
+        self.assertEqual(3, self.server.tombstones)
+        self.assertSameResults(self.server)
+
+        self.server.merge()
+        self.assertEqual([5], [len(segment.entries) for segment in self.server.segments])
+        self.assertEqual(0, self.server.tombstones)
+        self.assertSameResults(self.server)
+
+    def test_delete_after_merge(self):
+        self.server.merge()
+        self.delete(2)
+        self.delete(8)
+        self.assertEqual({self.client.del_token(2, 'bac')}, self.server.segments[0].tombstones)
+        self.assertSameResults(self.server)
+
+    def test_replace(self):
+        del_tokens = [self.client.del_token(ind, self.keywords[ind]) for ind in range(3)]
+        add_tokens = [self.client.add_token(ind, 'abc') for ind in range(10, 13)]
+        self.server.replace(del_tokens, add_tokens)
+        self.reference.replace(del_tokens, add_tokens)
+        self.assertSameResults(self.server)
+        self.assertEqual([4, 10, 11, 12], sorted(self.server.search(self.client.srch_token('abc*'))))
+
+    def test_search_interleaved_with_replace(self):
+        srch_token = self.client.srch_token('*')
+        stream = self.server.search_iter(srch_token)
+        results = [next(stream)]
+
+        # The search scans the snapshot taken before the replace, which must not see its deletes
+        del_tokens = [self.client.del_token(ind, self.keywords[ind]) for ind in [2, 8]]
+        self.server.replace(del_tokens, [self.client.add_token(9, 'abc')])
+        results.extend(stream)
+        self.assertEqual(list(range(9)), results)
+        self.assertEqual([0, 1, 3, 4, 5, 6, 7, 9], self.server.search(srch_token))
+
+    def test_search_since(self):
+        srch_token = self.client.srch_token('*')
+        add_tokens = [self.client.add_token(ind, 'abc') for ind in range(10, 17)]
+        self.server.add_many(add_tokens)
+        self.reference.add_many(add_tokens)
+        del_tokens = [self.client.del_token(ind, self.keywords[ind]) for ind in [0, 1, 2, 5]]
+        del_tokens.append(self.client.del_token(11, 'abc'))
+        self.server.delete_many(del_tokens)
+        self.reference.delete_many(del_tokens)
+        self.server.merge()
+
+        self.assertGreater(self.server.merges, 0)
+        self.assertEqual(self.reference.sequence, self.server.sequence)
+        for since in range(self.reference.sequence + 1):
+            self.assertEqual(self.reference.search_since(srch_token, since), self.server.search_since(srch_token, since))
+        self.assertRaises(ValueError, self.server.search_since, srch_token, self.server.sequence + 1)
+
+    def test_newest_first(self):
+        self.delete(2)
+        self.server.merge()
+        for q in ['*a*', '*']:
+            srch_token = self.client.srch_token(q)
+            self.assertEqual(self.reference.search(srch_token)[::-1],
+                             list(self.server.search_iter(srch_token, newest_first=True)))
+
+    def test_insertion_order(self):
+        self.server.add_many(self.client.add_token(ind, 'order') for ind in range(20, 30))
+        self.server.merge()
+        self.assertEqual(list(range(20, 30)), [ind for ind in self.server.search(self.client.srch_token('order'))
+                                               if ind >= 20])
+
+    def test_pickle(self):
+        self.delete(1)
+        server = pickle.loads(pickle.dumps(self.server))
+        self.assertSameResults(server)
+        server.delete(self.client.del_token(0, 'abc'))
+        self.assertIn(self.client.del_token(0, 'abc'), server.segments[0].tombstones)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            ZNSegmentedServer(head_size=0)
+        with self.assertRaises(ValueError):
+            ZNSegmentedServer(merge_factor=1)
+
+
+class TestBackgroundMerge(unittest.TestCase):
+    def test_background_merge(self):
+        client = ZNClient(.01, 10)
+        client.setup(2048)
+        server = ZNSegmentedServer(head_size=8, merge_factor=2)
+        server.build_index()
+        server.add_many(client.add_token(ind, 'abc') for ind in range(64))
+        server.delete_many(client.del_token(ind, 'abc') for ind in range(32))
+        server.add(client.add_token(64, 'abc'))
+
+        result = server.search(client.srch_token('abc'))
+        self.assertEqual(list(range(32, 65)), result)
+        server.close()
+        server.merge()
+        self.assertEqual(1, len(server.segments))
+        self.assertEqual(list(range(32, 65)), server.search(client.srch_token('abc')))
+
+
+if __name__ == '__main__':
+    unittest.main()